@@ -1,32 +1,58 @@
+import os
 from flask import Flask
 from config import Config
-from extensions import db, bcrypt, jwt
+from extensions import db, bcrypt, jwt, uniqueness, expiry_scheduler, event_hub, metrics, cache, bid_queue, password_hasher, ledger_worker, response_encoder, archive_store, rate_limiter
 from flask_cors import CORS
+from services.database import engine_options, configure_engine
 
 def create_app():
     app = Flask(__name__)
     CORS(app)
     app.config.from_object(Config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
 
     db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+    metrics.init_app(app)
     bcrypt.init_app(app)
+    password_hasher.init_app(app)
     jwt.init_app(app)
+    uniqueness.init_app(app)
+    expiry_scheduler.init_app(app)
+    event_hub.init_app(app)
+    cache.init_app(app)
+    bid_queue.init_app(app)
+    ledger_worker.init_app(app)
+    response_encoder.init_app(app)
+    archive_store.init_app(app)
+    rate_limiter.init_app(app)
     
     from routes.auth import auth_bp
     from routes.auctions import auctions_bp
     from routes.bids import bids_bp
     from routes.winners import winners_bp
     from routes.wallet import wallet_bp
+    from routes.metrics import metrics_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(auctions_bp, url_prefix='/api/auctions')
     app.register_blueprint(bids_bp, url_prefix='/api/bids')
     app.register_blueprint(winners_bp, url_prefix='/api/winners')
     app.register_blueprint(wallet_bp, url_prefix='/api/wallet')
+    app.register_blueprint(metrics_bp, url_prefix='/metrics')
     
     return app
 
 
 if __name__ == '__main__':
     app = create_app()
+    # THE RELOADER RUNS THIS MODULE AGAIN IN A CHILD THAT SERVES THE REQUESTS, THE PARENT ONLY WATCHES FILES.
+    # BACKGROUND JOBS RUN IN THE CHILD, OR THE PARENT'S BID QUEUE WOULD PUBLISH EVENTS NO STREAM RECEIVES.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        with app.app_context():
+            uniqueness.rebuild()
+        expiry_scheduler.start()
+        bid_queue.start()
+        ledger_worker.start()
     app.run(debug=True)
@@ -0,0 +1,200 @@
+"""
+Auth load benchmark - Login throughput versus bid latency
+
+Starts the app on a threaded local HTTP server, then runs a login storm
+(--login-workers threads logging in back to back) alongside a steady stream
+of bids (--bid-workers threads) for --duration seconds, and reports login
+throughput and status counts next to bid p50/p95/p99 latency. A bid-only
+phase runs first as the baseline. Login clients turned away with 503 or 429
+wait the Retry-After second before trying again, as a browser client would.
+With --rate-limit the login budget of services/ratelimit.py applies. All
+clients share one address, so bids stay unlimited.
+
+Compare hashing on the request thread with the bounded pool:
+
+    python benchmarks/auth_load.py --hash-workers 0
+    python benchmarks/auth_load.py --hash-workers 1 --max-pending 4
+    python benchmarks/auth_load.py --hash-workers 1 --max-pending 4 --rate-limit
+
+Usage:
+    python benchmarks/auth_load.py [--duration 10] [--login-workers 16] [--bid-workers 4]
+                                   [--rounds 12] [--hash-workers N] [--max-pending N] [--rate-limit]
+                                   [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+
+from config import Config
+from benchmarks.load import BENCHMARK_DIR, ServerTransport, git_revision, summarize
+
+PASSWORD = 'benchmark-password'
+RETRY_AFTER_SECONDS = 1
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Login throughput versus bid latency")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per phase")
+    parser.add_argument('--login-workers', type=int, default=16)
+    parser.add_argument('--bid-workers', type=int, default=4)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=Config.BCRYPT_LOG_ROUNDS, help="bcrypt cost factor")
+    parser.add_argument('--hash-workers', type=int, default=Config.PASSWORD_HASH_WORKERS,
+                        help="password hashing threads, 0 hashes on the request thread")
+    parser.add_argument('--max-pending', type=int, default=None, help="password operations running or waiting")
+    parser.add_argument('--rate-limit', action='store_true', help="apply the login budget")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="JSON results path (default benchmarks/results/auth-<timestamp>.json)")
+    return parser.parse_args()
+
+
+def seed(db, users, rounds):
+    from models import Auction, User, Wallet
+    from extensions import bcrypt
+    from benchmarks.seed import WALLET_BALANCE
+
+    # ONE HASH SHARED BY ALL USERS, IT IS CHECKED AT FULL COST ON EVERY LOGIN ANYWAY
+    password_hash = bcrypt.generate_password_hash(PASSWORD, rounds).decode('utf-8')
+    accounts = [User(username=f'auth{i}', email=f'auth{i}@example.com', password_hash=password_hash)
+                for i in range(users)]
+    db.session.add_all(accounts)
+    db.session.flush()
+    db.session.add_all(Wallet(user_id=user.id, balance=WALLET_BALANCE) for user in accounts)
+    auction = Auction(
+        title='Auth benchmark', starting_price=1, creator_id=accounts[0].id,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=1), item_value=10 ** 9
+    )
+    db.session.add(auction)
+    db.session.commit()
+    return auction.id, [(user.id, user.email) for user in accounts]
+
+
+def phase(transport, duration, login_workers, bid_workers, accounts, auction_id, tokens, seed_value):
+    """
+    Run logins and bids concurrently for `duration` seconds
+    Returns:
+        Dict with login and bid summaries
+    """
+    results = {"login": ([], []), "bid": ([], [])}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(kind, number):
+        rng = random.Random(seed_value * 1000 + number)
+        latencies, statuses = [], []
+        while time.perf_counter() < deadline:
+            user_id, email = rng.choice(accounts)
+            started = time.perf_counter()
+            if kind == 'login':
+                status = transport.request('POST', '/api/auth/login', {"email": email, "password": PASSWORD}, None)
+            else:
+                body = {"auctionId": auction_id, "amount": rng.randint(1, 5000) / 10}
+                status = transport.request('POST', '/api/bids/', body, tokens[user_id])
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+            if status in (503, 429):
+                time.sleep(min(RETRY_AFTER_SECONDS, max(0, deadline - time.perf_counter())))
+        with lock:
+            results[kind][0].extend(latencies)
+            results[kind][1].extend(statuses)
+
+    threads = [threading.Thread(target=worker, args=('login', i)) for i in range(login_workers)]
+    threads += [threading.Thread(target=worker, args=('bid', login_workers + i)) for i in range(bid_workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = {"bid": summarize(*results["bid"], elapsed)}
+    if login_workers:
+        summary["login"] = summarize(*results["login"], elapsed)
+    return summary
+
+
+def main():
+    args = parse_args()
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    Config.BCRYPT_LOG_ROUNDS = args.rounds
+    Config.PASSWORD_HASH_WORKERS = args.hash_workers
+    if args.max_pending is not None:
+        Config.PASSWORD_HASH_MAX_PENDING = args.max_pending
+    Config.RATE_LIMIT_ENABLED = args.rate_limit
+    Config.RATE_LIMITS = {'bid': {}}
+
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        auction_id, accounts = seed(db, args.users, args.rounds)
+        tokens = {user_id: create_access_token(identity=str(user_id)) for user_id, _ in accounts}
+        max_pending = app.config['PASSWORD_HASH_MAX_PENDING'] if args.hash_workers else None
+
+    transport = ServerTransport(app)
+    try:
+        print(f"Bids only for {args.duration:.0f}s...")
+        baseline = phase(transport, args.duration, 0, args.bid_workers, accounts, auction_id, tokens, args.seed)
+        print(f"Bids during a login storm for {args.duration:.0f}s...")
+        storm = phase(transport, args.duration, args.login_workers, args.bid_workers, accounts, auction_id, tokens,
+                      args.seed)
+    finally:
+        transport.close()
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "parameters": {
+            "duration": args.duration,
+            "login_workers": args.login_workers,
+            "bid_workers": args.bid_workers,
+            "users": args.users,
+            "rounds": args.rounds,
+            "hash_workers": args.hash_workers,
+            "max_pending": max_pending,
+            "rate_limit": args.rate_limit,
+            "seed": args.seed,
+        },
+        "endpoints": {
+            "POST /api/bids/ (baseline)": baseline["bid"],
+            "POST /api/bids/ (login storm)": storm["bid"],
+            "POST /api/auth/login (login storm)": storm["login"],
+        },
+    }
+
+    print()
+    print(f"{'phase':34} {'requests':>8} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for name, summary in results["endpoints"].items():
+        print(f"{name:34} {summary['requests']:8} {summary['throughput_rps']:8.1f} {summary['p50_ms']:8.2f} "
+              f"{summary['p95_ms']:8.2f} {summary['p99_ms']:8.2f}  {summary['statuses']}")
+
+    output = args.output or os.path.join(
+        BENCHMARK_DIR, 'results', 'auth-' + datetime.now().strftime('%Y%m%d-%H%M%S') + '.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
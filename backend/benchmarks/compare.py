@@ -0,0 +1,58 @@
+"""
+Benchmark comparison - Diff two load benchmark result files
+
+Prints throughput and p50/p95/p99 latency per endpoint for a baseline and a
+candidate run, with the relative change. Positive latency changes are
+regressions.
+
+Usage:
+    python benchmarks/compare.py baseline.json candidate.json
+"""
+import argparse
+import json
+
+METRICS = ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(before, after):
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two load benchmark result files")
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    for label, run in (("baseline", baseline), ("candidate", candidate)):
+        print(f"{label:10} {run['timestamp']}  rev {run.get('git_revision') or '?'}  {run['parameters']}")
+    if baseline['parameters'] != candidate['parameters']:
+        print("WARNING: runs used different parameters")
+    print()
+
+    sections = [("overall", baseline.get('overall', {}), candidate.get('overall', {}))]
+    for group in ('endpoints', 'functions'):
+        before_group, after_group = baseline.get(group, {}), candidate.get(group, {})
+        for name in sorted(set(before_group) | set(after_group)):
+            sections.append((name, before_group.get(name, {}), after_group.get(name, {})))
+
+    print(f"{'endpoint':38} {'metric':15} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for name, before, after in sections:
+        for metric in METRICS:
+            before_value, after_value = before.get(metric), after.get(metric)
+            if before_value is None and after_value is None:
+                continue
+            print(f"{name:38} {metric:15} {before_value if before_value is not None else '-':>10} "
+                  f"{after_value if after_value is not None else '-':>10} {change(before_value, after_value):>8}")
+
+
+if __name__ == '__main__':
+    main()
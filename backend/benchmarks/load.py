@@ -0,0 +1,355 @@
+"""
+Load benchmark - Throughput and latency per endpoint for the bid pipeline
+
+Seeds a database at the requested scale, then drives the real app with
+concurrent workers through either the Flask test client (`--mode client`,
+no sockets, measures the app itself) or a threaded local HTTP server
+(`--mode server`, includes HTTP parsing and connection handling). Requests
+are drawn from a weighted endpoint mix. Results are printed and written as
+JSON so runs can be compared with benchmarks/compare.py.
+
+Usage:
+    python benchmarks/load.py [--bids 100000] [--requests 2000] [--workers 8] [--mode client|server]
+                              [--database-url URL] [--output results.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy
+from flask_jwt_extended import create_access_token
+from werkzeug.serving import make_server
+
+from config import Config
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PERCENTILES = (50, 95, 99)
+MAX_TOKENS = 200
+
+# ENDPOINT: RELATIVE WEIGHT IN THE REQUEST MIX
+ENDPOINT_MIX = {
+    "POST /api/bids/": 40,
+    "POST /api/bids/batch": 5,
+    "GET /api/auctions/": 15,
+    "GET /api/auctions/<id>": 15,
+    "GET /api/auctions/<id>/distribution": 10,
+    "GET /api/auctions/<id>/pool": 10,
+    "GET /api/winners/<id>": 5,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Throughput and p50/p95/p99 latency per endpoint")
+    parser.add_argument('--bids', type=int, default=100000, help="bids seeded before the run (10^3 to 10^6)")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--auctions', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=2000, help="measured requests")
+    parser.add_argument('--warmup', type=int, default=50, help="unmeasured requests before the run")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--mode', choices=['client', 'server'], default='client')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINT_MIX), help="restrict the mix")
+    parser.add_argument('--database-url', help="benchmark an existing empty database instead of a temporary SQLite file")
+    parser.add_argument('--recalc-runs', type=int, default=3, help="timed recalc_bid_uniqueness calls on the hot auction")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="JSON results path (default benchmarks/results/<timestamp>.json)")
+    return parser.parse_args()
+
+
+class ClientTransport:
+    """
+    Flask test client, one per worker thread
+    """
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body, token):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers={"Authorization": f"Bearer {token}"})
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class ServerTransport:
+    """
+    Threaded werkzeug server on an ephemeral local port
+    """
+    def __init__(self, app):
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def request(self, method, path, body, token):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+    def close(self):
+        self.server.shutdown()
+
+
+class Workload:
+    """
+    Builds requests for the endpoint mix against the seeded data
+    Auction picks are skewed towards the hot auction like the seeded bids.
+    """
+    def __init__(self, seeded, tokens, endpoints, hot_share, seed):
+        self.seeded = seeded
+        self.tokens = tokens
+        self.names = endpoints
+        self.weights = [ENDPOINT_MIX[name] for name in endpoints]
+        self.hot_share = hot_share
+        self.local = threading.local()
+        self.seed = seed
+        self.counter = 0
+        self.counter_lock = threading.Lock()
+
+    def _rng(self):
+        rng = getattr(self.local, 'rng', None)
+        if rng is None:
+            with self.counter_lock:
+                self.counter += 1
+                worker = self.counter
+            rng = self.local.rng = random.Random(self.seed * 1000 + worker)
+        return rng
+
+    def _active_auction(self, rng):
+        if rng.random() < self.hot_share:
+            return self.seeded['hot_auction_id']
+        return rng.choice(self.seeded['active_auction_ids'])
+
+    def next(self):
+        """
+        Returns:
+            (endpoint name, method, path, json body, token)
+        """
+        rng = self._rng()
+        name = rng.choices(self.names, weights=self.weights)[0]
+        token = rng.choice(self.tokens)
+        auction_id = self._active_auction(rng)
+
+        if name == "POST /api/bids/":
+            return name, 'POST', '/api/bids/', {"auctionId": auction_id, "amount": rng.randint(1, 5000) / 10}, token
+        if name == "POST /api/bids/batch":
+            amounts = [rng.randint(1, 5000) / 10 for _ in range(5)]
+            return name, 'POST', '/api/bids/batch', {"auctionId": auction_id, "amounts": amounts}, token
+        if name == "GET /api/auctions/":
+            return name, 'GET', '/api/auctions/?status=active', None, token
+        if name == "GET /api/auctions/<id>":
+            return name, 'GET', f'/api/auctions/{auction_id}', None, token
+        if name == "GET /api/auctions/<id>/distribution":
+            return name, 'GET', f'/api/auctions/{auction_id}/distribution', None, token
+        if name == "GET /api/auctions/<id>/pool":
+            return name, 'GET', f'/api/auctions/{auction_id}/pool', None, token
+        expired_id = rng.choice(self.seeded['expired_auction_ids'])
+        return name, 'GET', f'/api/winners/{expired_id}', None, token
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, statuses, elapsed):
+    """
+    Returns:
+        Dict with count, throughput, status counts and latency statistics in ms
+    """
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(ordered),
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else None,
+        "statuses": {str(status): count for status, count in sorted(Counter(statuses).items())},
+        "errors": sum(1 for status in statuses if status >= 500),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else None,
+    }
+    for pct in PERCENTILES:
+        value = percentile(ordered, pct)
+        summary[f"p{pct}_ms"] = round(value * 1000, 3) if value is not None else None
+    return summary
+
+
+def run(transport, workload, total, workers):
+    """
+    Send `total` requests from `workers` threads
+    Returns:
+        (latencies by endpoint, statuses by endpoint, elapsed seconds)
+    """
+    latencies = defaultdict(list)
+    statuses = defaultdict(list)
+    record_lock = threading.Lock()
+
+    def send(_):
+        name, method, path, body, token = workload.next()
+        started = time.perf_counter()
+        status = transport.request(method, path, body, token)
+        latency = time.perf_counter() - started
+        with record_lock:
+            latencies[name].append(latency)
+            statuses[name].append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(send, range(total)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def time_recalc(app, auction_id, runs):
+    """
+    Time recalc_bid_uniqueness, which no endpoint calls on the request path
+    Returns:
+        List of durations in seconds
+    """
+    from models import Auction
+    from routes.winners import recalc_bid_uniqueness
+    from extensions import db
+
+    durations = []
+    with app.app_context():
+        auction = db.session.get(Auction, auction_id)
+        for _ in range(runs):
+            started = time.perf_counter()
+            recalc_bid_uniqueness(auction)
+            durations.append(time.perf_counter() - started)
+    return durations
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    db_path = None
+    if args.database_url:
+        Config.SQLALCHEMY_DATABASE_URI = args.database_url
+    else:
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    # EVERY WORKER SENDS FROM ONE ADDRESS, THE BUDGETS WOULD MEASURE THE LIMITER
+    Config.RATE_LIMIT_ENABLED = False
+
+    from app import create_app
+    from extensions import db
+    from services import migrations
+    from benchmarks.seed import seed_database
+
+    app = create_app()
+    hot_share = 0.2
+    with app.app_context():
+        db.create_all()
+        migrations.stamp(db.engine)
+        print(f"Seeding {args.bids} bids over {args.auctions} auctions and {args.users} users...")
+        started = time.perf_counter()
+        seeded = seed_database(db.engine, args.users, args.auctions, args.bids, hot_share, args.seed)
+        seed_seconds = time.perf_counter() - started
+        print(f"Seeded in {seed_seconds:.1f}s")
+        tokens = [create_access_token(identity=str(user_id)) for user_id in seeded['user_ids'][1:MAX_TOKENS + 1]]
+        backend = db.engine.dialect.name
+
+    endpoints = sorted(args.endpoints or ENDPOINT_MIX)
+    workload = Workload(seeded, tokens, endpoints, hot_share, args.seed)
+    transport = ServerTransport(app) if args.mode == 'server' else ClientTransport(app)
+    try:
+        if args.warmup:
+            run(transport, workload, args.warmup, args.workers)
+        latencies, statuses, elapsed = run(transport, workload, args.requests, args.workers)
+    finally:
+        transport.close()
+    recalc_durations = time_recalc(app, seeded['hot_auction_id'], args.recalc_runs)
+
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    all_statuses = [status for values in statuses.values() for status in values]
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "database": backend,
+        "parameters": {
+            "mode": args.mode,
+            "bids": args.bids,
+            "users": args.users,
+            "auctions": args.auctions,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "workers": args.workers,
+            "recalc_runs": args.recalc_runs,
+            "seed": args.seed,
+            "endpoints": endpoints,
+        },
+        "seed_seconds": round(seed_seconds, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": summarize(all_latencies, all_statuses, elapsed),
+        "endpoints": {name: summarize(latencies[name], statuses[name], elapsed) for name in endpoints if latencies[name]},
+        "functions": {
+            "recalc_bid_uniqueness": summarize(recalc_durations, [200] * len(recalc_durations), sum(recalc_durations)),
+        } if recalc_durations else {},
+    }
+
+    print()
+    print(f"{'endpoint':38} {'requests':>8} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'5xx':>5}")
+    for name, summary in list(results['endpoints'].items()) + [("overall", results['overall'])]:
+        print(f"{name:38} {summary['requests']:8} {summary['throughput_rps']:8.1f} {summary['p50_ms']:8.2f} "
+              f"{summary['p95_ms']:8.2f} {summary['p99_ms']:8.2f} {summary['errors']:5}")
+    for name, summary in results['functions'].items():
+        print(f"{name:38} {summary['requests']:8} {'':8} {summary['p50_ms']:8.2f} {summary['p95_ms']:8.2f} "
+              f"{summary['p99_ms']:8.2f}")
+
+    output = args.output or os.path.join(
+        BENCHMARK_DIR, 'results', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if db_path:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Index benchmark - per-endpoint database time with and without the hot path indexes
+
+Seeds a throwaway SQLite file with a large bid table, then calls the real
+read endpoints through the Flask test client, first with the composite
+indexes dropped and then after migrations 0003 and 0008 have created them. Database
+time is measured with SQLAlchemy cursor events, wall time around the request.
+
+Usage:
+    python benchmarks/query_indexes.py [--bids 1000000] [--auctions 100] [--users 10000] [--repeat 5]
+"""
+import argparse
+import importlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text
+from flask_jwt_extended import create_access_token
+
+from config import Config
+
+INDEX_NAMES = [
+    'ix_bid_auction_amount',
+    'ix_bid_auction_user',
+    'ix_bid_auction_user_bids',
+    'ix_auction_status_expires',
+    'ix_pool_prize_winner_auction_rank',
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-endpoint query time before/after the hot path indexes")
+    parser.add_argument('--bids', type=int, default=1000000)
+    parser.add_argument('--auctions', type=int, default=100)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args()
+
+
+def measure(app, client, headers, endpoints, repeat, hot_auction_id):
+    from extensions import db, uniqueness
+
+    db_time = [0.0]
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_started'] = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        db_time[0] += time.perf_counter() - conn.info.pop('query_started')
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before)
+    event.listen(engine, 'after_cursor_execute', after)
+
+    results = {}
+    try:
+        for name, path in endpoints:
+            db_samples, wall_samples = [], []
+            for _ in range(repeat):
+                # COLD UNIQUENESS INDEX SO ITS GROUP BY LOAD IS PART OF THE MEASUREMENT
+                uniqueness.discard(hot_auction_id)
+                db_time[0] = 0.0
+                started = time.perf_counter()
+                response = client.get(path, headers=headers)
+                wall_samples.append(time.perf_counter() - started)
+                db_samples.append(db_time[0])
+                assert response.status_code == 200, (path, response.status_code)
+            results[name] = (statistics.median(db_samples), statistics.median(wall_samples))
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+        event.remove(engine, 'after_cursor_execute', after)
+    return results
+
+
+def main():
+    args = parse_args()
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    # EVERY REPEAT MUST REACH THE DATABASE
+    Config.CACHE_BACKEND = 'none'
+
+    from app import create_app
+    from extensions import db
+    from benchmarks.seed import seed_database
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(f"Seeding {args.bids} bids over {args.auctions} auctions and {args.users} users...")
+        started = time.perf_counter()
+        seeded = seed_database(db.engine, args.users, args.auctions, args.bids)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(seeded['user_ids'][1]))}"}
+
+    client = app.test_client()
+    hot = seeded['hot_auction_id']
+    endpoints = [
+        ("GET /api/auctions/?status=active", "/api/auctions/?status=active"),
+        ("GET /api/auctions/<hot>", f"/api/auctions/{hot}"),
+        ("GET /api/auctions/<hot>/distribution", f"/api/auctions/{hot}/distribution"),
+        ("GET /api/auctions/<hot>/pool", f"/api/auctions/{hot}/pool"),
+    ]
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            for name in INDEX_NAMES:
+                connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    before = measure(app, client, headers, endpoints, args.repeat, hot)
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            importlib.import_module('migrations.0003_hot_path_indexes').upgrade(connection)
+            importlib.import_module('migrations.0008_bid_history_index').upgrade(connection)
+            connection.execute(text("ANALYZE"))
+    after = measure(app, client, headers, endpoints, args.repeat, hot)
+
+    print()
+    print(f"{'endpoint':42} {'db before':>10} {'db after':>10} {'wall before':>12} {'wall after':>11}")
+    for name, _ in endpoints:
+        (db_before, wall_before), (db_after, wall_after) = before[name], after[name]
+        print(f"{name:42} {db_before * 1000:8.1f}ms {db_after * 1000:8.1f}ms "
+              f"{wall_before * 1000:10.1f}ms {wall_after * 1000:9.1f}ms")
+
+    os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark seeding - Bulk loads users, wallets, auctions and bids
+
+Rows are written with Core executemany in chunks, so seeding 10^6 bids takes
+seconds rather than the minutes an ORM session would need. Amounts follow the
+bid rules (integer cents on the 0.10 step); auction counters, pool prizes and
+`is_unique` flags are computed while generating so the seeded database looks
+like one produced by place_bid, including the bid count leaderboard. The first auction is the hot one and receives
+`hot_share` of all bids.
+"""
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, literal, select, update
+
+from money import BID_STEP_CENTS
+from models import User, Wallet, WalletLedger, Auction, AuctionBidder, Bid
+
+CHUNK_SIZE = 10000
+# LARGE ENOUGH THAT SEEDED BIDDERS NEVER RUN OUT OF FUNDS DURING A RUN
+WALLET_BALANCE = 10 ** 10
+ITEM_VALUE = 50000
+MAX_BID_STEPS = 5000
+
+
+def _chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(connection, table, rows):
+    for chunk in _chunks(rows):
+        connection.execute(insert(table), chunk)
+
+
+def seed_database(engine, users=1000, auctions=100, bids=100000, hot_share=0.2, seed=42):
+    """
+    Seed an empty schema
+    Odd numbered auctions are active, even numbered ones expired.
+    Returns:
+        Dict with user_ids, active_auction_ids, expired_auction_ids and hot_auction_id
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    with engine.begin() as connection:
+        _insert(connection, User.__table__, (
+            {"username": f"bench{i}", "email": f"bench{i}@example.com", "password_hash": "-", "created_at": now}
+            for i in range(users)
+        ))
+        user_ids = connection.execute(select(User.id).order_by(User.id)).scalars().all()
+        _insert(connection, Wallet.__table__, (
+            {"user_id": user_id, "balance": WALLET_BALANCE, "created_at": now, "updated_at": now}
+            for user_id in user_ids
+        ))
+
+        _insert(connection, Auction.__table__, (
+            {
+                "title": f"Benchmark auction {i}",
+                "description": "",
+                "starting_price": 1,
+                "status": "active" if i % 2 else "expired",
+                "created_at": now - timedelta(days=1),
+                "expires_at": now + timedelta(days=1) if i % 2 else now - timedelta(minutes=1),
+                "creator_id": user_ids[0],
+                "item_value": ITEM_VALUE,
+                "pool_prize": 0,
+                "pool_distributed": False,
+            }
+            for i in range(1, auctions + 1)
+        ))
+        auction_rows = connection.execute(select(Auction.id, Auction.status).order_by(Auction.id)).all()
+        auction_ids = [auction_id for auction_id, _ in auction_rows]
+
+        hot_bids = int(bids * hot_share) if auctions > 1 else bids
+        per_auction = Counter({auction_ids[0]: hot_bids})
+        for _ in range(bids - hot_bids):
+            per_auction[auction_ids[rng.randrange(1, auctions)]] += 1
+
+        for auction_id in auction_ids:
+            count = per_auction[auction_id]
+            amounts = [rng.randint(1, MAX_BID_STEPS) * BID_STEP_CENTS for _ in range(count)]
+            bidders = [rng.choice(user_ids) for _ in range(count)]
+            amount_counts = Counter(amounts)
+
+            # SAME THRESHOLD AND POOL SPLIT AS place_bid
+            total, pool, threshold_reached_at = 0, 0, None
+            rows = []
+            for offset, (user_id, amount) in enumerate(zip(bidders, amounts)):
+                created_at = now - timedelta(days=1) + timedelta(microseconds=offset)
+                if threshold_reached_at is not None:
+                    pool += amount // 2
+                total += amount
+                if threshold_reached_at is None and total >= ITEM_VALUE:
+                    threshold_reached_at = created_at
+                rows.append({
+                    "user_id": user_id,
+                    "auction_id": auction_id,
+                    "amount": amount,
+                    "is_unique": amount_counts[amount] == 1,
+                    "created_at": created_at,
+                })
+            _insert(connection, Bid.__table__, rows)
+            connection.execute(update(Auction).where(Auction.id == auction_id).values(
+                total_bid_amount=total,
+                bid_count=count,
+                pool_prize=pool,
+                threshold_reached_at=threshold_reached_at
+            ))
+
+        connection.execute(insert(AuctionBidder).from_select(
+            ['auction_id', 'user_id', 'bid_count', 'first_bid_id'],
+            select(Bid.auction_id, Bid.user_id, func.count(Bid.id), func.min(Bid.id)).group_by(Bid.auction_id, Bid.user_id)
+        ))
+
+        # SEEDED BALANCES AND POOLS OPEN THE LEDGER, AS MIGRATION 0007 DOES FOR EXISTING DATA
+        connection.execute(insert(WalletLedger).from_select(
+            ['user_id', 'kind', 'amount', 'created_at'],
+            select(Wallet.user_id, literal('opening_balance'), Wallet.balance, literal(now))
+        ))
+        connection.execute(insert(WalletLedger).from_select(
+            ['auction_id', 'kind', 'amount', 'created_at'],
+            select(Auction.id, literal('opening_balance'), Auction.pool_prize, literal(now)).where(Auction.pool_prize > 0)
+        ))
+
+    return {
+        "user_ids": user_ids,
+        "active_auction_ids": [auction_id for auction_id, status in auction_rows if status == 'active'],
+        "expired_auction_ids": [auction_id for auction_id, status in auction_rows if status == 'expired'],
+        "hot_auction_id": auction_ids[0],
+    }
@@ -0,0 +1,144 @@
+"""
+Startup benchmark - Time from launching serve.py to serving, and to stopping
+
+Seeds a temporary database, then starts serve.py on it several times. Each
+run measures the time from launch until GET /api/auctions/ and the hot
+auction's detail first answer 200, the latency of the first bid, and the
+time from SIGTERM until the server has exited. Half of the seeded auctions
+are active. The expired half is marked settled, as it would be in a running
+deployment, so the warm start loads the uniqueness indexes of the active
+auctions' bids.
+
+Usage:
+    python benchmarks/startup.py [--bids 200000] [--auctions 100] [--workers 4] [--runs 3]
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from flask_jwt_extended import create_access_token
+
+from config import Config
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure serve.py startup and shutdown time")
+    parser.add_argument('--bids', type=int, default=200000)
+    parser.add_argument('--auctions', type=int, default=100)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--runs', type=int, default=3)
+    return parser.parse_args()
+
+
+def request(url, token, body=None):
+    """
+    Returns:
+        The response status, or None if the connection failed
+    """
+    data = json.dumps(body).encode() if body else None
+    req = urllib.request.Request(url, data=data, method='POST' if body else 'GET', headers={
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {token}"
+    })
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def run_once(env, workers, hot_auction_id, token):
+    """
+    Returns:
+        Dict of timings in seconds
+    """
+    launched = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'serve.py', '--port', '0', '--workers', str(workers)],
+                               cwd=BACKEND, env=env, stderr=subprocess.PIPE, text=True)
+    port = None
+    for line in process.stderr:
+        match = re.search(r'Listening on http://[^:]+:(\d+)', line)
+        if match:
+            port = int(match.group(1))
+            break
+    if port is None:
+        process.kill()
+        raise RuntimeError("serve.py did not start")
+    threading.Thread(target=process.stderr.read, daemon=True).start()
+
+    base = f'http://127.0.0.1:{port}'
+    timings = {"listening": time.perf_counter() - launched}
+    while request(f'{base}/api/auctions/', token) != 200:
+        time.sleep(0.005)
+    timings["first_list"] = time.perf_counter() - launched
+    while request(f'{base}/api/auctions/{hot_auction_id}', token) != 200:
+        time.sleep(0.005)
+    timings["first_detail"] = time.perf_counter() - launched
+    started = time.perf_counter()
+    status = request(f'{base}/api/bids/', token, {"auctionId": hot_auction_id, "amount": 0.1})
+    timings["first_bid"] = time.perf_counter() - started
+    if status != 201:
+        raise RuntimeError(f"the first bid failed with {status}")
+
+    started = time.perf_counter()
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=60)
+    timings["shutdown"] = time.perf_counter() - started
+    return timings
+
+
+def main():
+    args = parse_args()
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+
+    from app import create_app
+    from sqlalchemy import func, update
+    from extensions import db
+    from models import Auction
+    from services import migrations
+    from benchmarks.seed import seed_database
+
+    app = create_app()
+    app.extensions['expiry_scheduler'].stop()
+    with app.app_context():
+        db.create_all()
+        migrations.stamp(db.engine)
+        print(f"Seeding {args.bids} bids over {args.auctions} auctions and {args.users} users...")
+        seeded = seed_database(db.engine, args.users, args.auctions, args.bids)
+        db.session.execute(update(Auction).where(Auction.id.in_(seeded['expired_auction_ids']))
+                           .values(settled_at=func.now()))
+        db.session.commit()
+        token = create_access_token(identity=str(seeded['user_ids'][1]))
+        db.engine.dispose()
+
+    env = dict(os.environ, DATABASE_URL=Config.SQLALCHEMY_DATABASE_URI)
+    names = ("listening", "first_list", "first_detail", "first_bid", "shutdown")
+    print(f"{'run':>4} " + " ".join(f"{name + ' ms':>16}" for name in names))
+    try:
+        for run in range(1, args.runs + 1):
+            timings = run_once(env, args.workers, seeded['hot_auction_id'], token)
+            print(f"{run:>4} " + " ".join(f"{timings[name] * 1000:16.1f}" for name in names))
+    finally:
+        os.unlink(db_path)
+
+
+if __name__ == '__main__':
+    main()
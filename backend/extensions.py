@@ -1,8 +1,29 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
+from services.uniqueness import UniquenessRegistry
+from services.scheduler import ExpiryScheduler
+from services.events import EventHub
+from services.metrics import Metrics
+from services.cache import Cache
+from services.bid_queue import BidQueue
+from services.passwords import PasswordHasher
+from services.ledger_worker import LedgerWorker
+from services.responses import ResponseEncoder
+from services.archive import ArchiveStore
+from services.ratelimit import RateLimiter
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 jwt = JWTManager()
-
+uniqueness = UniquenessRegistry()
+expiry_scheduler = ExpiryScheduler()
+event_hub = EventHub()
+metrics = Metrics()
+cache = Cache()
+bid_queue = BidQueue()
+password_hasher = PasswordHasher()
+ledger_worker = LedgerWorker()
+response_encoder = ResponseEncoder()
+archive_store = ArchiveStore()
+rate_limiter = RateLimiter()
@@ -0,0 +1,125 @@
+"""
+Maintenance commands for the HiddenDeal backend
+
+Usage:
+    python manage.py migrate [--status]
+    python manage.py reconcile [auction_id ...]
+    python manage.py settle [--batch-size 500]
+    python manage.py ledger {fold,snapshot,verify} [--repair]
+    python manage.py archive [--batch-size 100] [--after-seconds 3600] [--vacuum]
+"""
+import argparse
+import sys
+
+from flask import current_app
+from sqlalchemy import text
+
+from app import create_app
+from extensions import db
+from services import leaderboard, ledger, migrations
+from services.archive import archive_settled_auctions
+from services.settlement import settle_expired_auctions
+from services.totals import reconcile_auction_totals
+
+
+def migrate(args):
+    if args.status:
+        pending = migrations.pending_migrations(db.engine)
+        print("Pending migrations: " + (", ".join(pending) if pending else "none"))
+        return
+    applied = migrations.upgrade(db.engine)
+    print("Applied migrations: " + (", ".join(applied) if applied else "none, database is up to date"))
+    # 0001 ADDS THE COUNTERS EMPTY, THEY ARE FILLED ONCE AMOUNTS ARE IN CENTS (0002)
+    if '0001_auction_counters' in applied:
+        corrected = reconcile_auction_totals()
+        print(f"Filled the bid totals of {corrected} auction(s) from the bid table.")
+
+
+def reconcile(args):
+    corrected = reconcile_auction_totals(args.auction_ids or None)
+    print(f"Reconciled bid totals, {corrected} auction(s) corrected.")
+    rows = leaderboard.rebuild(args.auction_ids or None)
+    print(f"Rebuilt the bid count leaderboard, {rows} bidder row(s).")
+
+
+def settle(args):
+    settled = settle_expired_auctions(args.batch_size)
+    print(f"Settled {settled} expired auction(s).")
+
+
+def ledger_command(args):
+    if args.action == 'fold':
+        credited = ledger.fold_creator_credits()
+        print(f"Folded pending creator credits into {credited} wallet(s).")
+    elif args.action == 'snapshot':
+        snapshots = ledger.take_snapshots()
+        print(f"Took {snapshots} wallet snapshot(s).")
+    else:
+        if args.repair:
+            for user_id, balance, ledger_balance in ledger.repair_wallets():
+                print(f"User {user_id}: wallet {balance} cents set to its ledger balance {ledger_balance} cents")
+        wallet_mismatches, pool_mismatches = ledger.verify()
+        for user_id, balance, ledger_balance in wallet_mismatches:
+            print(f"User {user_id}: wallet {balance} cents, ledger {ledger_balance} cents")
+        for auction_id, pool_prize, ledger_pool in pool_mismatches:
+            print(f"Auction {auction_id}: pool prize {pool_prize} cents, ledger {ledger_pool} cents")
+        if wallet_mismatches or pool_mismatches:
+            sys.exit(1)
+        print("Wallets and pools match the ledger.")
+
+
+def archive(args):
+    batch_size = args.batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    after_seconds = args.after_seconds
+    if after_seconds is None:
+        after_seconds = current_app.config['ARCHIVE_AFTER_SECONDS']
+    total = 0
+    while True:
+        archived = archive_settled_auctions(batch_size, after_seconds)
+        if not archived:
+            break
+        total += archived
+    print(f"Archived the bids of {total} settled auction(s).")
+    # DELETED ROWS ONLY BECOME FREE PAGES, VACUUM GIVES THE SPACE BACK TO THE FILESYSTEM
+    if args.vacuum and db.engine.dialect.name == 'sqlite':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text("VACUUM"))
+        print("Vacuumed the database.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HiddenDeal maintenance commands")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    reconcile_parser = commands.add_parser('reconcile', help="Recompute auction bid totals and the leaderboard from the bid table")
+    reconcile_parser.add_argument('auction_ids', nargs='*', type=int)
+    reconcile_parser.set_defaults(handler=reconcile)
+
+    migrate_parser = commands.add_parser('migrate', help="Apply pending schema migrations")
+    migrate_parser.add_argument('--status', action='store_true', help="Only list pending migrations")
+    migrate_parser.set_defaults(handler=migrate)
+
+    settle_parser = commands.add_parser('settle', help="Pick winners and pay pool prizes of expired auctions")
+    settle_parser.add_argument('--batch-size', type=int, default=500)
+    settle_parser.set_defaults(handler=settle)
+
+    ledger_parser = commands.add_parser('ledger', help="Fold creator credits, snapshot or verify the wallet ledger")
+    ledger_parser.add_argument('action', choices=['fold', 'snapshot', 'verify'])
+    ledger_parser.add_argument('--repair', action='store_true',
+                               help="with verify, first set mismatched wallets to their ledger balance")
+    ledger_parser.set_defaults(handler=ledger_command)
+
+    archive_parser = commands.add_parser('archive', help="Move the bids of settled auctions to archive files")
+    archive_parser.add_argument('--batch-size', type=int, default=None, help="auctions per segment file")
+    archive_parser.add_argument('--after-seconds', type=int, default=None, help="only auctions settled this long ago")
+    archive_parser.add_argument('--vacuum', action='store_true', help="VACUUM a SQLite database afterwards")
+    archive_parser.set_defaults(handler=archive)
+
+    args = parser.parse_args()
+    app = create_app()
+    with app.app_context():
+        args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
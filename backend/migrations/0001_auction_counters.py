@@ -0,0 +1,21 @@
+"""
+Add the running bid counters to auction
+They start at zero. `manage.py migrate` fills them from the bid table after
+the remaining migrations, once amounts are integer cents (0002).
+"""
+from sqlalchemy import inspect, text
+
+AUCTION_COUNTER_COLUMNS = {
+    'total_bid_amount': 'BIGINT NOT NULL DEFAULT 0',
+    'bid_count': 'INTEGER NOT NULL DEFAULT 0',
+    'threshold_reached_at': 'DATETIME',
+}
+
+
+def upgrade(connection):
+    existing = {column['name'] for column in inspect(connection).get_columns('auction')}
+    for name, definition in AUCTION_COUNTER_COLUMNS.items():
+        if name not in existing:
+            if connection.dialect.name == 'postgresql':
+                definition = definition.replace('DATETIME', 'TIMESTAMP')
+            connection.execute(text(f"ALTER TABLE auction ADD COLUMN {name} {definition}"))
@@ -0,0 +1,63 @@
+"""
+Convert float currency columns to integer cents
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.types import Float
+
+from extensions import db
+
+MONEY_COLUMNS = {
+    'auction': ['item_value', 'pool_prize', 'total_bid_amount'],
+    'bid': ['amount'],
+    'wallet': ['balance'],
+    'pool_prize_winner': ['amount'],
+}
+
+
+def prepare(connection):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+
+
+def _float_money_tables(connection):
+    inspector = inspect(connection)
+    tables = []
+    for table_name, column_names in MONEY_COLUMNS.items():
+        columns = {column['name']: column['type'] for column in inspector.get_columns(table_name)}
+        if any(isinstance(columns.get(name), Float) for name in column_names):
+            tables.append(table_name)
+    return tables
+
+
+def _convert_table(connection, table_name):
+    money_columns = MONEY_COLUMNS[table_name]
+
+    if connection.dialect.name == 'postgresql':
+        for name in money_columns:
+            connection.execute(text(
+                f"ALTER TABLE {table_name} ALTER COLUMN {name} TYPE BIGINT USING ROUND({name} * 100)::BIGINT"
+            ))
+        return
+
+    # SQLITE CANNOT CHANGE A COLUMN TYPE: COPY INTO A NEW TABLE AND SWAP
+    table = db.metadata.tables[table_name]
+    existing = {column['name'] for column in inspect(connection).get_columns(table_name)}
+    converted = table.to_metadata(db.metadata, name=f'{table_name}_cents')
+    try:
+        connection.execute(CreateTable(converted))
+    finally:
+        db.metadata.remove(converted)
+
+    names = [column.name for column in table.columns if column.name in existing]
+    values = [f"CAST(ROUND({name} * 100) AS INTEGER)" if name in money_columns else name for name in names]
+    connection.execute(text(
+        f"INSERT INTO {table_name}_cents ({', '.join(names)}) SELECT {', '.join(values)} FROM {table_name}"
+    ))
+    connection.execute(text(f"DROP TABLE {table_name}"))
+    connection.execute(text(f"ALTER TABLE {table_name}_cents RENAME TO {table_name}"))
+
+
+def upgrade(connection):
+    for table_name in _float_money_tables(connection):
+        _convert_table(connection, table_name)
@@ -0,0 +1,19 @@
+"""
+Composite indexes for the bid, auction and pool winner access paths
+"""
+from sqlalchemy import text
+
+INDEXES = [
+    # LOWEST UNIQUE BID AND DISTRIBUTION: COUNT BY (auction_id, amount)
+    "CREATE INDEX IF NOT EXISTS ix_bid_auction_amount ON bid (auction_id, amount)",
+    # TOP BIDDERS AND A USER'S OWN BIDS: GROUP/FILTER BY (auction_id, user_id)
+    "CREATE INDEX IF NOT EXISTS ix_bid_auction_user ON bid (auction_id, user_id)",
+    # LISTING AND EXPIRY: FILTER BY status, RANGE ON expires_at
+    "CREATE INDEX IF NOT EXISTS ix_auction_status_expires ON auction (status, expires_at)",
+    "CREATE INDEX IF NOT EXISTS ix_pool_prize_winner_auction_rank ON pool_prize_winner (auction_id, rank)",
+]
+
+
+def upgrade(connection):
+    for statement in INDEXES:
+        connection.execute(text(statement))
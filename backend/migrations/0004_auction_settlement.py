@@ -0,0 +1,15 @@
+"""
+Add auction.settled_at and the index the settlement job scans
+"""
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    existing = {column['name'] for column in inspect(connection).get_columns('auction')}
+    if 'settled_at' not in existing:
+        column_type = 'TIMESTAMP' if connection.dialect.name == 'postgresql' else 'DATETIME'
+        connection.execute(text(f"ALTER TABLE auction ADD COLUMN settled_at {column_type}"))
+    # UNSETTLED AUCTIONS PAST THEIR DEADLINE: settled_at IS NULL, RANGE ON expires_at
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_auction_settled_expires ON auction (settled_at, expires_at)"
+    ))
@@ -0,0 +1,24 @@
+"""
+Add the auction_bidder leaderboard table and fill it from the bid table
+"""
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    if not inspect(connection).has_table('auction_bidder'):
+        connection.execute(text(
+            'CREATE TABLE auction_bidder ('
+            ' auction_id INTEGER NOT NULL REFERENCES auction (id),'
+            ' user_id INTEGER NOT NULL REFERENCES "user" (id),'
+            ' bid_count INTEGER NOT NULL DEFAULT 0,'
+            ' first_bid_id INTEGER NOT NULL,'
+            ' PRIMARY KEY (auction_id, user_id))'
+        ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_auction_bidder_rank ON auction_bidder (auction_id, bid_count DESC, first_bid_id)"
+    ))
+    connection.execute(text("DELETE FROM auction_bidder"))
+    connection.execute(text(
+        "INSERT INTO auction_bidder (auction_id, user_id, bid_count, first_bid_id) "
+        "SELECT auction_id, user_id, COUNT(id), MIN(id) FROM bid GROUP BY auction_id, user_id"
+    ))
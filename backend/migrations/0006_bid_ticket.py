@@ -0,0 +1,25 @@
+"""
+Add the bid_ticket table used by the queued bid ingestion mode
+"""
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    if not inspect(connection).has_table('bid_ticket'):
+        datetime_type = 'TIMESTAMP' if connection.dialect.name == 'postgresql' else 'DATETIME'
+        id_type = 'SERIAL' if connection.dialect.name == 'postgresql' else 'INTEGER'
+        connection.execute(text(
+            'CREATE TABLE bid_ticket ('
+            f' id {id_type} NOT NULL PRIMARY KEY,'
+            ' auction_id INTEGER NOT NULL REFERENCES auction (id),'
+            ' user_id INTEGER NOT NULL REFERENCES "user" (id),'
+            ' amount BIGINT NOT NULL,'
+            " status VARCHAR(20) NOT NULL DEFAULT 'pending',"
+            f' accepted_at {datetime_type} NOT NULL,'
+            f' applied_at {datetime_type},'
+            ' bid_id INTEGER REFERENCES bid (id))'
+        ))
+    # PENDING TICKETS BY AUCTION, IN ARRIVAL ORDER
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_bid_ticket_status_auction ON bid_ticket (status, auction_id, id)"
+    ))
@@ -0,0 +1,49 @@
+"""
+Add the wallet ledger tables, opening each wallet and pool at its current balance
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    datetime_type = 'TIMESTAMP' if connection.dialect.name == 'postgresql' else 'DATETIME'
+    id_type = 'SERIAL' if connection.dialect.name == 'postgresql' else 'INTEGER'
+    if not inspect(connection).has_table('wallet_ledger'):
+        connection.execute(text(
+            'CREATE TABLE wallet_ledger ('
+            f' id {id_type} NOT NULL PRIMARY KEY,'
+            ' user_id INTEGER REFERENCES "user" (id),'
+            ' auction_id INTEGER REFERENCES auction (id),'
+            ' kind VARCHAR(20) NOT NULL,'
+            ' amount BIGINT NOT NULL,'
+            f' created_at {datetime_type} NOT NULL)'
+        ))
+        # EXISTING BALANCES BECOME THE OPENING ENTRIES, ONLY WHEN THE TABLE IS NEW
+        # NAIVE UTC, AS THE ORM STORES DATETIMES
+        opened_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        connection.execute(text(
+            "INSERT INTO wallet_ledger (user_id, kind, amount, created_at)"
+            " SELECT user_id, 'opening_balance', balance, :opened_at FROM wallet WHERE balance <> 0"
+        ), {"opened_at": opened_at})
+        connection.execute(text(
+            "INSERT INTO wallet_ledger (auction_id, kind, amount, created_at)"
+            " SELECT id, 'opening_balance', pool_prize, :opened_at FROM auction WHERE pool_prize > 0"
+        ), {"opened_at": opened_at})
+    if not inspect(connection).has_table('wallet_snapshot'):
+        connection.execute(text(
+            'CREATE TABLE wallet_snapshot ('
+            ' user_id INTEGER NOT NULL REFERENCES "user" (id),'
+            ' ledger_id INTEGER NOT NULL,'
+            ' balance BIGINT NOT NULL,'
+            f' created_at {datetime_type} NOT NULL,'
+            ' PRIMARY KEY (user_id, ledger_id))'
+        ))
+    if not inspect(connection).has_table('ledger_cursor'):
+        connection.execute(text(
+            'CREATE TABLE ledger_cursor ('
+            ' name VARCHAR(40) NOT NULL PRIMARY KEY,'
+            ' position INTEGER NOT NULL)'
+        ))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_wallet_ledger_user ON wallet_ledger (user_id, id)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_wallet_ledger_kind ON wallet_ledger (kind, id)"))
@@ -0,0 +1,14 @@
+"""
+Replace the (auction_id, user_id) bid index with one that covers a user's
+bid history on an auction, so GET /api/auctions/<id> reads only the index
+"""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_bid_auction_user_bids"
+        " ON bid (auction_id, user_id, id, amount, is_unique, created_at)"
+    ))
+    # A PREFIX OF THE NEW INDEX, KEEPING BOTH WOULD ONLY SLOW DOWN BID INSERTS
+    connection.execute(text("DROP INDEX IF EXISTS ix_bid_auction_user"))
@@ -0,0 +1,27 @@
+"""
+Add the auction_archive table that summarizes auctions whose bids were
+moved to columnar archive files
+"""
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    if not inspect(connection).has_table('auction_archive'):
+        datetime_type = 'TIMESTAMP' if connection.dialect.name == 'postgresql' else 'DATETIME'
+        connection.execute(text(
+            'CREATE TABLE auction_archive ('
+            ' auction_id INTEGER NOT NULL PRIMARY KEY REFERENCES auction (id),'
+            ' segment VARCHAR(120),'
+            ' block_offset BIGINT NOT NULL DEFAULT 0,'
+            ' block_length INTEGER NOT NULL DEFAULT 0,'
+            ' bid_count INTEGER NOT NULL,'
+            ' bidder_count INTEGER NOT NULL,'
+            ' unique_count INTEGER NOT NULL,'
+            ' total_amount BIGINT NOT NULL,'
+            ' winning_bid_id INTEGER,'
+            ' winning_user_id INTEGER,'
+            ' winning_amount BIGINT,'
+            f' winning_created_at {datetime_type},'
+            ' histogram JSON NOT NULL,'
+            f' archived_at {datetime_type} NOT NULL)'
+        ))
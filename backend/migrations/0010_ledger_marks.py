@@ -0,0 +1,32 @@
+"""
+Mark wallet ledger entries as folded and snapshotted instead of tracking
+both jobs with id cursors, which skipped entries that committed late
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    datetime_type = 'TIMESTAMP' if connection.dialect.name == 'postgresql' else 'DATETIME'
+    existing = {column['name'] for column in inspect(connection).get_columns('wallet_ledger')}
+    if 'folded_at' not in existing:
+        connection.execute(text(f"ALTER TABLE wallet_ledger ADD COLUMN folded_at {datetime_type}"))
+        # CREDITS UP TO THE OLD CURSOR WERE FOLDED, EXCEPT ANY IT SKIPPED: ledger verify --repair ADDS THOSE
+        folded_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        connection.execute(text(
+            "UPDATE wallet_ledger SET folded_at = :folded_at WHERE kind = 'creator_credit'"
+            " AND id <= COALESCE((SELECT position FROM ledger_cursor WHERE name = 'creator_credits'), 0)"
+        ), {"folded_at": folded_at})
+    if 'snapshot_id' not in existing:
+        connection.execute(text("ALTER TABLE wallet_ledger ADD COLUMN snapshot_id INTEGER"))
+        # OLD SNAPSHOTS MAY MISS SKIPPED ENTRIES, THE NEXT RUN SNAPSHOTS THE WHOLE HISTORY AGAIN
+        connection.execute(text("DELETE FROM wallet_snapshot"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_wallet_ledger_unfolded ON wallet_ledger (id)"
+        " WHERE kind = 'creator_credit' AND folded_at IS NULL"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_wallet_ledger_unsnapshotted ON wallet_ledger (user_id)"
+        " WHERE snapshot_id IS NULL AND user_id IS NOT NULL"
+    ))
@@ -1,5 +1,7 @@
 from datetime import datetime, timezone
 
+from sqlalchemy import event, insert, text
+
 from extensions import db
 
 
@@ -16,6 +18,10 @@ class User(db.Model):
 
 class Auction(db.Model):
     __tablename__ = 'auction'
+    __table_args__ = (
+        db.Index('ix_auction_status_expires', 'status', 'expires_at'),
+        db.Index('ix_auction_settled_expires', 'settled_at', 'expires_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -25,9 +31,15 @@ class Auction(db.Model):
     expires_at = db.Column(db.DateTime, nullable=False)
     winner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     creator_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    item_value = db.Column(db.Float, nullable=True)
-    pool_prize = db.Column(db.Float, default=0.0)
+    # MONEY COLUMNS ARE INTEGER CENTS, SEE money.py
+    item_value = db.Column(db.BigInteger, nullable=True)
+    pool_prize = db.Column(db.BigInteger, default=0)
     pool_distributed = db.Column(db.Boolean, default=False)
+    total_bid_amount = db.Column(db.BigInteger, nullable=False, default=0)
+    bid_count = db.Column(db.Integer, nullable=False, default=0)
+    threshold_reached_at = db.Column(db.DateTime, nullable=True)
+    # SET WHEN THE WINNER IS RECORDED AND THE POOL PRIZE PAID, SEE services/settlement.py
+    settled_at = db.Column(db.DateTime, nullable=True)
     bids = db.relationship('Bid', backref='auction', lazy=True)
     creator = db.relationship('User', foreign_keys=[creator_id], backref='created_auctions')
     pool_winners = db.relationship('PoolPrizeWinner', backref='auction', lazy=True)
@@ -40,10 +52,15 @@ class Auction(db.Model):
 
 class Bid(db.Model):
     __tablename__ = 'bid'
+    __table_args__ = (
+        db.Index('ix_bid_auction_amount', 'auction_id', 'amount'),
+        # COVERS A USER'S OWN BID HISTORY, NEWEST FIRST, WITHOUT READING THE TABLE
+        db.Index('ix_bid_auction_user_bids', 'auction_id', 'user_id', 'id', 'amount', 'is_unique', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     auction_id = db.Column(db.Integer, db.ForeignKey('auction.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)
     is_unique = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -53,11 +70,73 @@ class Bid(db.Model):
             self.created_at = self.created_at.replace(tzinfo=timezone.utc)
 
 
+class AuctionBidder(db.Model):
+    """
+    Per-auction bid count of each bidder, maintained by place_bid
+    Rank order is more bids first, then the earlier first bid.
+    """
+    __tablename__ = 'auction_bidder'
+    __table_args__ = (
+        db.Index('ix_auction_bidder_rank', 'auction_id', db.desc('bid_count'), 'first_bid_id'),
+    )
+    auction_id = db.Column(db.Integer, db.ForeignKey('auction.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    bid_count = db.Column(db.Integer, nullable=False, default=0)
+    first_bid_id = db.Column(db.Integer, nullable=False)
+
+
+class BidTicket(db.Model):
+    """
+    A bid accepted in queued mode, with the bidder already debited
+    The queue worker applies pending tickets per auction in id (arrival) order
+    and records the resulting bid. See services/bid_queue.py.
+    """
+    __tablename__ = 'bid_ticket'
+    __table_args__ = (
+        db.Index('ix_bid_ticket_status_auction', 'status', 'auction_id', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    auction_id = db.Column(db.Integer, db.ForeignKey('auction.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)
+    # pending, applied, or rejected and refunded when the auction was closed to it
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    # THE BID COUNTS AS PLACED AT THIS TIME, EVEN WHEN APPLIED AFTER THE AUCTION EXPIRED
+    accepted_at = db.Column(db.DateTime, nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=True)
+    bid_id = db.Column(db.Integer, db.ForeignKey('bid.id'), nullable=True)
+
+
+class AuctionArchive(db.Model):
+    """
+    Summary of a settled auction whose bids were moved out of the bid table
+    The bids themselves are one block of a columnar segment file under
+    ARCHIVE_DIR, at `block_offset` in `segment`. See services/archive.py.
+    """
+    __tablename__ = 'auction_archive'
+    auction_id = db.Column(db.Integer, db.ForeignKey('auction.id'), primary_key=True)
+    # NULL FOR AN AUCTION WITHOUT BIDS
+    segment = db.Column(db.String(120), nullable=True)
+    block_offset = db.Column(db.BigInteger, nullable=False, default=0)
+    block_length = db.Column(db.Integer, nullable=False, default=0)
+    bid_count = db.Column(db.Integer, nullable=False)
+    bidder_count = db.Column(db.Integer, nullable=False)
+    unique_count = db.Column(db.Integer, nullable=False)
+    total_amount = db.Column(db.BigInteger, nullable=False)
+    winning_bid_id = db.Column(db.Integer, nullable=True)
+    winning_user_id = db.Column(db.Integer, nullable=True)
+    winning_amount = db.Column(db.BigInteger, nullable=True)
+    winning_created_at = db.Column(db.DateTime, nullable=True)
+    # [[bucket number, bid count], ...] AT HISTOGRAM_BUCKET_CENTS
+    histogram = db.Column(db.JSON, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
 class Wallet(db.Model):
     __tablename__ = 'wallet'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), unique=True, nullable=False)
-    balance = db.Column(db.Float, default=1000.0)
+    balance = db.Column(db.BigInteger, default=100000)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
@@ -65,13 +144,78 @@ class Wallet(db.Model):
         super(Wallet, self).__init__(**kwargs)
 
 
+class WalletLedger(db.Model):
+    """
+    Insert-only record of every money movement, amounts in signed cents
+    user_id is NULL for movements into or out of an auction's pool rather
+    than a wallet. See services/ledger.py.
+    """
+    __tablename__ = 'wallet_ledger'
+    __table_args__ = (
+        db.Index('ix_wallet_ledger_user', 'user_id', 'id'),
+        db.Index('ix_wallet_ledger_kind', 'kind', 'id'),
+        db.Index('ix_wallet_ledger_unfolded', 'id',
+                 sqlite_where=text("kind = 'creator_credit' AND folded_at IS NULL"),
+                 postgresql_where=text("kind = 'creator_credit' AND folded_at IS NULL")),
+        db.Index('ix_wallet_ledger_unsnapshotted', 'user_id',
+                 sqlite_where=text("snapshot_id IS NULL AND user_id IS NOT NULL"),
+                 postgresql_where=text("snapshot_id IS NULL AND user_id IS NOT NULL")),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    auction_id = db.Column(db.Integer, db.ForeignKey('auction.id'), nullable=True)
+    # opening_balance, top_up, bid_debit, bid_refund, creator_credit, pool_contribution, prize_payout
+    kind = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    # SET WHEN A CREATOR CREDIT IS ADDED TO THE WALLET, AND WHEN THE ENTRY IS IN A SNAPSHOT
+    folded_at = db.Column(db.DateTime, nullable=True)
+    snapshot_id = db.Column(db.Integer, nullable=True)
+
+
+class WalletSnapshot(db.Model):
+    """
+    A wallet's ledger balance including every entry whose snapshot_id is at
+    most ledger_id. ledger_id grows with each snapshot run.
+    """
+    __tablename__ = 'wallet_snapshot'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    ledger_id = db.Column(db.Integer, primary_key=True)
+    balance = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class LedgerCursor(db.Model):
+    """
+    A background job's position, e.g. the id of the latest snapshot run
+    """
+    __tablename__ = 'ledger_cursor'
+    name = db.Column(db.String(40), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+
+@event.listens_for(Wallet, 'after_insert')
+def _record_opening_balance(mapper, connection, wallet):
+    # NEW WALLETS START WITH A BALANCE, THE LEDGER MUST START FROM IT TOO
+    if wallet.balance:
+        connection.execute(insert(WalletLedger.__table__).values(
+            user_id=wallet.user_id,
+            kind='opening_balance',
+            amount=wallet.balance,
+            created_at=datetime.now(timezone.utc)
+        ))
+
+
 class PoolPrizeWinner(db.Model):
     __tablename__ = 'pool_prize_winner'
+    __table_args__ = (
+        db.Index('ix_pool_prize_winner_auction_rank', 'auction_id', 'rank'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     auction_id = db.Column(db.Integer, db.ForeignKey('auction.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     rank = db.Column(db.Integer, nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)
     percentage = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
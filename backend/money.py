@@ -0,0 +1,34 @@
+"""
+Money helpers - amounts are stored and computed as integer cents
+
+The API keeps speaking decimal currency units (12.5 means $12.50), so values
+are converted once on the way in and once on the way out.
+"""
+import math
+
+CENTS_PER_UNIT = 100
+BID_STEP_CENTS = 10
+
+
+def to_cents(value, step=1):
+    """
+    Convert a currency amount to integer cents
+    Raises:
+        ValueError if the amount is not a whole multiple of `step` cents
+    """
+    scaled = float(value) * CENTS_PER_UNIT
+    if not math.isfinite(scaled):
+        raise ValueError(f"Amount {value} is not a finite number")
+    cents = round(scaled)
+    if abs(scaled - cents) > 1e-6 or cents % step != 0:
+        raise ValueError(f"Amount {value} is not a multiple of {step} cent(s)")
+    return cents
+
+
+def from_cents(cents):
+    """
+    Convert integer cents back to a currency amount for JSON responses
+    """
+    if cents is None:
+        return None
+    return cents / CENTS_PER_UNIT
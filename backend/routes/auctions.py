@@ -2,125 +2,276 @@
 Auctions API Blueprint - Handles all auction-related endpoints
 
 This module provides the following endpoints:
-- GET /api/auctions/ - List all auctions
+- GET /api/auctions/ - List auctions, paginated with a cursor
 - GET /api/auctions/<id> - Get details for a specific auction
 - POST /api/auctions/ - Create a new auction
 - GET /api/auctions/<id>/bids - Get all bids for an auction
+- GET /api/auctions/<id>/distribution - Get aggregated bid distribution for an auction
+- GET /api/auctions/<id>/events - Stream live auction updates (Server-Sent Events)
 - GET /api/auctions/<id>/pool - Get pool prize information for an auction
 """
-from flask import Blueprint, request, jsonify
-from extensions import db
+from flask import Blueprint, Response, request, jsonify, make_response, abort
+from extensions import db, uniqueness, expiry_scheduler, event_hub, cache
+from services.events import STREAM_ENVIRON_KEY, format_sse
+from services import archive, leaderboard
+from services.responses import validators, not_modified, conditional
+from services.settlement import POOL_PRIZE_PERCENTAGES, split_pool_prize
+from money import to_cents, from_cents
 from models import Auction, Bid, User, PoolPrizeWinner, Wallet
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone
-from sqlalchemy import func
-from routes.winners import recalc_bid_uniqueness
+from sqlalchemy import func, or_
 
 auctions_bp = Blueprint('auctions', __name__)
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def _usernames(user_ids):
+    """
+    Returns:
+        Dict of user_id -> username, loaded in one query
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    return dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all())
+
+def _ttl_until(expires_at, current_time):
+    """
+    Cache lifetime that ends by the given deadline, so no cached entry
+    shows an auction as active after it expired
+    """
+    if expires_at is None:
+        return cache.default_ttl
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    seconds = (expires_at - current_time).total_seconds()
+    if seconds <= 0:
+        return cache.default_ttl
+    return max(1, min(cache.default_ttl, int(seconds)))
+
 @auctions_bp.route('/', methods=['GET'])
 def get_auctions():
     """
-    Get all auctions
+    Get a page of auctions, newest first
+    Query parameters:
+        limit - page size (default 20, max 100)
+        cursor - next_cursor value from the previous page
+        status - only 'active' or 'expired' auctions
+        expires_after / expires_before - ISO datetimes bounding expires_at
     Returns:
-        List of all auctions with their details
+        Auctions on this page and the cursor for the next page
     """
-    auctions = Auction.query.all()
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor', type=int)
+        expires_after = request.args.get('expires_after')
+        expires_before = request.args.get('expires_before')
+        expires_after = datetime.fromisoformat(expires_after) if expires_after else None
+        expires_before = datetime.fromisoformat(expires_before) if expires_before else None
+    except ValueError:
+        return jsonify({"message": "Invalid pagination or filter parameters"}), 400
+
+    status = request.args.get('status')
+    if status not in (None, 'active', 'expired'):
+        return jsonify({"message": "Invalid status filter"}), 400
+
+    cache_key = f"page:{limit}:{cursor}:{status}:{expires_after}:{expires_before}"
+    found = validators('auctions', parts=(cache_key,))
+    response = not_modified(found)
+    if response:
+        return response
+
     current_time = datetime.now(timezone.utc)
-    
+    page = cache.get_or_set('auctions', cache_key, lambda: _load_auction_page(
+        limit, cursor, status, expires_after, expires_before, current_time
+    ), ttl=lambda page: _ttl_until(_next_expiry(current_time), current_time))
+    return conditional(make_response(jsonify(page), 200), found)
+
+def _next_expiry(current_time):
+    """
+    Earliest upcoming deadline of any active auction, when listing pages
+    next change without a write
+    """
+    return db.session.query(func.min(Auction.expires_at)).filter(
+        Auction.status == 'active',
+        Auction.expires_at > current_time
+    ).scalar()
+
+def _load_auction_page(limit, cursor, status, expires_after, expires_before, current_time):
+    """
+    Returns:
+        Page of auctions as served by get_auctions
+    """
+    # CREATOR USERNAME COMES FROM THE SAME QUERY
+    query = db.session.query(Auction, User.username).outerjoin(
+        User, User.id == Auction.creator_id
+    )
+
+    if cursor is not None:
+        query = query.filter(Auction.id < cursor)
+    if status == 'active':
+        query = query.filter(Auction.status == 'active', Auction.expires_at > current_time)
+    elif status == 'expired':
+        query = query.filter(or_(Auction.status != 'active', Auction.expires_at <= current_time))
+    if expires_after:
+        query = query.filter(Auction.expires_at >= expires_after)
+    if expires_before:
+        query = query.filter(Auction.expires_at < expires_before)
+
+    # FETCH ONE EXTRA ROW TO KNOW IF THERE IS A NEXT PAGE
+    rows = query.order_by(Auction.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
     result = []
-    for auction in auctions:
+    for auction, creator_username in rows:
         # TIMEZONE VERIFICATION
         expires_at = auction.expires_at.replace(tzinfo=timezone.utc) if auction.expires_at.tzinfo is None else auction.expires_at
-        
-        # STATUS UPDATE
-        if current_time > expires_at and auction.status != 'expired':
-            auction.status = 'expired'
-            db.session.add(auction)
-        
-        creator = User.query.get(auction.creator_id)
-        creator_username = creator.username if creator else f"User #{auction.creator_id}"
+
+        # EXPIRED AUCTIONS ARE REPORTED AS SUCH WITHOUT WRITING FROM A GET
+        auction_status = 'expired' if current_time > expires_at and auction.status == 'active' else auction.status
+
         result.append({
             "id": auction.id,
             "title": auction.title,
             "description": auction.description,
             "starting_price": auction.starting_price,
-            "status": auction.status,
+            "status": auction_status,
             "created_at": auction.created_at.isoformat(),
             "expires_at": auction.expires_at.isoformat(),
             "winner_id": auction.winner_id,
             "creator_id": auction.creator_id,
-            "creator_username": creator_username,
-            "item_value": auction.item_value
+            "creator_username": creator_username or f"User #{auction.creator_id}",
+            "item_value": from_cents(auction.item_value)
         })
-    
-    # IF AUCTION EXPIRED, COMMIT CHANGES
-    if any(auction.status == 'expired' for auction in auctions):
-        db.session.commit()
-    
-    return jsonify(result), 200
+
+    return {
+        "auctions": result,
+        "next_cursor": rows[-1][0].id if has_more else None
+    }
 
 @auctions_bp.route('/<int:auction_id>', methods=['GET'])
 @jwt_required()
 def get_auction(auction_id):
     """
     Get details for a specific auction
+    Query parameters:
+        bids_limit - page size of the user's bids (default 20, max 100)
+        bids_cursor - bids_next_cursor value from the previous page
     Returns:
-        Auction details including user's bids and winning bid info
+        Auction details including a page of the user's bids, newest first,
+        and winning bid info
     """
-    current_user_id = get_jwt_identity()
-    auction = Auction.query.get_or_404(auction_id)
+    try:
+        bids_limit = min(max(int(request.args.get('bids_limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        bids_cursor = request.args.get('bids_cursor', type=int)
+    except ValueError:
+        return jsonify({"message": "Invalid pagination parameters"}), 400
+
+    current_user_id = int(get_jwt_identity())
     current_time = datetime.now(timezone.utc)
+    namespace = f'auction:{auction_id}'
+
+    found = validators(namespace, parts=('detail', current_user_id, bids_limit, bids_cursor))
+    response = not_modified(found)
+    if response:
+        return response
+
+    # SHARED BY ALL VIEWERS, USER SPECIFIC FIELDS ARE ADDED BELOW
+    detail = cache.get_or_set(namespace, 'detail', lambda: _load_auction_detail(auction_id, current_time),
+                              ttl=lambda detail: _detail_ttl(detail, current_time))
+    if detail is None:
+        abort(404)
+    user_bids, bids_next_cursor = cache.get_or_set(
+        namespace, f'bids:{current_user_id}:{bids_limit}:{bids_cursor}',
+        lambda: _load_user_bids(auction_id, current_user_id, bids_limit, bids_cursor),
+        ttl=_detail_ttl(detail, current_time)
+    )
+
+    lowest_unique_bid_info = None
+    if detail["lowest_unique_bid"]:
+        lowest_unique_bid_info = dict(
+            detail["lowest_unique_bid"],
+            is_users_bid=detail["lowest_unique_bid"]["user_id"] == current_user_id
+        )
+
+    # THE WINNING BID COMES FROM THE UNIQUENESS INDEX, NOT FROM SCANNING BIDS
+    winning_bid_id = lowest_unique_bid_info["bid_id"] if lowest_unique_bid_info else None
+    bids = [dict(bid, is_winner=bid["id"] == winning_bid_id) for bid in user_bids]
+
+    result = dict(detail, bids=bids, bids_next_cursor=bids_next_cursor, lowest_unique_bid=lowest_unique_bid_info)
+    return conditional(make_response(jsonify(result), 200), found)
+
+def _detail_ttl(detail, current_time):
+    if detail['status'] != 'active':
+        return None
+    return _ttl_until(datetime.fromisoformat(detail['expires_at']), current_time)
+
+def _load_auction_detail(auction_id, current_time):
+    """
+    Returns:
+        The viewer independent part of get_auction, or None if not found
+    """
+    auction = db.session.get(Auction, auction_id)
+    if auction is None:
+        return None
     expires_at = auction.expires_at.replace(tzinfo=timezone.utc) if auction.expires_at.tzinfo is None else auction.expires_at
 
-    # STATUS UPDATE
-    if current_time > expires_at and auction.status != 'expired':
-        auction.status = 'expired'
-        db.session.commit()
+    # EXPIRY IS WRITTEN BY THE SCHEDULER, ONLY REPORT IT HERE
+    auction_status = 'expired' if current_time > expires_at and auction.status == 'active' else auction.status
 
     # FIND LOWEST UNIQUE BIDDER AMONGST USERS
-    recalc_bid_uniqueness(auction)
-
     lowest_unique_bid_info = None
-    unique_bids = [bid for bid in auction.bids if bid.is_unique]
-    if unique_bids:
-        lowest_unique_bid = min(unique_bids, key=lambda b: b.amount)
+    lowest_unique_bid = uniqueness.sync(auction.id, auction.bid_count).lowest()
+    if lowest_unique_bid:
         winner_user = User.query.get(lowest_unique_bid.user_id)
         lowest_unique_bid_info = {
-            "bid_id": lowest_unique_bid.id,
+            "bid_id": lowest_unique_bid.bid_id,
             "user_id": lowest_unique_bid.user_id,
-            "username": winner_user.username,
-            "is_users_bid": lowest_unique_bid.user_id == int(current_user_id)
+            "username": winner_user.username
         }
 
-    # FILTER ONLY USER'S BIDS
-    bids = []
-    for bid in auction.bids:
-        if bid.user_id == int(current_user_id):
-            is_winner = lowest_unique_bid_info and bid.id == lowest_unique_bid_info["bid_id"]
-            bids.append({
-                "id": bid.id,
-                "user_id": bid.user_id,
-                "amount": bid.amount,
-                "is_unique": bid.is_unique,
-                "is_winner": is_winner,
-                "created_at": bid.created_at.isoformat()
-            })
-            
-    result = {
+    return {
         "id": auction.id,
         "title": auction.title,
         "description": auction.description,
         "starting_price": auction.starting_price,
-        "status": auction.status,
+        "status": auction_status,
         "created_at": auction.created_at.isoformat(),
         "expires_at": auction.expires_at.isoformat(),
         "winner_id": auction.winner_id,
         "creator_id": auction.creator_id,
-        "bids": bids,
         "lowest_unique_bid": lowest_unique_bid_info
     }
-    return jsonify(result), 200
+
+def _load_user_bids(auction_id, user_id, limit, cursor):
+    """
+    Read a page of the user's bids on the auction from ix_bid_auction_user_bids,
+    as plain rows rather than ORM objects, or from the archive once settled
+    Returns:
+        (bids newest first, cursor for the next page or None)
+    """
+    archived = archive.archived(auction_id)
+    if archived is not None:
+        rows = archive.user_bids(archived, user_id, limit + 1, cursor)
+    else:
+        query = db.session.query(Bid.id, Bid.amount, Bid.is_unique, Bid.created_at).filter(
+            Bid.auction_id == auction_id, Bid.user_id == user_id
+        )
+        if cursor is not None:
+            query = query.filter(Bid.id < cursor)
+        rows = query.order_by(Bid.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return [{
+        "id": bid_id,
+        "user_id": user_id,
+        "amount": from_cents(amount),
+        "is_unique": is_unique,
+        "created_at": created_at.isoformat()
+    } for bid_id, amount, is_unique, created_at in rows], rows[-1][0] if has_more else None
 
 @auctions_bp.route('/<int:auction_id>/bids', methods=['GET'])
 @jwt_required()
@@ -130,14 +281,154 @@ def get_auction_bids(auction_id):
     Returns:
         List of all bids for the auction
     """
-    auction = Auction.query.get_or_404(auction_id)
+    found = validators(f'auction:{auction_id}', parts=('bids',))
+    response = not_modified(found)
+    if response:
+        return response
+
+    if db.session.get(Auction, auction_id) is None:
+        abort(404)
+    archived = archive.archived(auction_id)
+    if archived is not None:
+        archived_bids = archive.bids(archived)
+        usernames = _usernames(user_id for _, _, user_id in archived_bids)
+        rows = [(amount, created_at, user_id, usernames.get(user_id))
+                for amount, created_at, user_id in archived_bids]
+    else:
+        # USERNAMES FROM THE SAME QUERY, DATETIMES ARE LEFT TO THE JSON ENCODER
+        rows = db.session.query(Bid.amount, Bid.created_at, Bid.user_id, User.username).outerjoin(
+            User, User.id == Bid.user_id
+        ).filter(Bid.auction_id == auction_id).order_by(Bid.id).all()
     all_bids = [{
-        "amount": bid.amount,
-        "created_at": bid.created_at.isoformat(),
-        "user_id": bid.user_id,
-        "username": User.query.get(bid.user_id).username if User.query.get(bid.user_id) else f"User #{bid.user_id}"
-    } for bid in auction.bids]
-    return jsonify(all_bids), 200
+        "amount": from_cents(amount),
+        "created_at": created_at,
+        "user_id": user_id,
+        "username": username or f"User #{user_id}"
+    } for amount, created_at, user_id, username in rows]
+    return conditional(make_response(jsonify(all_bids), 200), found)
+
+@auctions_bp.route('/<int:auction_id>/distribution', methods=['GET'])
+@jwt_required()
+def get_bid_distribution(auction_id):
+    """
+    Get the bid distribution of an auction without listing individual bids
+    Query parameters:
+        bucket - width of each amount bucket (default 10)
+        top - number of top bidders to include (default 10, max 100)
+    Returns:
+        Bid count per amount bucket and per-user bid counts, with an ETag
+        that only changes when the auction does
+    """
+    try:
+        bucket_cents = to_cents(request.args.get('bucket', 10))
+        top = min(max(int(request.args.get('top', 10)), 1), 100)
+        if bucket_cents <= 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "Invalid bucket or top parameter"}), 400
+
+    # VERSION CHECK BEFORE ANY QUERY
+    found = validators(f'auction:{auction_id}', parts=('distribution', bucket_cents, top))
+    response = not_modified(found)
+    if response:
+        return response
+
+    distribution = cache.get_or_set(
+        f'auction:{auction_id}', f'distribution:{bucket_cents}:{top}',
+        lambda: _load_bid_distribution(auction_id, bucket_cents, top)
+    )
+    if distribution is None:
+        abort(404)
+
+    return conditional(make_response(jsonify(distribution), 200), found)
+
+def _load_bid_distribution(auction_id, bucket_cents, top):
+    """
+    Returns:
+        Bucketed bid counts and top bidders, or None if the auction does not exist
+    """
+    auction = db.session.get(Auction, auction_id)
+    if auction is None:
+        return None
+
+    archived = archive.archived(auction_id)
+    if archived is not None:
+        buckets = archive.bucket_counts(archived, bucket_cents)
+    else:
+        bucket = Bid.amount // bucket_cents
+        buckets = db.session.query(
+            bucket,
+            func.count(Bid.id)
+        ).filter(
+            Bid.auction_id == auction_id
+        ).group_by(bucket).order_by(bucket).all()
+
+    top_bidders = leaderboard.top(auction_id, top)
+    usernames = _usernames(user_id for _, user_id, _ in top_bidders)
+
+    return {
+        "auction_id": auction.id,
+        "bid_count": auction.bid_count,
+        "bucket_size": from_cents(bucket_cents),
+        "buckets": [{
+            "start": from_cents(bucket_number * bucket_cents),
+            "count": count
+        } for bucket_number, count in buckets],
+        "top_bidders": [{
+            "user_id": user_id,
+            "username": usernames.get(user_id),
+            "bid_count": count
+        } for _, user_id, count in top_bidders]
+    }
+
+@auctions_bp.route('/<int:auction_id>/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def get_auction_events(auction_id):
+    """
+    Stream live updates for an auction as Server-Sent Events
+    EventSource cannot send headers, so the token may be passed as ?jwt=
+    Returns:
+        A 'snapshot' event, then a 'bid' event for every bid placed
+    """
+    current_user_id = int(get_jwt_identity())
+    auction = Auction.query.get_or_404(auction_id)
+
+    # UNDER serve.py THE STREAM GETS A THREAD OUTSIDE THE REQUEST POOL, IF THE WORKER HAS ONE LEFT
+    begin_stream = request.environ.get(STREAM_ENVIRON_KEY)
+    if begin_stream is not None and not begin_stream():
+        response = jsonify({"message": "Too many live streams, please retry shortly"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    # SUBSCRIBE BEFORE THE SNAPSHOT SO NO BID FALLS IN BETWEEN
+    subscriber = event_hub.subscribe(auction_id)
+    index = uniqueness.sync(auction_id, auction.bid_count)
+    lowest_unique_bid = index.lowest()
+    snapshot = {
+        "bid_count": index.bid_count,
+        "pool_prize": from_cents(auction.pool_prize),
+        "lowest_unique_user_id": lowest_unique_bid.user_id if lowest_unique_bid else None
+    }
+
+    def personalize(event, data):
+        # NEVER SEND OTHER USERS' IDS, ONLY WHETHER THIS VIEWER IS WINNING
+        data = dict(data)
+        data["is_lowest_unique_bidder"] = data.pop("lowest_unique_user_id", None) == current_user_id
+        # QUEUED BIDS: TELL THE BIDDER WHICH OF THEIR TICKETS WAS APPLIED
+        bidder_id = data.pop("user_id", None)
+        ticket_id = data.pop("ticket_id", None)
+        if ticket_id is not None and bidder_id == current_user_id:
+            data["ticket_id"] = ticket_id
+        return data
+
+    def generate():
+        yield format_sse('snapshot', personalize('snapshot', snapshot))
+        yield from event_hub.stream(auction_id, subscriber, personalize)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 @auctions_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -160,10 +451,10 @@ def create_auction():
     item_value = data.get('item_value')
     if item_value is not None:
         try:
-            item_value = float(item_value)
+            item_value = to_cents(item_value)
             if item_value <= 0:
                 return jsonify({"message": "Item value must be positive"}), 400
-        except ValueError:
+        except (TypeError, ValueError):
             return jsonify({"message": "Invalid item value"}), 400
 
     new_auction = Auction(
@@ -177,68 +468,82 @@ def create_auction():
     )
     db.session.add(new_auction)
     db.session.commit()
+    expiry_scheduler.schedule(new_auction.id, new_auction.expires_at)
+    cache.invalidate('auctions')
     return jsonify({"id": new_auction.id, "message": "Auction created"}), 201
 
 @auctions_bp.route('/<int:auction_id>/pool', methods=['GET'])
 @jwt_required()
 def get_pool_info(auction_id):
     """
-    Get pool prize information for an auction   
+    Get pool prize information for an auction
     Returns:
-        Pool prize information including top bidders and winners
+        Pool prize information including top bidders, the current user's
+        rank and bids needed to reach the prize places, and winners
     """
-    auction = Auction.query.get_or_404(auction_id)
-    
-    top_bidders_query = db.session.query(
-        Bid.user_id,
-        func.count(Bid.id).label('bid_count'),
-        User.username
-    ).join(User).filter(
-        Bid.auction_id == auction_id
-    ).group_by(
-        Bid.user_id, User.username
-    ).order_by(
-        func.count(Bid.id).desc()
-    ).limit(3).all()
-    
-    top_bidders = []
-    
-    for i, (user_id, bid_count, username) in enumerate(top_bidders_query):
-        potential_percentage = 0
-        if i == 0:
-            potential_percentage = 60
-        elif i == 1:
-            potential_percentage = 30
-        elif i == 2:
-            potential_percentage = 10
-            
-        potential_amount = (auction.pool_prize * potential_percentage / 100) if auction.pool_prize else 0
-        
-        top_bidders.append({
-            "user_id": user_id,
-            "username": username,
-            "bid_count": bid_count,
-            "rank": i + 1,
-            "potential_percentage": potential_percentage,
-            "potential_amount": potential_amount
-        })
-    
+    current_user_id = int(get_jwt_identity())
+    namespace = f'auction:{auction_id}'
+
+    found = validators(namespace, parts=('pool', current_user_id))
+    response = not_modified(found)
+    if response:
+        return response
+
+    pool_info = cache.get_or_set(namespace, 'pool', lambda: _load_pool_info(auction_id))
+    if pool_info is None:
+        abort(404)
+    standing = cache.get_or_set(namespace, f'standing:{current_user_id}', lambda: leaderboard.standing(
+        auction_id, current_user_id, len(POOL_PRIZE_PERCENTAGES)
+    ))
+
+    return conditional(make_response(jsonify(dict(pool_info, your_standing=standing)), 200), found)
+
+def _load_pool_info(auction_id):
+    """
+    Returns:
+        The viewer independent part of get_pool_info, or None if not found
+    """
+    auction = db.session.get(Auction, auction_id)
+    if auction is None:
+        return None
+
+    # LEADERBOARD ORDER AND SPLIT ARE THE ONES SETTLEMENT PAYS OUT WITH
+    podium = leaderboard.top(auction_id, len(POOL_PRIZE_PERCENTAGES))
+    usernames = _usernames(user_id for _, user_id, _ in podium)
+    shares = split_pool_prize(auction.pool_prize or 0, [user_id for _, user_id, _ in podium])
+
+    top_bidders = [{
+        "user_id": user_id,
+        "username": usernames.get(user_id),
+        "bid_count": bid_count,
+        "rank": rank,
+        "potential_percentage": percentage,
+        "potential_amount": from_cents(amount)
+    } for (rank, user_id, bid_count), (_, _, percentage, amount) in zip(podium, shares)]
+
     winners = []
     if auction.pool_distributed:
-        pool_winners = PoolPrizeWinner.query.filter_by(auction_id=auction_id).order_by(PoolPrizeWinner.rank).all()
+        pool_winners = db.session.query(PoolPrizeWinner, User.username).join(
+            User, User.id == PoolPrizeWinner.user_id
+        ).filter(
+            PoolPrizeWinner.auction_id == auction_id
+        ).order_by(PoolPrizeWinner.rank).all()
         winners = [{
             "user_id": winner.user_id,
-            "username": User.query.get(winner.user_id).username,
+            "username": username,
             "rank": winner.rank,
             "percentage": winner.percentage,
-            "amount": winner.amount
-        } for winner in pool_winners]
-    
-    return jsonify({
+            "amount": from_cents(winner.amount)
+        } for winner, username in pool_winners]
+
+    return {
         "auction_id": auction.id,
-        "item_value": auction.item_value,
-        "pool_prize": auction.pool_prize,
+        "item_value": from_cents(auction.item_value),
+        "pool_prize": from_cents(auction.pool_prize),
+        "total_bid_amount": from_cents(auction.total_bid_amount),
+        "bid_count": auction.bid_count,
+        "threshold_reached": auction.threshold_reached_at is not None,
         "pool_distributed": auction.pool_distributed,
         "top_bidders": top_bidders,
         "winners": winners if auction.pool_distributed else []
-    }), 200
\ No newline at end of file
+    }
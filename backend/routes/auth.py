@@ -4,15 +4,26 @@ Authentication API Blueprint - Handles user registration and login
 This module provides the following endpoints:
 - POST /api/auth/register - Register new users with automatic wallet creation
 - POST /api/auth/login - Authenticate users and issue JWT tokens
+
+Password hashing runs on the bounded pool in services/passwords.py. When it
+is saturated both endpoints answer 503 with Retry-After. A client address
+beyond its budget gets 429 with Retry-After (see services/ratelimit.py).
 """
 from flask import Blueprint, request, jsonify
-from extensions import db, bcrypt
+from extensions import db, password_hasher, rate_limiter
 from models import User, Wallet
+from services.passwords import PasswordHasherBusy
 from flask_jwt_extended import create_access_token
 
 auth_bp = Blueprint('auth', __name__)
 
+def _busy():
+    response = jsonify({"message": "Too many sign-ins right now, please retry shortly"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
+@rate_limiter.limit('register')
 def register():
     """
     Register a new user
@@ -31,7 +42,11 @@ def register():
         return jsonify({"message": "Email already exists"}), 400
     
     try:
-        hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        hashed_password = password_hasher.hash(data['password'])
+    except PasswordHasherBusy:
+        return _busy()
+
+    try:
         new_user = User(
             username=data['username'],
             email=data['email'],
@@ -55,6 +70,7 @@ def register():
         return jsonify({"message": f"Error during registration: {str(e)}"}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limiter.limit('login')
 def login():
     """
     Authenticate a user and issue JWT token
@@ -66,7 +82,21 @@ def login():
         return jsonify({"message": "Missing required fields"}), 400
 
     user = User.query.filter_by(email=data['email']).first()
-    if user and bcrypt.check_password_hash(user.password_hash, data['password']):
-        access_token = create_access_token(identity=str(user.id))
-        return jsonify({"token": access_token}), 200
-    return jsonify({"message": "Invalid credentials"}), 401
\ No newline at end of file
+    try:
+        valid = user is not None and password_hasher.check(user.password_hash, data['password'])
+    except PasswordHasherBusy:
+        return _busy()
+    if not valid:
+        return jsonify({"message": "Invalid credentials"}), 401
+
+    # UPGRADE HASHES MADE WITH AN OLD COST FACTOR WHILE THE PASSWORD IS AT HAND
+    if password_hasher.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = password_hasher.hash(data['password'])
+            db.session.commit()
+        except PasswordHasherBusy:
+            # LOGIN STILL SUCCEEDS, A LATER ONE UPGRADES THE HASH
+            pass
+
+    access_token = create_access_token(identity=str(user.id))
+    return jsonify({"token": access_token}), 200
\ No newline at end of file
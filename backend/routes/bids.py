@@ -3,22 +3,187 @@ Bids API Blueprint - Handles bid placement functionality
 
 This module provides the following endpoints:
 - POST /api/bids/ - Place a bid on an auction
+- POST /api/bids/batch - Place several bids on one auction in a single transaction
+- GET /api/bids/tickets/<id> - Result of a bid taken in queued ingestion mode
+
+With BID_INGESTION_MODE = 'queued' both POST endpoints answer 202 with
+tickets and the bids are applied by services/bid_queue.py. Both POST
+endpoints answer 429 with Retry-After beyond the caller's budget (see
+services/ratelimit.py).
 """
-from flask import Blueprint, request, jsonify
-from extensions import db
-from models import Bid, Auction, Wallet, User
+from flask import Blueprint, request, jsonify, current_app
+from extensions import db, uniqueness, metrics, bid_queue, rate_limiter
+from money import to_cents, from_cents, BID_STEP_CENTS
+from models import Bid, Auction, BidTicket, Wallet, User
+from services.bidding import AuctionClosed, debit_wallet, apply_bids, publish_bids
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone
-from decimal import Decimal, ROUND_DOWN, InvalidOperation
 import logging
-from sqlalchemy.exc import IntegrityError
+import time
 from sqlalchemy import func
-from routes.winners import recalc_bid_uniqueness
+from sqlalchemy.exc import IntegrityError, OperationalError
 
 bids_bp = Blueprint('bids', __name__)
 
+MAX_BATCH_SIZE = 100
+
+def _parse_amount(amount):
+    """
+    Returns:
+        (amount in cents, None) or (None, error message)
+    """
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        return None, "Invalid bid amount format"
+
+    if amount <= 0:
+        return None, "Bid amount must be positive"
+
+    # VALIDATE BID AMOUNT (AT MOST ONE DECIMAL)
+    try:
+        return to_cents(amount, step=BID_STEP_CENTS), None
+    except ValueError:
+        return None, "Bid amount must be a whole number or have at most one decimal place"
+
+def _rejected(outcome, bid_count, message, status=400):
+    """
+    Count a rejected bid placement and build its error response
+    """
+    metrics.record_bid(outcome, bid_count)
+    return jsonify({"message": message}), status
+
+def _check_bid_target(user_id, auction_id, total_amount, bid_count=1):
+    """
+    Cheap checks done before opening the write transaction
+    Returns:
+        (auction, None) or (None, error response)
+    """
+    # GET WALLET
+    wallet = Wallet.query.filter_by(user_id=user_id).first()
+    if not wallet:
+        return None, _rejected('wallet_not_found', bid_count, "Wallet not found", 404)
+
+    logging.info(f"Current wallet balance: {from_cents(wallet.balance)}")
+    
+    # CHECK FUNDS
+    if wallet.balance < total_amount:
+        return None, _rejected('insufficient_funds', bid_count, "Insufficient funds in wallet")
+
+    # GET AUCTION AND STATUS
+    auction = Auction.query.get(auction_id)
+    if not auction:
+        return None, _rejected('auction_not_found', bid_count, "Auction not found", 404)
+
+    current_time = datetime.now(timezone.utc)
+    expires_at = auction.expires_at.replace(tzinfo=timezone.utc) if auction.expires_at.tzinfo is None else auction.expires_at
+
+    if current_time > expires_at:
+        return None, _rejected('auction_expired', bid_count, "Auction has expired")
+
+    if auction.status != 'active':
+        return None, _rejected('auction_inactive', bid_count, "Auction is not active")
+
+    # GET CREATOR WALLET OR CREATE ONE IF IT DOESN'T EXIST
+    creator_wallet = Wallet.query.filter_by(user_id=auction.creator_id).first()
+    if not creator_wallet:
+        try:
+            creator_wallet = Wallet(user_id=auction.creator_id)
+            db.session.add(creator_wallet)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            creator_wallet = Wallet.query.filter_by(user_id=auction.creator_id).first()
+            if not creator_wallet:
+                return None, _rejected('error', bid_count, "Error accessing creator wallet", 500)
+
+    return auction, None
+
+def _commit_bids(auction_id, user_id, bid_amounts):
+    """
+    Debit the bidder, split each amount between creator and pool and insert
+    the bids in a single transaction. The bidder's balance and the totals are
+    changed with atomic UPDATEs, so concurrent bids never overwrite each
+    other's writes, and the creator's share is a ledger entry.
+    Must be called while holding the auction's uniqueness lock.
+    Returns:
+        (bids, new_balance, pool_amounts, pool_prize), or None if funds are insufficient
+    """
+    bid_time = datetime.now(timezone.utc)
+
+    new_balance = debit_wallet(user_id, sum(bid_amounts), auction_id)
+    if new_balance is None:
+        db.session.rollback()
+        return None
+
+    placed_bids, pool_amounts, pool_prize = apply_bids(
+        auction_id, [(user_id, bid_amount, bid_time) for bid_amount in bid_amounts]
+    )
+    db.session.commit()
+
+    return placed_bids, new_balance, pool_amounts, pool_prize
+
+def _place_bids(auction_id, user_id, bid_amounts):
+    """
+    Commit bids, retrying on lock errors, then update the uniqueness index
+    and notify live viewers
+    Returns:
+        (bids, new_balance, pool_amounts, pool_prize, lowest_unique_bid), or None if funds are insufficient
+    """
+    attempts = current_app.config['BID_COMMIT_ATTEMPTS']
+
+    # ONE WRITER PER AUCTION IN THIS PROCESS, THE DATABASE LOCK ORDERS WRITERS ACROSS PROCESSES
+    with uniqueness.lock(auction_id):
+        for attempt in range(attempts):
+            try:
+                committed = _commit_bids(auction_id, user_id, bid_amounts)
+                break
+            except OperationalError:
+                # DATABASE LOCKED BY ANOTHER PROCESS, BACK OFF AND RETRY
+                db.session.rollback()
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.01 * 2 ** attempt)
+
+        if committed is None:
+            return None
+        new_bids, new_balance, pool_amounts, pool_prize = committed
+        lowest_unique_bid = publish_bids(auction_id, new_bids, pool_prize)
+
+    return new_bids, new_balance, pool_amounts, pool_prize, lowest_unique_bid
+
+def _queue_bids(auction_id, user_id, bid_amounts):
+    """
+    Take tickets for bids in queued ingestion mode
+    Returns:
+        202 response with the tickets, or an error response
+    """
+    bid_count = len(bid_amounts)
+    outcome, tickets, new_balance = bid_queue.enqueue(auction_id, user_id, bid_amounts)
+    if outcome == 'insufficient_funds':
+        return _rejected(outcome, bid_count, "Insufficient funds in wallet")
+    if outcome == 'auction_expired':
+        return _rejected(outcome, bid_count, "Auction has expired")
+    metrics.record_bid('accepted', bid_count)
+
+    logging.info(f"{bid_count} bid(s) queued. New bidder balance: {from_cents(new_balance)}")
+
+    result = {
+        "message": "Bid queued" if bid_count == 1 else "Bids queued",
+        "status": "pending",
+        "tickets": [{
+            "ticket_id": ticket.id,
+            "amount": from_cents(ticket.amount)
+        } for ticket in tickets],
+        "new_balance": from_cents(new_balance)
+    }
+    if bid_count == 1:
+        result["ticket_id"] = tickets[0].id
+    return jsonify(result), 202
+
 @bids_bp.route('/', methods=['POST'])
 @jwt_required()
+@rate_limiter.limit('bid')
 def place_bid():
     """
     Place a bid on an auction
@@ -28,119 +193,169 @@ def place_bid():
     try:
         data = request.get_json()
         if not data or not all(k in data for k in ('auctionId', 'amount')):
-            return jsonify({"message": "Missing required fields"}), 400
+            return _rejected('invalid', 1, "Missing required fields")
 
-        user_id = get_jwt_identity()
-        amount = float(data['amount'])
+        user_id = int(get_jwt_identity())
         auction_id = int(data['auctionId'])
 
-        logging.info(f"Placing bid: User {user_id}, Amount {amount}, Auction {auction_id}")
+        logging.info(f"Placing bid: User {user_id}, Amount {data['amount']}, Auction {auction_id}")
 
         # BID VALIDATION
-        if amount <= 0:
-            return jsonify({"message": "Bid amount must be positive"}), 400
-
-        # GET WALLET
-        wallet = Wallet.query.filter_by(user_id=user_id).first()
-        if not wallet:
-            return jsonify({"message": "Wallet not found"}), 404
-
-        logging.info(f"Current wallet balance: {wallet.balance}")
-        
-        # CHECK FUNDS
-        if wallet.balance < amount:
-            return jsonify({"message": "Insufficient funds in wallet"}), 400
-
-        # GET AUCTION AND STATUS
-        auction = Auction.query.get(auction_id)
-        if not auction:
-            return jsonify({"message": "Auction not found"}), 404
-
-        current_time = datetime.now(timezone.utc)
-        expires_at = auction.expires_at.replace(tzinfo=timezone.utc) if auction.expires_at.tzinfo is None else auction.expires_at
-
-        if current_time > expires_at:
-            auction.status = 'expired'
-            db.session.commit()
-            return jsonify({"message": "Auction has expired"}), 400
+        amount, error = _parse_amount(data['amount'])
+        if error:
+            return _rejected('invalid', 1, error)
 
-        if auction.status != 'active':
-            return jsonify({"message": "Auction is not active"}), 400
-
-        # VALIDATE BID AMOUNT (AT MOST ONE DECIMAL)
-        try:
-            amount_decimal = Decimal(str(amount))
-            if amount_decimal % 1 != 0:
-                rounded = amount_decimal.quantize(Decimal('0.1'), rounding=ROUND_DOWN)
-                if amount_decimal != rounded:
-                    return jsonify({"message": "Bid amount must be a whole number or have at most one decimal place"}), 400
-        except InvalidOperation:
-            return jsonify({"message": "Invalid bid amount format"}), 400
-
-        # GET CREATOR WALLET OR CREATE ONE IF IT DOESN'T EXIST
-        creator_wallet = Wallet.query.filter_by(user_id=auction.creator_id).first()
-        if not creator_wallet:
-            try:
-                creator_wallet = Wallet(user_id=auction.creator_id)
-                db.session.add(creator_wallet)
-                db.session.flush()
-            except IntegrityError:
-                db.session.rollback()
-                creator_wallet = Wallet.query.filter_by(user_id=auction.creator_id).first()
-                if not creator_wallet:
-                    return jsonify({"message": "Error accessing creator wallet"}), 500
+        auction, error_response = _check_bid_target(user_id, auction_id, amount)
+        if error_response:
+            return error_response
+        if bid_queue.enabled:
+            return _queue_bids(auction_id, user_id, [amount])
 
         # BID CREATION AND WALLET TRANSFERS
         try:
-            wallet.balance -= amount
-            creator_amount = amount
-            pool_amount = 0
-            
-            if auction.item_value is not None and auction.item_value > 0:
-                total_bid = db.session.query(func.sum(Bid.amount)).filter(Bid.auction_id == auction_id).scalar() or 0
-                
-                # TRESHOLD CHECK
-                if total_bid >= auction.item_value:
-                    creator_amount = amount * 0.5
-                    pool_amount = amount * 0.5
-                    auction.pool_prize += pool_amount
-            
-            creator_wallet.balance += creator_amount
-            
-            new_bid = Bid(
-                user_id=user_id,
-                auction_id=auction_id,
-                amount=float(amount_decimal),
-                created_at=datetime.now(timezone.utc)
-            )
-            
-            db.session.add(new_bid)
-            db.session.commit()
-
-            recalc_bid_uniqueness(auction)
-            
-            unique_bids = [bid for bid in auction.bids if bid.is_unique]
-            is_winner = False
-            if unique_bids:
-                lowest_unique_bid = min(unique_bids, key=lambda b: b.amount)
-                is_winner = (lowest_unique_bid.id == new_bid.id)
+            placed = _place_bids(auction_id, user_id, [amount])
+            if placed is None:
+                return _rejected('insufficient_funds', 1, "Insufficient funds in wallet")
+            (new_bid,), new_balance, (pool_amount,), pool_prize, lowest_unique_bid = placed
+            is_winner = bool(lowest_unique_bid) and lowest_unique_bid.bid_id == new_bid.id
+            metrics.record_bid('accepted')
             
-            logging.info(f"Bid placed successfully. New bidder balance: {wallet.balance}, Creator balance: {creator_wallet.balance}")
+            logging.info(f"Bid placed successfully. New bidder balance: {from_cents(new_balance)}")
 
             return jsonify({
                 "message": "Bid placed successfully",
                 "bid_id": new_bid.id,
-                "new_balance": wallet.balance,
+                "new_balance": from_cents(new_balance),
                 "is_winner": is_winner,
-                "pool_contribution": pool_amount if pool_amount > 0 else None,
-                "current_pool": auction.pool_prize if auction.pool_prize > 0 else None
+                "pool_contribution": from_cents(pool_amount) if pool_amount > 0 else None,
+                "current_pool": from_cents(pool_prize) if pool_prize > 0 else None
             }), 201
 
+        except AuctionClosed:
+            db.session.rollback()
+            return _rejected('auction_expired', 1, "Auction has expired")
         except Exception as e:
             db.session.rollback()
             logging.error(f"Error placing bid: {str(e)}")
-            return jsonify({"message": "Error placing bid"}), 500
+            return _rejected('error', 1, "Error placing bid", 500)
 
     except Exception as e:
         logging.error(f"Unexpected error: {str(e)}")
-        return jsonify({"message": "Internal server error"}), 500
\ No newline at end of file
+        return _rejected('error', 1, "Internal server error", 500)
+
+@bids_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@rate_limiter.limit('bid_batch')
+def place_bids_batch():
+    """
+    Place several bids on one auction in a single transaction
+    Request body:
+        {"auctionId": 1, "amounts": [0.1, 0.2, 0.3]}
+    Returns:
+        Per-bid uniqueness and winner status plus the updated wallet balance
+    """
+    try:
+        data = request.get_json()
+        if not data or not all(k in data for k in ('auctionId', 'amounts')):
+            return _rejected('invalid', 1, "Missing required fields")
+
+        user_id = int(get_jwt_identity())
+        auction_id = int(data['auctionId'])
+        if not isinstance(data['amounts'], list) or not data['amounts']:
+            return _rejected('invalid', 1, "Amounts must be a non-empty list")
+        bid_count = len(data['amounts'])
+        if bid_count > MAX_BATCH_SIZE:
+            return _rejected('invalid', bid_count, f"At most {MAX_BATCH_SIZE} bids per batch")
+
+        logging.info(f"Placing {len(data['amounts'])} bids: User {user_id}, Auction {auction_id}")
+
+        # BID VALIDATION, THE WHOLE BATCH IS REJECTED IF ANY AMOUNT IS INVALID
+        amounts = []
+        for raw_amount in data['amounts']:
+            amount, error = _parse_amount(raw_amount)
+            if error:
+                return _rejected('invalid', bid_count, f"{error} ({raw_amount})")
+            amounts.append(amount)
+
+        auction, error_response = _check_bid_target(user_id, auction_id, sum(amounts), bid_count)
+        if error_response:
+            return error_response
+        if bid_queue.enabled:
+            return _queue_bids(auction_id, user_id, amounts)
+
+        try:
+            placed = _place_bids(auction_id, user_id, amounts)
+            if placed is None:
+                return _rejected('insufficient_funds', bid_count, "Insufficient funds in wallet")
+            new_bids, new_balance, pool_amounts, pool_prize, lowest_unique_bid = placed
+            metrics.record_bid('accepted', len(new_bids))
+
+            logging.info(f"{len(new_bids)} bids placed successfully. New bidder balance: {from_cents(new_balance)}")
+
+            return jsonify({
+                "message": "Bids placed successfully",
+                "bids": [{
+                    "bid_id": new_bid.id,
+                    "amount": from_cents(new_bid.amount),
+                    "is_unique": new_bid.is_unique,
+                    "is_winner": bool(lowest_unique_bid) and lowest_unique_bid.bid_id == new_bid.id,
+                    "pool_contribution": from_cents(pool_amount) if pool_amount > 0 else None
+                } for new_bid, pool_amount in zip(new_bids, pool_amounts)],
+                "new_balance": from_cents(new_balance),
+                "current_pool": from_cents(pool_prize) if pool_prize > 0 else None
+            }), 201
+
+        except AuctionClosed:
+            db.session.rollback()
+            return _rejected('auction_expired', bid_count, "Auction has expired")
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error placing bids: {str(e)}")
+            return _rejected('error', bid_count, "Error placing bids", 500)
+
+    except Exception as e:
+        logging.error(f"Unexpected error: {str(e)}")
+        return _rejected('error', 1, "Internal server error", 500)
+
+@bids_bp.route('/tickets/<int:ticket_id>', methods=['GET'])
+@jwt_required()
+def get_ticket(ticket_id):
+    """
+    Poll a bid ticket taken in queued ingestion mode
+    Live viewers get the ticket id on the auction's 'bid' event instead.
+    Returns:
+        Ticket status, and once applied the bid's uniqueness and winner status.
+        A rejected ticket was refunded because the auction closed before it applied.
+    """
+    user_id = int(get_jwt_identity())
+    ticket = db.session.get(BidTicket, ticket_id)
+    if ticket is None or ticket.user_id != user_id:
+        return jsonify({"message": "Ticket not found"}), 404
+
+    result = {
+        "ticket_id": ticket.id,
+        "auction_id": ticket.auction_id,
+        "amount": from_cents(ticket.amount),
+        "status": ticket.status,
+        "accepted_at": ticket.accepted_at.isoformat(),
+        "bid_id": ticket.bid_id
+    }
+    if ticket.status == 'pending':
+        result["queue_position"] = db.session.query(func.count(BidTicket.id)).filter(
+            BidTicket.status == 'pending',
+            BidTicket.auction_id == ticket.auction_id,
+            BidTicket.id < ticket.id
+        ).scalar() + 1
+        return jsonify(result), 200
+    if ticket.status == 'rejected':
+        # THE AUCTION CLOSED BEFORE THE TICKET WAS APPLIED, ITS AMOUNT WAS REFUNDED
+        result["message"] = "Auction has expired"
+        return jsonify(result), 200
+
+    # UNIQUENESS CAN STILL CHANGE UNTIL THE AUCTION ENDS
+    index = uniqueness.sync(ticket.auction_id, db.session.get(Auction, ticket.auction_id).bid_count)
+    lowest_unique_bid = index.lowest()
+    result["applied_at"] = ticket.applied_at.isoformat() if ticket.applied_at else None
+    result["is_unique"] = index.is_unique(ticket.amount)
+    result["is_winner"] = bool(lowest_unique_bid) and lowest_unique_bid.bid_id == ticket.bid_id
+    return jsonify(result), 200
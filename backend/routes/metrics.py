@@ -0,0 +1,20 @@
+"""
+Metrics API Blueprint - Exposes request and database instrumentation
+
+This module provides the following endpoints:
+- GET /metrics - Prometheus text format metrics
+"""
+from flask import Blueprint, Response
+from extensions import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus scrape endpoint
+    Returns:
+        Request latency, SQL statement and timing histograms per endpoint,
+        commit counts and bid placement outcomes
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -10,6 +10,8 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db
 from models import Wallet
+from money import to_cents, from_cents
+from services import ledger
 from sqlalchemy.exc import IntegrityError
 
 wallet_bp = Blueprint('wallet', __name__)
@@ -36,8 +38,12 @@ def get_balance():
             if not wallet:
                 return jsonify({"message": "Error creating wallet"}), 500
     
+    # CREATOR CREDITS NOT YET FOLDED INTO THE BALANCE BY THE LEDGER WORKER
+    pending = ledger.pending_credits([wallet.user_id]).get(wallet.user_id, 0)
+
     return jsonify({
-        "balance": wallet.balance,
+        "balance": from_cents(wallet.balance),
+        "pending_credits": from_cents(pending),
         "updated_at": wallet.updated_at.isoformat()
     }), 200
 
@@ -51,20 +57,18 @@ def add_funds(amount):
     """
     if amount <= 0:
         return jsonify({"message": "Amount must be positive"}), 400
+    try:
+        amount_cents = to_cents(amount)
+    except ValueError:
+        return jsonify({"message": "Amount must have at most two decimal places"}), 400
         
-    user_id = get_jwt_identity()
-    wallet = Wallet.query.filter_by(user_id=user_id).first()
-    
-    if not wallet:
-        wallet = Wallet(user_id=user_id)
-        db.session.add(wallet)
-    
-    wallet.balance += amount
+    user_id = int(get_jwt_identity())
+    new_balance = ledger.top_up(user_id, amount_cents)
     db.session.commit()
     
     return jsonify({
         "message": f"Added ${amount:.2f} to wallet",
-        "new_balance": wallet.balance
+        "new_balance": from_cents(new_balance)
     }), 200
 
 @wallet_bp.route('/admin/add', methods=['POST'])
@@ -89,20 +93,17 @@ def admin_add_funds():
     
     if amount <= 0:
         return jsonify({"message": "Amount must be positive"}), 400
+    try:
+        amount_cents = to_cents(amount)
+    except ValueError:
+        return jsonify({"message": "Amount must have at most two decimal places"}), 400
         
-    wallet = Wallet.query.filter_by(user_id=user_id).first()
-    
-    if not wallet:
-        wallet = Wallet(user_id=user_id)
-        db.session.add(wallet)
-    
-    old_balance = wallet.balance
-    wallet.balance += amount
+    new_balance = ledger.top_up(user_id, amount_cents)
     db.session.commit()
     
     return jsonify({
         "message": f"Added ${amount:.2f} to user {user_id}'s wallet",
         "user_id": user_id,
-        "old_balance": old_balance,
-        "new_balance": wallet.balance
+        "old_balance": from_cents(new_balance - amount_cents),
+        "new_balance": from_cents(new_balance)
     }), 200
\ No newline at end of file
@@ -4,96 +4,48 @@ Winners API Blueprint - Handles winner determination and prize distribution
 This module provides the following endpoints:
 - GET /api/winners/<auction_id> - Get auction winner information
 - recalc_bid_uniqueness() - Utility function for determining unique bids
-- distribute_pool_prize() - Handles distribution of pool prizes
+
+Winner selection and pool prize payout live in services/settlement.py.
 """
 from flask import Blueprint, jsonify
-from extensions import db
-from models import Auction, Bid, User, PoolPrizeWinner, Wallet
+from extensions import db, uniqueness
+from money import from_cents
+from models import Auction, Bid, User, PoolPrizeWinner
+from services import archive
+from services.settlement import settle_auctions
 from flask_jwt_extended import jwt_required
 from datetime import datetime, timezone
-from collections import Counter
 from sqlalchemy import func
+from sqlalchemy.orm import aliased
 
 winners_bp = Blueprint('winners', __name__)
 
 def recalc_bid_uniqueness(auction):
     """
     Recalculates which bids in the auction are unique.
+    Rebuilds the auction's uniqueness index from the bid table and only
+    flips `is_unique` on rows whose status is out of date.
     """
-    bid_amounts = [bid.amount for bid in auction.bids]
-    amount_counts = Counter(bid_amounts)
-    
-    for bid in auction.bids:
-        is_unique = amount_counts[bid.amount] == 1
-        if bid.is_unique != is_unique:
-            bid.is_unique = is_unique
-            db.session.add(bid)
-    
-    db.session.commit()
+    uniqueness.rebuild([auction.id])
 
-def distribute_pool_prize(auction_id):
-    """
-    Distribute the pool prize to the top three bidders
-    - 1st place: 60%
-    - 2nd place: 30%
-    - 3rd place: 10%
-    """
-    try:
-        auction = Auction.query.get(auction_id)
-        if not auction or auction.pool_distributed or auction.pool_prize <= 0:
-            return False, "Pool prize already distributed or not available"
-            
-        # GET TOP 3 BIDDERS
-        top_bidders = db.session.query(
-            Bid.user_id, 
-            func.count(Bid.id).label('bid_count')
-        ).filter(
-            Bid.auction_id == auction_id
-        ).group_by(
-            Bid.user_id
-        ).order_by(
-            func.count(Bid.id).desc()
-        ).limit(3).all()
-        
-        if not top_bidders:
-            return False, "No bidders found"
+    other = aliased(Bid)
+    same_amount_count = db.session.query(func.count(other.id)).filter(
+        other.auction_id == Bid.auction_id,
+        other.amount == Bid.amount
+    ).scalar_subquery()
 
-        percentages = {1: 60, 2: 30, 3: 10}
-        winners = []
-        
-        # UPDTATE USER BALANCE
-        for rank, (user_id, _) in enumerate(top_bidders, 1):
-            if rank > 3:
-                break
-                
-            percentage = percentages.get(rank, 0)
-            amount = auction.pool_prize * (percentage / 100)
-            
+    Bid.query.filter(
+        Bid.auction_id == auction.id,
+        Bid.is_unique.is_(True),
+        same_amount_count > 1
+    ).update({Bid.is_unique: False}, synchronize_session=False)
+    Bid.query.filter(
+        Bid.auction_id == auction.id,
+        Bid.is_unique.isnot(True),
+        same_amount_count == 1
+    ).update({Bid.is_unique: True}, synchronize_session=False)
 
-            wallet = Wallet.query.filter_by(user_id=user_id).first()
-            if wallet:
-                wallet.balance += amount
-                
-            winner = PoolPrizeWinner(
-                auction_id=auction_id,
-                user_id=user_id,
-                rank=rank,
-                percentage=percentage,
-                amount=amount
-            )
-            db.session.add(winner)
-            winners.append((user_id, percentage, amount))
-            
-        auction.pool_distributed = True
-        db.session.commit()
-        
-        return True, winners
-        
-    except Exception as e:
-        db.session.rollback()
-        import logging
-        logging.error(f"Error distributing pool prize: {str(e)}")
-        return False, str(e)
+    db.session.commit()
 
 @winners_bp.route('/<int:auction_id>', methods=['GET'])
 @jwt_required()
@@ -112,54 +64,58 @@ def get_winner(auction_id):
     if current_time < expires_at:
         return jsonify({"message": "Auction is still active"}), 400
         
-    if auction.status != 'expired':
-        auction.status = 'expired'
-        
-    recalc_bid_uniqueness(auction)
-    
-    unique_bids = [bid for bid in auction.bids if bid.is_unique]
-    
-    if not unique_bids:
-        db.session.commit()
+    # SETTLE NOW IF THE SETTLEMENT JOB HAS NOT REACHED THIS AUCTION YET
+    if auction.settled_at is None:
+        settle_auctions([auction_id], current_time)
+        if auction.settled_at is None:
+            # BIDS ACCEPTED BEFORE THE DEADLINE ARE STILL IN THE BID QUEUE
+            return jsonify({"message": "Auction is being settled, try again shortly"}), 409
+
+    lowest_unique_bid = uniqueness.sync(auction_id, auction.bid_count).lowest()
+
+    if auction.winner_id is None or not lowest_unique_bid:
         return jsonify({"message": "No unique bids found"}), 404
-        
-    lowest_unique_bid = min(unique_bids, key=lambda b: b.amount)
-    winner_id = lowest_unique_bid.user_id
-    
-    if auction.winner_id != winner_id:
-        auction.winner_id = winner_id
-        
+
+    winner_id = auction.winner_id
+    winning_bid = Bid.query.get(lowest_unique_bid.bid_id)
+    if winning_bid is not None:
+        winning_bid_created_at = winning_bid.created_at
+    else:
+        # THE BIDS WERE ARCHIVED, THE SUMMARY KEEPS THE WINNING ONE
+        winning_bid_created_at = archive.archived(auction_id).winning_created_at
+
     pool_info = {}
-    if not auction.pool_distributed and auction.pool_prize > 0:
-        success, result = distribute_pool_prize(auction_id)
-        if success:
-            pool_winners = PoolPrizeWinner.query.filter_by(auction_id=auction_id).all()
+    if auction.pool_prize > 0:
+        pool_winners = db.session.query(PoolPrizeWinner, User.username).join(
+            User, User.id == PoolPrizeWinner.user_id
+        ).filter(
+            PoolPrizeWinner.auction_id == auction_id
+        ).order_by(PoolPrizeWinner.rank).all()
+        if pool_winners:
             pool_info = {
                 "distributed": True,
                 "winners": [{
                     "user_id": winner.user_id,
-                    "username": User.query.get(winner.user_id).username,
+                    "username": username,
                     "rank": winner.rank,
                     "percentage": winner.percentage,
-                    "amount": winner.amount
-                } for winner in pool_winners]
+                    "amount": from_cents(winner.amount)
+                } for winner, username in pool_winners]
             }
         else:
             pool_info = {
                 "distributed": False,
-                "message": result
+                "message": "No bidders found"
             }
-            
-    db.session.commit()
-    
+
     winner = User.query.get_or_404(winner_id)
-    
+
     return jsonify({
         "auction_id": auction_id,
         "winner_id": winner_id,
         "winner_username": winner.username,
-        "winning_bid_amount": lowest_unique_bid.amount,
-        "winning_bid_created_at": lowest_unique_bid.created_at.isoformat(),
-        "pool_prize": auction.pool_prize,
+        "winning_bid_amount": from_cents(lowest_unique_bid.amount),
+        "winning_bid_created_at": winning_bid_created_at.isoformat(),
+        "pool_prize": from_cents(auction.pool_prize),
         "pool_prize_info": pool_info
-    }), 200
\ No newline at end of file
+    }), 200
@@ -0,0 +1,82 @@
+"""
+Production entry point: preforked, threaded WSGI workers with a warm start
+(see services/server.py)
+
+The app is created and warmed once, then forked into the workers. Stop it
+with SIGTERM or Ctrl-C; in-flight requests get --graceful-timeout seconds to
+finish. app.py stays the development server.
+
+Usage:
+    python serve.py [--host 127.0.0.1] [--port 5000] [--workers N] [--threads 16]
+                    [--max-streams 256] [--graceful-timeout 30] [--access-log]
+"""
+import time
+
+STARTED_AT = time.monotonic()
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+
+from config import Config
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve HiddenDeal with preforked worker processes")
+    parser.add_argument('--host', default=Config.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=Config.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=Config.SERVER_WORKERS, help="worker processes")
+    parser.add_argument('--threads', type=int, default=Config.SERVER_THREADS, help="request threads per worker")
+    parser.add_argument('--max-streams', type=int, default=Config.SERVER_MAX_STREAMS,
+                        help="event streams per worker, served on threads outside the pool")
+    parser.add_argument('--graceful-timeout', type=float, default=Config.SERVER_GRACEFUL_TIMEOUT,
+                        help="seconds in-flight requests get to finish on shutdown")
+    parser.add_argument('--access-log', action='store_true', help="log every request")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(message)s')
+    if not args.access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    if args.workers > 1 and hasattr(os, 'fork') and Config.CACHE_BACKEND == 'memory':
+        # EACH WORKER WOULD KEEP ITS OWN ENTRIES AND VERSIONS, SO ETAGS AND BODIES WOULD GO STALE
+        logging.warning("CACHE_BACKEND=memory is per process, so caching is off with %d workers: "
+                        "use CACHE_BACKEND=redis to cache with several workers", args.workers)
+        Config.CACHE_BACKEND = 'none'
+    metrics_dir = None
+    if args.workers > 1 and hasattr(os, 'fork'):
+        # A SCRAPE REACHES ONE WORKER, /metrics SUMS WHAT EVERY WORKER WROTE HERE
+        if Config.METRICS_DIR is None:
+            metrics_dir = Config.METRICS_DIR = tempfile.mkdtemp(prefix='hiddendeal-metrics-')
+        else:
+            os.makedirs(Config.METRICS_DIR, exist_ok=True)
+            for name in os.listdir(Config.METRICS_DIR):
+                if name.endswith('.json'):
+                    os.unlink(os.path.join(Config.METRICS_DIR, name))
+
+    from app import create_app
+    from services.server import PreforkServer, warm_up
+
+    app = create_app()
+    created_at = time.monotonic()
+    warmed = warm_up(app)
+    logging.info("App created in %.3fs, warmed in %.3fs: %d unsettled auctions, %d bids",
+                 created_at - STARTED_AT, time.monotonic() - created_at, warmed['auctions'], warmed['bids'])
+
+    server = PreforkServer(app, args.host, args.port, args.workers, args.threads, args.graceful_timeout, STARTED_AT,
+                           args.max_streams)
+    server.bind()
+    try:
+        server.run()
+    finally:
+        if metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
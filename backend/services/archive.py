@@ -0,0 +1,366 @@
+"""
+Bid Archive - Columnar cold storage for the bids of settled auctions
+
+Once an auction has been settled for ARCHIVE_AFTER_SECONDS its bids are only
+read again, and rarely. archive_settled_auctions() moves them out of the bid
+table in batches:
+
+- the bids of a batch of auctions are written to one immutable segment file
+  under ARCHIVE_DIR, one block per auction, holding the columns id, user_id,
+  amount, created_at and is_unique as zlib compressed 64-bit integer arrays
+  (id and created_at as deltas from the previous bid, which compress well)
+- an auction_archive row records where the block is, with what most reads
+  need without opening it: counts, the total, the winning bid and an amount
+  histogram at HISTOGRAM_BUCKET_CENTS
+- the summary rows are inserted and the bid rows (and the auctions' applied
+  bid tickets) deleted in one transaction, after the file is on disk
+
+ArchiveStore memory-maps segment files and only decompresses the columns a
+read needs. GET /api/auctions/<id>, /bids and /distribution read archived
+auctions through user_bids(), bids() and bucket_counts(), and the uniqueness
+index of an archived auction is loaded from its summary, so the winners
+endpoint and the live stream are unchanged. Leaderboard rows, pool winners
+and ledger entries stay in the database.
+
+Referenced segment files are never modified or deleted by the app: back
+them up with the database.
+"""
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import uuid
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+BLOCK_MAGIC = b'HDB1'
+# MAGIC, AUCTION ID, BID COUNT, THEN THE COMPRESSED SIZE OF EACH COLUMN
+BLOCK_HEADER = struct.Struct('<4sqq5I')
+COLUMNS = ('id', 'user_id', 'amount', 'created_at', 'is_unique')
+DELTA_COLUMNS = ('id', 'created_at')
+COMPRESS_LEVEL = 6
+
+# THE DEFAULT BUCKET OF GET /api/auctions/<id>/distribution
+HISTOGRAM_BUCKET_CENTS = 1000
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _to_micros(value):
+    # NAIVE DATETIMES ARE UTC, AS THE DATABASE RETURNS THEM
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _encode_column(values, delta):
+    if delta:
+        values = [value - previous for previous, value in zip([0] + values[:-1], values)]
+    data = array('q', values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return zlib.compress(data.tobytes(), COMPRESS_LEVEL)
+
+
+def _decode_column(data, delta):
+    values = array('q')
+    values.frombytes(zlib.decompress(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    if delta:
+        values = array('q', accumulate(values))
+    return values
+
+
+def encode_block(auction_id, bids):
+    """
+    Args:
+        bids: (id, user_id, amount, created_at, is_unique) tuples in id order
+    Returns:
+        The auction's block as bytes
+    """
+    columns = {name: [] for name in COLUMNS}
+    for bid_id, user_id, amount, created_at, is_unique in bids:
+        columns['id'].append(bid_id)
+        columns['user_id'].append(user_id)
+        columns['amount'].append(amount)
+        columns['created_at'].append(_to_micros(created_at))
+        columns['is_unique'].append(1 if is_unique else 0)
+    encoded = [_encode_column(columns[name], name in DELTA_COLUMNS) for name in COLUMNS]
+    header = BLOCK_HEADER.pack(BLOCK_MAGIC, auction_id, len(bids), *(len(data) for data in encoded))
+    return header + b''.join(encoded)
+
+
+def summarize_bids(bids):
+    """
+    Returns:
+        The summary columns of an auction_archive row for these bids
+    """
+    amounts = Counter(amount for _, _, amount, _, _ in bids)
+    winning_amount = min((amount for amount, count in amounts.items() if count == 1), default=None)
+    winning_bid = next((bid for bid in bids if bid[2] == winning_amount), None)
+    histogram = Counter(amount // HISTOGRAM_BUCKET_CENTS for _, _, amount, _, _ in bids)
+    return {
+        "bid_count": len(bids),
+        "bidder_count": len({user_id for _, user_id, _, _, _ in bids}),
+        "unique_count": sum(1 for count in amounts.values() if count == 1),
+        "total_amount": sum(amount * count for amount, count in amounts.items()),
+        "winning_bid_id": winning_bid[0] if winning_bid else None,
+        "winning_user_id": winning_bid[1] if winning_bid else None,
+        "winning_amount": winning_amount,
+        "winning_created_at": winning_bid[3] if winning_bid else None,
+        "histogram": sorted([bucket, count] for bucket, count in histogram.items()),
+    }
+
+
+class ArchiveStore:
+    """
+    Writes segment files and reads columns from them through shared,
+    read-only memory maps, at most ARCHIVE_OPEN_SEGMENTS open at a time
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.max_open = 64
+        self._maps = OrderedDict()
+        self._guard = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ARCHIVE_DIR', None)
+        app.config.setdefault('ARCHIVE_AFTER_SECONDS', 3600)
+        app.config.setdefault('ARCHIVE_BATCH_SIZE', 100)
+        app.config.setdefault('ARCHIVE_OPEN_SEGMENTS', 64)
+        app.extensions['archive_store'] = self
+        self.directory = app.config['ARCHIVE_DIR'] or os.path.join(app.instance_path, 'archive')
+        self.max_open = app.config['ARCHIVE_OPEN_SEGMENTS']
+        self.close()
+
+    def close(self):
+        with self._guard:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+    def write_segment(self, blocks):
+        """
+        Write blocks to a new segment file, durably, before it is referenced
+        Returns:
+            (segment name, offset of each block)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S-') + uuid.uuid4().hex[:12] + '.bids'
+        path = os.path.join(self.directory, name)
+        offsets = []
+        with open(path + '.tmp', 'wb') as f:
+            for block in blocks:
+                offsets.append(f.tell())
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        # THE RENAME ITSELF MUST SURVIVE A CRASH TOO
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        return name, offsets
+
+    def remove_segment(self, name):
+        with self._guard:
+            mapped = self._maps.pop(name, None)
+            if mapped is not None:
+                mapped.close()
+        os.remove(os.path.join(self.directory, name))
+
+    def _map(self, name):
+        # CALLED WITH _guard HELD, SO A MAP IS NEVER CLOSED WHILE BEING READ
+        mapped = self._maps.get(name)
+        if mapped is not None:
+            self._maps.move_to_end(name)
+            return mapped
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[name] = mapped
+        while len(self._maps) > self.max_open:
+            _, oldest = self._maps.popitem(last=False)
+            oldest.close()
+        return mapped
+
+    def read(self, summary, columns=COLUMNS):
+        """
+        Read some columns of an archived auction's bids
+        Returns:
+            Dict of column name -> array('q'), bids in id order
+        """
+        if summary.segment is None:
+            return {name: array('q') for name in columns}
+        with self._guard:
+            mapped = self._map(summary.segment)
+            start = summary.block_offset
+            magic, auction_id, bid_count, *sizes = BLOCK_HEADER.unpack(mapped[start:start + BLOCK_HEADER.size])
+            if magic != BLOCK_MAGIC or auction_id != summary.auction_id:
+                raise ValueError(f"{summary.segment} has no block for auction {summary.auction_id} at {start}")
+            # ONLY THE COMPRESSED BYTES OF THE REQUESTED COLUMNS ARE COPIED OUT OF THE MAP
+            position = start + BLOCK_HEADER.size
+            compressed = {}
+            for name, size in zip(COLUMNS, sizes):
+                if name in columns:
+                    compressed[name] = mapped[position:position + size]
+                position += size
+        return {name: _decode_column(compressed[name], name in DELTA_COLUMNS) for name in columns}
+
+
+def archived(auction_id):
+    """
+    Returns:
+        The auction's AuctionArchive row, or None if its bids are live
+    """
+    from extensions import db
+    from models import AuctionArchive
+
+    return db.session.get(AuctionArchive, auction_id)
+
+
+def user_bids(summary, user_id, limit, cursor=None):
+    """
+    A user's archived bids on the auction, newest first, like the bid
+    history query on ix_bid_auction_user_bids
+    Returns:
+        Up to `limit` (id, amount, is_unique, created_at) tuples with ids below cursor
+    """
+    from extensions import archive_store
+
+    keys = archive_store.read(summary, ('id', 'user_id'))
+    ids, user_ids = keys['id'], keys['user_id']
+    positions = []
+    for position in range(len(ids) - 1, -1, -1):
+        if user_ids[position] == user_id and (cursor is None or ids[position] < cursor):
+            positions.append(position)
+            if len(positions) == limit:
+                break
+    if not positions:
+        return []
+    values = archive_store.read(summary, ('amount', 'is_unique', 'created_at'))
+    return [(
+        ids[position],
+        values['amount'][position],
+        bool(values['is_unique'][position]),
+        _from_micros(values['created_at'][position])
+    ) for position in positions]
+
+
+def bids(summary):
+    """
+    Returns:
+        Every archived bid of the auction as (amount, created_at, user_id), in id order
+    """
+    from extensions import archive_store
+
+    columns = archive_store.read(summary, ('user_id', 'amount', 'created_at'))
+    return [
+        (amount, _from_micros(created_at), user_id)
+        for amount, created_at, user_id in zip(columns['amount'], columns['created_at'], columns['user_id'])
+    ]
+
+
+def bucket_counts(summary, bucket_cents):
+    """
+    Returns:
+        [(bucket number, bid count)] in bucket order, from the summary's
+        histogram when the bucket is a multiple of HISTOGRAM_BUCKET_CENTS
+    """
+    from extensions import archive_store
+
+    counts = Counter()
+    if bucket_cents % HISTOGRAM_BUCKET_CENTS == 0:
+        factor = bucket_cents // HISTOGRAM_BUCKET_CENTS
+        for bucket, count in summary.histogram:
+            counts[bucket // factor] += count
+    else:
+        counts.update(amount // bucket_cents for amount in archive_store.read(summary, ('amount',))['amount'])
+    return sorted(counts.items())
+
+
+def archive_settled_auctions(batch_size=100, after_seconds=3600, current_time=None):
+    """
+    Move the bids of auctions settled at least after_seconds ago to a new
+    segment file, up to batch_size auctions
+    Returns:
+        Number of auctions archived
+    """
+    from sqlalchemy import delete, exists, insert, select
+    from sqlalchemy.exc import IntegrityError
+
+    from extensions import db, archive_store, cache, uniqueness
+    from models import Auction, AuctionArchive, Bid, BidTicket
+
+    current_time = current_time or datetime.now(timezone.utc)
+    auction_ids = db.session.execute(
+        select(Auction.id).where(
+            Auction.settled_at.isnot(None),
+            Auction.settled_at <= current_time - timedelta(seconds=after_seconds),
+            ~exists().where(AuctionArchive.auction_id == Auction.id)
+        ).order_by(Auction.id).limit(batch_size)
+    ).scalars().all()
+    if not auction_ids:
+        db.session.rollback()
+        return 0
+
+    by_auction = {auction_id: [] for auction_id in auction_ids}
+    rows = db.session.execute(
+        select(Bid.auction_id, Bid.id, Bid.user_id, Bid.amount, Bid.created_at, Bid.is_unique)
+        .where(Bid.auction_id.in_(auction_ids))
+        .order_by(Bid.auction_id, Bid.id)
+    )
+    for auction_id, *bid in rows:
+        by_auction[auction_id].append(tuple(bid))
+
+    encoded = {auction_id: encode_block(auction_id, bids) for auction_id, bids in by_auction.items() if bids}
+    segment, offsets = None, {}
+    if encoded:
+        segment, block_offsets = archive_store.write_segment(encoded.values())
+        offsets = dict(zip(encoded, block_offsets))
+
+    archived_at = datetime.now(timezone.utc)
+    summaries = [dict(
+        summarize_bids(by_auction[auction_id]),
+        auction_id=auction_id,
+        segment=segment if auction_id in encoded else None,
+        block_offset=offsets.get(auction_id, 0),
+        block_length=len(encoded.get(auction_id, b'')),
+        archived_at=archived_at
+    ) for auction_id in auction_ids]
+
+    try:
+        db.session.execute(insert(AuctionArchive), summaries)
+        # SETTLED AUCTIONS HAVE NO PENDING TICKETS, APPLIED ONES POINT AT THE BIDS
+        db.session.execute(delete(BidTicket).where(BidTicket.auction_id.in_(auction_ids)))
+        db.session.execute(delete(Bid).where(Bid.auction_id.in_(auction_ids)))
+        db.session.commit()
+    except IntegrityError:
+        # ANOTHER RUN ARCHIVED SOME OF THESE FIRST, OUR SEGMENT IS UNREFERENCED
+        db.session.rollback()
+        if segment is not None:
+            archive_store.remove_segment(segment)
+        logging.getLogger(__name__).info("Auctions %s were archived concurrently", auction_ids)
+        return 0
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for auction_id in auction_ids:
+        uniqueness.discard(auction_id)
+        cache.invalidate(f'auction:{auction_id}')
+    return len(auction_ids)
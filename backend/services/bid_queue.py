@@ -0,0 +1,290 @@
+"""
+Bid Queue - Optional queued ingestion of bids for traffic spikes
+
+With BID_INGESTION_MODE = 'queued', POST /api/bids/ only debits the bidder
+and records a bid_ticket row in one short transaction, then answers 202 with
+the ticket id. The tickets table is the durable queue: a ticket survives a
+restart and is picked up by whichever worker process runs next.
+
+A background thread applies pending tickets per auction in arrival (id)
+order, up to BID_QUEUE_BATCH_SIZE per transaction, through the same
+apply_bids() the synchronous path uses. Tickets are claimed with a
+conditional UPDATE, so several workers never apply the same ticket twice.
+
+A ticket keeps the time it was accepted and its bid is created with that
+time, so a bid accepted before expires_at counts even when it is applied
+after it. Settlement waits until an auction has no pending tickets. Should
+the auction still turn out closed to a batch, its tickets are rejected and
+their bidders refunded in the same transaction.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+
+
+class BidQueue:
+    """
+    Ticket intake plus the daemon thread that applies tickets
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._cond = threading.Condition()
+        self._signalled = False
+        self._thread = None
+        self._stopping = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BID_INGESTION_MODE', 'sync')
+        app.config.setdefault('BID_QUEUE_BATCH_SIZE', 500)
+        app.config.setdefault('BID_QUEUE_POLL_SECONDS', 1.0)
+        if app.config['BID_INGESTION_MODE'] not in ('sync', 'queued'):
+            raise ValueError(f"Unknown BID_INGESTION_MODE {app.config['BID_INGESTION_MODE']!r}")
+        app.extensions['bid_queue'] = self
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config['BID_INGESTION_MODE'] == 'queued'
+
+    def enqueue(self, auction_id, user_id, amounts):
+        """
+        Debit the bidder and record one ticket per amount, in one transaction
+        Returns:
+            (outcome, tickets, new_balance) where outcome is 'accepted',
+            'insufficient_funds' or 'auction_expired'
+        """
+        from extensions import db
+        from models import Auction, BidTicket
+        from services.bidding import debit_wallet
+
+        accepted_at = datetime.now(timezone.utc)
+        new_balance = debit_wallet(user_id, sum(amounts), auction_id)
+        if new_balance is None:
+            db.session.rollback()
+            return 'insufficient_funds', [], None
+
+        # RE-CHECKED INSIDE THE TRANSACTION: SETTLEMENT MUST EITHER SEE THIS TICKET OR HAVE CLAIMED THE AUCTION
+        still_open = db.session.execute(
+            select(Auction.id)
+            .where(
+                Auction.id == auction_id,
+                Auction.status == 'active',
+                Auction.settled_at.is_(None),
+                Auction.expires_at > accepted_at
+            )
+            .with_for_update(read=True)
+        ).first()
+        if still_open is None:
+            db.session.rollback()
+            return 'auction_expired', [], None
+
+        tickets = [BidTicket(
+            auction_id=auction_id,
+            user_id=user_id,
+            amount=amount,
+            status='pending',
+            accepted_at=accepted_at
+        ) for amount in amounts]
+        db.session.add_all(tickets)
+        db.session.commit()
+
+        self.notify()
+        return 'accepted', tickets, new_balance
+
+    def notify(self):
+        with self._cond:
+            self._signalled = True
+            self._cond.notify()
+
+    def start(self):
+        """
+        Start the worker thread in queued mode, applying any tickets left over
+        from before a restart first
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping = False
+        self._signalled = True
+        self._thread = threading.Thread(target=self._run, name='bid-queue', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _wait(self):
+        """
+        Block until tickets were enqueued here or the poll interval passed,
+        which also picks up tickets taken by other worker processes
+        Returns:
+            False once the queue is stopping
+        """
+        with self._cond:
+            if not self._signalled and not self._stopping:
+                self._cond.wait(self.app.config['BID_QUEUE_POLL_SECONDS'])
+            self._signalled = False
+            return not self._stopping
+
+    def _run(self):
+        while self._wait():
+            with self.app.app_context():
+                try:
+                    self.drain()
+                except Exception as e:
+                    logging.error(f"Error applying queued bids: {str(e)}")
+
+    def drain(self):
+        """
+        Apply pending tickets until none are left
+        Returns:
+            Number of tickets applied
+        """
+        total = 0
+        while True:
+            applied = self.process_pending()
+            if not applied:
+                return total
+            total += applied
+
+    def process_pending(self):
+        """
+        Apply one batch of pending tickets for every auction that has some,
+        then settle those auctions that have expired meanwhile
+        Returns:
+            Number of tickets applied
+        """
+        from extensions import db
+        from models import Auction, BidTicket
+
+        auction_ids = db.session.execute(
+            select(BidTicket.auction_id).where(BidTicket.status == 'pending').distinct()
+        ).scalars().all()
+        db.session.rollback()
+
+        applied = 0
+        for auction_id in auction_ids:
+            applied += self.apply_auction(auction_id)
+
+        if auction_ids and self.app.config['SETTLE_EXPIRED_AUCTIONS']:
+            from services.settlement import settle_auctions
+
+            current_time = datetime.now(timezone.utc)
+            expired_ids = db.session.execute(
+                select(Auction.id).where(Auction.id.in_(auction_ids), Auction.expires_at <= current_time)
+            ).scalars().all()
+            if expired_ids:
+                settle_auctions(expired_ids, current_time)
+        return applied
+
+    def apply_auction(self, auction_id):
+        """
+        Claim and apply the oldest pending tickets of one auction in one transaction
+        Returns:
+            Number of tickets applied or rejected
+        """
+        from extensions import db, uniqueness
+        from services.bidding import publish_bids
+
+        attempts = self.app.config['BID_COMMIT_ATTEMPTS']
+        with uniqueness.lock(auction_id):
+            for attempt in range(attempts):
+                try:
+                    committed = self._commit_tickets(auction_id)
+                    break
+                except OperationalError:
+                    # DATABASE LOCKED BY ANOTHER PROCESS, BACK OFF AND RETRY
+                    db.session.rollback()
+                    if attempt == attempts - 1:
+                        raise
+                    time.sleep(0.01 * 2 ** attempt)
+
+            if committed is None:
+                return 0
+            ticket_ids, placed_bids, pool_prize = committed
+            if placed_bids is None:
+                logging.warning(f"Rejected {len(ticket_ids)} queued bid(s) to closed auction {auction_id}")
+                return len(ticket_ids)
+            publish_bids(auction_id, placed_bids, pool_prize, ticket_ids)
+
+        logging.info(f"Applied {len(ticket_ids)} queued bid(s) to auction {auction_id}")
+        return len(ticket_ids)
+
+    def _commit_tickets(self, auction_id):
+        """
+        Returns:
+            (ticket_ids, bids, pool_prize), (ticket_ids, None, None) if the
+            auction was closed and the tickets rejected, or None if another
+            worker claimed the tickets
+        """
+        from extensions import db
+        from models import BidTicket
+        from services.bidding import AuctionClosed, apply_bids
+
+        applied_at = datetime.now(timezone.utc)
+        oldest = select(BidTicket.id).where(
+            BidTicket.auction_id == auction_id,
+            BidTicket.status == 'pending'
+        ).order_by(BidTicket.id).limit(self.app.config['BID_QUEUE_BATCH_SIZE'])
+
+        # CLAIM: ALSO OPENS THE WRITE TRANSACTION
+        claimed = db.session.execute(
+            update(BidTicket)
+            .where(BidTicket.id.in_(oldest.scalar_subquery()), BidTicket.status == 'pending')
+            .values(status='applied', applied_at=applied_at)
+            .returning(BidTicket.id, BidTicket.user_id, BidTicket.amount, BidTicket.accepted_at)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not claimed:
+            db.session.rollback()
+            return None
+        claimed.sort()
+        ticket_ids = [ticket_id for ticket_id, _, _, _ in claimed]
+
+        try:
+            placed_bids, _, pool_prize = apply_bids(auction_id, [
+                (user_id, amount, accepted_at) for _, user_id, amount, accepted_at in claimed
+            ], queued=True)
+        except AuctionClosed:
+            # RAISED BEFORE apply_bids WROTE ANYTHING, THE CLAIM IS STILL THE ONLY CHANGE
+            self._reject_tickets(auction_id, claimed)
+            db.session.commit()
+            return ticket_ids, None, None
+        db.session.execute(update(BidTicket), [
+            {"id": ticket_id, "bid_id": placed_bid.id} for ticket_id, placed_bid in zip(ticket_ids, placed_bids)
+        ])
+        db.session.commit()
+        return ticket_ids, placed_bids, pool_prize
+
+    def _reject_tickets(self, auction_id, claimed):
+        """
+        Mark claimed tickets rejected and refund their bidders, without committing
+        """
+        from extensions import db
+        from models import BidTicket
+        from services import ledger
+
+        db.session.execute(
+            update(BidTicket)
+            .where(BidTicket.id.in_([ticket_id for ticket_id, _, _, _ in claimed]))
+            .values(status='rejected')
+            .execution_options(synchronize_session=False)
+        )
+        refunds = {}
+        for _, user_id, amount, _ in claimed:
+            refunds[user_id] = refunds.get(user_id, 0) + amount
+        ledger.credit_wallets(refunds)
+        ledger.record_many([
+            {"kind": 'bid_refund', "amount": amount, "user_id": user_id, "auction_id": auction_id}
+            for user_id, amount in refunds.items()
+        ])
@@ -0,0 +1,162 @@
+"""
+Bid Application - Writes accepted bids to the auction, shared by both ingestion modes
+
+place_bid applies bids right away, after debiting the bidder with
+debit_wallet() in the same transaction. In queued mode (services/bid_queue.py)
+the bidder is debited when the ticket is taken and the queue worker applies
+many tickets of one auction in one transaction. Both go through apply_bids() and, after the
+commit, publish_bids().
+
+The creator's share of each bid is recorded as a creator_credit ledger entry
+rather than added to the creator's wallet row, which every bid on the auction
+used to update (see services/ledger.py).
+"""
+from collections import namedtuple
+from datetime import timezone
+
+from sqlalchemy import update
+
+from extensions import db, uniqueness, event_hub, cache
+from models import Auction, Bid, Wallet
+from money import from_cents
+from services import leaderboard, ledger
+
+# COMMITTED BID VALUES, READ BEFORE COMMIT SO NOTHING IS RELOADED AFTERWARDS
+# is_unique IS AS OF THE COMMIT, SET UNDER THE UNIQUENESS LOCK, LATER BIDS MAY CHANGE IT
+PlacedBid = namedtuple('PlacedBid', ['id', 'auction_id', 'user_id', 'amount', 'is_unique'])
+
+
+class AuctionClosed(Exception):
+    """
+    The auction expired or was settled after the bids were checked
+    """
+    pass
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def debit_wallet(user_id, total_amount, auction_id=None):
+    """
+    Debit the bidder only if the funds are still there, this also opens the
+    write transaction, and record the debit in the ledger
+    Returns:
+        The new balance in cents, or None if funds are insufficient
+    """
+    new_balance = db.session.execute(
+        update(Wallet)
+        .where(Wallet.user_id == user_id, Wallet.balance >= total_amount)
+        .values(balance=Wallet.balance - total_amount)
+        .returning(Wallet.balance)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if new_balance is not None:
+        ledger.record('bid_debit', -total_amount, user_id, auction_id)
+    return new_balance
+
+
+def apply_bids(auction_id, entries, queued=False):
+    """
+    Split each amount between creator and pool, insert the bids and update
+    running totals, uniqueness flags and the leaderboard, without committing.
+    Bidders must already have been debited. Must be called while holding the
+    auction's uniqueness lock.
+    Args:
+        entries: [(user_id, amount in cents, accepted at), ...] in arrival order
+        queued: the bids are tickets taken before expiry, which still count
+            once the auction's status is 'expired'
+    Returns:
+        (bids, pool_amounts, pool_prize)
+    Raises:
+        AuctionClosed if the auction stopped taking these bids since they were checked
+    """
+    # RUNNING TOTALS ARE READ UNDER THE WRITE LOCK (ROW LOCK ON POSTGRESQL)
+    auction = Auction.query.with_for_update().populate_existing().filter_by(id=auction_id).one()
+    # RE-CHECKED UNDER THE LOCK: THE SCHEDULER MAY HAVE EXPIRED AND SETTLED IT SINCE THE BIDDER'S CHECK
+    expires_at = _utc(auction.expires_at)
+    if (auction.settled_at is not None or (not queued and auction.status != 'active')
+            or any(_utc(bid_time) >= expires_at for _, _, bid_time in entries)):
+        raise AuctionClosed(f"Auction {auction_id} is closed")
+    # OTHER WORKER PROCESSES MAY HAVE ADDED BIDS SINCE THIS ONE LAST SAW THE AUCTION
+    index = uniqueness.sync(auction_id, auction.bid_count)
+
+    creator_total = 0
+    pool_amounts = []
+    for _, bid_amount, bid_time in entries:
+        pool_amount = 0
+        if auction.item_value is not None and auction.item_value > 0:
+            # TRESHOLD CHECK, A BATCH MAY CROSS IT PART WAY THROUGH
+            if auction.threshold_reached_at is not None:
+                # BIDS ARE WHOLE TENTHS, SO HALF A BID IS ALWAYS WHOLE CENTS
+                pool_amount = bid_amount // 2
+                auction.pool_prize += pool_amount
+            elif auction.total_bid_amount + bid_amount >= auction.item_value:
+                auction.threshold_reached_at = bid_time
+
+        auction.total_bid_amount += bid_amount
+        auction.bid_count += 1
+        creator_total += bid_amount - pool_amount
+        pool_amounts.append(pool_amount)
+
+    # INSERT ONLY, THE LEDGER WORKER FOLDS CREDITS INTO THE CREATOR'S WALLET
+    entries_to_record = [
+        {"kind": 'creator_credit', "amount": creator_total, "user_id": auction.creator_id, "auction_id": auction_id}
+    ]
+    if sum(pool_amounts):
+        entries_to_record.append({"kind": 'pool_contribution', "amount": sum(pool_amounts), "auction_id": auction_id})
+    ledger.record_many(entries_to_record)
+
+    # UNIQUENESS: ONLY THE NEW BIDS AND PREVIOUSLY UNIQUE BIDS AT THE SAME AMOUNTS CAN CHANGE
+    batch_counts = {}
+    for _, bid_amount, _ in entries:
+        batch_counts[bid_amount] = batch_counts.get(bid_amount, 0) + 1
+
+    new_bids = [Bid(
+        user_id=user_id,
+        auction_id=auction_id,
+        amount=bid_amount,
+        is_unique=index.count(bid_amount) + batch_counts[bid_amount] == 1,
+        created_at=bid_time
+    ) for user_id, bid_amount, bid_time in entries]
+    db.session.add_all(new_bids)
+
+    displaced_ids = [index.holder(bid_amount).bid_id for bid_amount in batch_counts if index.holder(bid_amount)]
+    if displaced_ids:
+        Bid.query.filter(Bid.id.in_(displaced_ids)).update({Bid.is_unique: False}, synchronize_session=False)
+    db.session.flush()
+
+    bid_ids_by_user = {}
+    for bid in new_bids:
+        bid_ids_by_user.setdefault(bid.user_id, []).append(bid.id)
+    for user_id, bid_ids in bid_ids_by_user.items():
+        leaderboard.record_bids(auction_id, user_id, bid_ids)
+
+    placed_bids = [PlacedBid(bid.id, auction_id, bid.user_id, bid.amount, bid.is_unique) for bid in new_bids]
+    return placed_bids, pool_amounts, auction.pool_prize
+
+
+def publish_bids(auction_id, placed_bids, pool_prize, ticket_ids=None):
+    """
+    After the commit: update the uniqueness index, drop cached reads of the
+    auction and notify live viewers. Must still hold the uniqueness lock.
+    Returns:
+        The auction's lowest unique bid
+    """
+    cache.invalidate(f'auction:{auction_id}')
+    index = uniqueness.get(auction_id)
+    for placed_bid in placed_bids:
+        uniqueness.record_bid(placed_bid)
+    lowest_unique_bid = index.lowest()
+
+    ticket_ids = ticket_ids or [None] * len(placed_bids)
+    for placed_bid, ticket_id in zip(placed_bids, ticket_ids):
+        event_hub.publish(auction_id, 'bid', {
+            "bid_count": index.bid_count,
+            "amount": from_cents(placed_bid.amount),
+            "pool_prize": from_cents(pool_prize),
+            "lowest_unique_user_id": lowest_unique_bid.user_id if lowest_unique_bid else None,
+            "user_id": placed_bid.user_id,
+            "ticket_id": ticket_id
+        })
+    return lowest_unique_bid
@@ -0,0 +1,348 @@
+"""
+Response Cache - Versioned read cache with in-process and shared backends
+
+Read endpoints cache their JSON payloads under a namespace, `auctions` for
+the listing and `auction:<id>` for everything about one auction. Entries are
+stored under the namespace's current version; invalidating a namespace just
+increments that version, so every worker stops reading the old entries at
+once without having to find and delete them, and they age out by TTL.
+Invalidating also records when the namespace last changed; together with
+the version that gives read endpoints their ETag and Last-Modified (see
+services/responses.py). Backends also keep the expiring counters of the
+shared rate limiter (hit(), see services/ratelimit.py).
+
+Backends:
+- memory: a per-process LRU with TTL and an entry limit. Invalidations are
+  not seen by other worker processes, use it with a single worker.
+- redis: any server speaking the Redis protocol (RESP), shared by all
+  workers. The client below only needs GET, SET EX, INCR and EXPIRE.
+- none: caching disabled.
+
+A cache failure never fails a request: reads fall back to the database and
+the error is logged.
+"""
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from services.responses import dumps, loads
+
+KEY_PREFIX = 'hiddendeal'
+# HOW LONG A NAMESPACE'S LAST CHANGE TIME IS KEPT, WITHOUT IT NO VALIDATORS ARE SENT
+CHANGED_TTL = 7 * 24 * 3600
+
+
+class CacheError(Exception):
+    pass
+
+
+class MemoryBackend:
+    """
+    Thread-safe LRU with per-entry expiry
+    Namespace versions are kept apart from the LRU so they are never evicted.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key])
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set_many(self, items, ttl):
+        for key, value in items:
+            self.set(key, value, ttl)
+
+    def incr(self, keys):
+        with self._lock:
+            for key in keys:
+                self._counters[key] = self._counters.get(key, 0) + 1
+
+    def hit(self, hits):
+        """
+        Increment expiring counters
+        Args:
+            hits: [(key, previous_key, ttl), ...]
+        Returns:
+            [(key's new count, previous_key's count), ...]
+        """
+        now = time.monotonic()
+        counts = []
+        with self._lock:
+            for key, previous_key, ttl in hits:
+                entry = self._entries.get(key)
+                current = int(entry[1]) + 1 if entry and entry[0] > now else 1
+                self._entries[key] = (now + ttl, str(current))
+                self._entries.move_to_end(key)
+                entry = self._entries.get(previous_key)
+                counts.append((current, int(entry[1]) if entry and entry[0] > now else 0))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return counts
+
+
+class RedisBackend:
+    """
+    Minimal RESP client, one connection per thread
+    URL format: redis://[:password@]host[:port][/db]
+    """
+
+    def __init__(self, url, timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.password:
+            self._execute([('AUTH', self.password)])
+        if self.db:
+            self._execute([('SELECT', self.db)])
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                self._local.reader.close()
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    @staticmethod
+    def _encode(command):
+        parts = [f'*{len(command)}\r\n'.encode()]
+        for arg in command:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f'${len(data)}\r\n'.encode() + data + b'\r\n')
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Cache server closed the connection")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise CacheError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            return self._local.reader.read(length + 2)[:-2].decode()
+        if kind == b'*':
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise CacheError(f"Unexpected reply from cache server: {line!r}")
+
+    def _execute(self, commands):
+        """
+        Send commands in one write (pipelined) and read all replies
+        """
+        self._local.sock.sendall(b''.join(self._encode(command) for command in commands))
+        replies, error = [], None
+        for _ in commands:
+            # KEEP READING AFTER AN ERROR REPLY SO THE CONNECTION STAYS IN SYNC
+            try:
+                replies.append(self._read_reply())
+            except CacheError as e:
+                error = error or e
+                replies.append(None)
+        if error:
+            raise error
+        return replies
+
+    def execute(self, *commands):
+        # ONE RETRY ON A FRESH CONNECTION, E.G. AFTER THE SERVER RESTARTED
+        for attempt in range(2):
+            try:
+                if getattr(self._local, 'sock', None) is None:
+                    self._connect()
+                return self._execute(commands)
+            except OSError:
+                self._disconnect()
+                if attempt:
+                    raise
+
+    def get(self, key):
+        return self.execute(('GET', key))[0]
+
+    def get_many(self, keys):
+        return self.execute(*[('GET', key) for key in keys])
+
+    def set(self, key, value, ttl):
+        self.execute(('SET', key, value, 'EX', max(int(ttl), 1)))
+
+    def set_many(self, items, ttl):
+        if items:
+            self.execute(*[('SET', key, value, 'EX', max(int(ttl), 1)) for key, value in items])
+
+    def incr(self, keys):
+        if keys:
+            self.execute(*[('INCR', key) for key in keys])
+
+    def hit(self, hits):
+        commands = []
+        for key, previous_key, ttl in hits:
+            commands += [('INCR', key), ('EXPIRE', key, max(int(ttl), 1)), ('GET', previous_key)]
+        replies = self.execute(*commands) if commands else []
+        return [(current, int(previous or 0)) for current, _, previous in zip(*[iter(replies)] * 3)]
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def get_many(self, keys):
+        return [None] * len(keys)
+
+    def set(self, key, value, ttl):
+        pass
+
+    def set_many(self, items, ttl):
+        pass
+
+    def incr(self, keys):
+        pass
+
+    def hit(self, hits):
+        return [(0, 0) for _ in hits]
+
+
+class Cache:
+    """
+    Namespaced, versioned cache of JSON-serializable values
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.default_ttl = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 30)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 10000)
+        app.config.setdefault('CACHE_TIMEOUT', 1.0)
+        app.extensions['cache'] = self
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+
+        backend = app.config['CACHE_BACKEND']
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config['CACHE_MAX_ENTRIES'])
+        elif backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_URL'], app.config['CACHE_TIMEOUT'])
+        elif backend == 'none':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND {backend!r}")
+
+    @staticmethod
+    def _version_key(namespace):
+        return f'{KEY_PREFIX}:{namespace}:version'
+
+    @staticmethod
+    def _changed_key(namespace):
+        return f'{KEY_PREFIX}:{namespace}:changed'
+
+    def get_or_set(self, namespace, key, loader, ttl=None):
+        """
+        Return the cached value, or call loader() and cache what it returns
+        A loader result of None (e.g. not found) is returned but not cached.
+        ttl may be a number of seconds or a function of the loaded value.
+        """
+        try:
+            version = self.backend.get(self._version_key(namespace)) or '0'
+            entry_key = f'{KEY_PREFIX}:{namespace}:{version}:{key}'
+            cached = self.backend.get(entry_key)
+        except (OSError, CacheError) as e:
+            logging.warning(f"Cache read failed, using the database: {str(e)}")
+            return loader()
+        if cached is not None:
+            return loads(cached)
+
+        value = loader()
+        if value is None:
+            return None
+        if callable(ttl):
+            ttl = ttl(value)
+        try:
+            # STORED UNDER THE VERSION READ BEFORE LOADING, AN INVALIDATION MEANWHILE ORPHANS IT
+            self.backend.set(entry_key, dumps(value), ttl or self.default_ttl)
+        except (OSError, CacheError) as e:
+            logging.warning(f"Cache write failed: {str(e)}")
+        return value
+
+    def invalidate(self, *namespaces):
+        """
+        Make every entry of the given namespaces unreachable
+        """
+        try:
+            self.backend.incr([self._version_key(namespace) for namespace in namespaces])
+            changed_at = repr(time.time())
+            self.backend.set_many([(self._changed_key(namespace), changed_at) for namespace in namespaces], CHANGED_TTL)
+        except (OSError, CacheError) as e:
+            logging.error(f"Cache invalidation failed for {', '.join(namespaces)}: {str(e)}")
+
+    def changes(self, *namespaces):
+        """
+        Returns:
+            [(version, last change as a UNIX time), ...] for the namespaces, or
+            None if any of them is unknown: never invalidated, its change time
+            evicted, caching disabled or the cache unreachable
+        Unknown namespaces are invalidated, so they are known next time.
+        """
+        if isinstance(self.backend, NullBackend):
+            return None
+        keys = []
+        for namespace in namespaces:
+            keys += [self._version_key(namespace), self._changed_key(namespace)]
+        try:
+            values = self.backend.get_many(keys)
+        except (OSError, CacheError) as e:
+            logging.warning(f"Cache read failed, sending no validators: {str(e)}")
+            return None
+        missing = [namespace for namespace, version, changed_at in zip(namespaces, values[::2], values[1::2])
+                   if version is None or changed_at is None]
+        if missing:
+            self.invalidate(*missing)
+            return None
+        return [(int(version), float(changed_at)) for version, changed_at in zip(values[::2], values[1::2])]
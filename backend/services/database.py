@@ -0,0 +1,59 @@
+"""
+Database Engine Profile - Backend specific engine options and connection setup
+
+SQLite runs in WAL mode so readers are not blocked by a bid commit, with
+`synchronous=NORMAL`, a busy timeout and a memory mapped read path set on
+every new connection. Server databases such as PostgreSQL get a sized
+connection pool that pings connections before handing them out.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(config):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for the configured database URI
+    Returns:
+        Dict of create_engine keyword arguments
+    """
+    if is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return {
+            # THE DRIVER'S OWN LOCK WAIT, IN SECONDS, MATCHES THE PRAGMA BELOW
+            "connect_args": {"timeout": config['SQLITE_BUSY_TIMEOUT_MS'] / 1000},
+        }
+    return {
+        "pool_size": config['DB_POOL_SIZE'],
+        "max_overflow": config['DB_MAX_OVERFLOW'],
+        "pool_timeout": config['DB_POOL_TIMEOUT'],
+        "pool_recycle": config['DB_POOL_RECYCLE'],
+        "pool_pre_ping": True,
+    }
+
+
+def configure_engine(engine, config):
+    """
+    Register per-connection setup on the engine
+    SQLite pragmas are connection scoped, so they are applied on every connect.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
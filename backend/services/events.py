@@ -0,0 +1,111 @@
+"""
+Event Hub - In-process publish/subscribe for live auction updates
+
+Each subscriber gets a bounded queue. Publishing never blocks a request:
+a subscriber whose queue is full simply misses that event, which is safe
+because every event carries absolute totals alongside its delta.
+
+A stream holds its thread for as long as the client listens. Servers with a
+bounded thread pool (services/server.py) put a callable in the WSGI environ
+under STREAM_ENVIRON_KEY. The stream view calls it before streaming, and it
+returns False when no stream thread is left.
+"""
+import json
+import queue
+import threading
+
+STREAM_ENVIRON_KEY = 'hiddendeal.begin_stream'
+
+
+class EventHub:
+    """
+    Fan-out of auction events to Server-Sent Events streams
+    """
+
+    def __init__(self, app=None):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.queue_size = 100
+        self.keepalive = 15
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENT_QUEUE_SIZE', 100)
+        app.config.setdefault('EVENT_KEEPALIVE_SECONDS', 15)
+        app.extensions['event_hub'] = self
+        self.queue_size = app.config['EVENT_QUEUE_SIZE']
+        self.keepalive = app.config['EVENT_KEEPALIVE_SECONDS']
+        with self._lock:
+            self._subscribers = {}
+
+    def subscribe(self, auction_id):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(auction_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, auction_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(auction_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[auction_id]
+
+    def subscriber_count(self, auction_id):
+        with self._lock:
+            return len(self._subscribers.get(auction_id, ()))
+
+    def close(self):
+        """
+        End every open stream, e.g. before a graceful shutdown waits for
+        in-flight requests
+        """
+        with self._lock:
+            subscribers = [subscriber for group in self._subscribers.values() for subscriber in group]
+        for subscriber in subscribers:
+            # MAKE ROOM FOR THE END MARKER, THE CLIENT RECONNECTS AND GETS A FRESH SNAPSHOT
+            while True:
+                try:
+                    subscriber.put_nowait(None)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def publish(self, auction_id, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(auction_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                pass
+
+    def stream(self, auction_id, subscriber, personalize=None):
+        """
+        Yield SSE frames for one subscriber until the client disconnects
+        """
+        try:
+            while True:
+                try:
+                    item = subscriber.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    return
+                event, data = item
+                if personalize:
+                    data = personalize(event, data)
+                yield format_sse(event, data)
+        finally:
+            self.unsubscribe(auction_id, subscriber)
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
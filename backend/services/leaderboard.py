@@ -0,0 +1,162 @@
+"""
+Pool Prize Leaderboard - Per-auction bid counts kept in the auction_bidder table
+
+place_bid adds to the bidder's row in the same transaction as the bid insert,
+so the leaderboard never has to be recomputed from the bid table. Bidders
+rank by number of bids, ties going to whoever placed their first bid
+earlier, and every read below is an index seek on
+(auction_id, bid_count DESC, first_bid_id):
+
+- top(auction_id, n)        the first n rows of the index range
+- standing(auction_id, uid) primary key lookup plus a count of the rows ahead
+- ranked_bidders(ids, n)    the same order for a batch of auctions, used by
+                            settlement to pay the pool prize
+"""
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, update
+
+from extensions import db
+from models import AuctionArchive, AuctionBidder, Bid
+
+# THE POOL PRIZE IS SHARED BY THIS MANY TOP BIDDERS
+PODIUM_SIZE = 3
+
+RANK_ORDER = (AuctionBidder.bid_count.desc(), AuctionBidder.first_bid_id)
+
+
+def record_bids(auction_id, user_id, bid_ids):
+    """
+    Add bids to the bidder's leaderboard row
+    Must run in the bid transaction, after the auction row has been locked,
+    so two writers never insert the same row.
+    """
+    updated = db.session.execute(
+        update(AuctionBidder)
+        .where(AuctionBidder.auction_id == auction_id, AuctionBidder.user_id == user_id)
+        .values(bid_count=AuctionBidder.bid_count + len(bid_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        db.session.execute(insert(AuctionBidder).values(
+            auction_id=auction_id,
+            user_id=user_id,
+            bid_count=len(bid_ids),
+            first_bid_id=min(bid_ids)
+        ))
+
+
+def top(auction_id, limit=PODIUM_SIZE):
+    """
+    Returns:
+        [(rank, user_id, bid_count), ...] best first
+    """
+    rows = db.session.execute(
+        select(AuctionBidder.user_id, AuctionBidder.bid_count)
+        .where(AuctionBidder.auction_id == auction_id)
+        .order_by(*RANK_ORDER)
+        .limit(limit)
+    ).all()
+    return [(rank, user_id, bid_count) for rank, (user_id, bid_count) in enumerate(rows, 1)]
+
+
+def standing(auction_id, user_id, podium=PODIUM_SIZE):
+    """
+    A bidder's position and what it takes to reach the pool prize places
+    Returns:
+        Dict with rank (None without bids), bid_count and bids_to_podium,
+        the number of further bids that would move the user into the top
+        `podium` places (0 if already there)
+    """
+    mine = db.session.get(AuctionBidder, (auction_id, user_id))
+    last_place = db.session.execute(
+        select(AuctionBidder.bid_count, AuctionBidder.first_bid_id)
+        .where(AuctionBidder.auction_id == auction_id)
+        .order_by(*RANK_ORDER)
+        .offset(podium - 1)
+        .limit(1)
+    ).first()
+
+    if mine is None:
+        # A FIRST BID WOULD BE LATER THAN EVERY EXISTING ONE AND LOSE THE TIE
+        return {
+            "rank": None,
+            "bid_count": 0,
+            "bids_to_podium": last_place.bid_count + 1 if last_place else 1
+        }
+
+    ahead = db.session.execute(
+        select(func.count())
+        .select_from(AuctionBidder)
+        .where(
+            AuctionBidder.auction_id == auction_id,
+            or_(
+                AuctionBidder.bid_count > mine.bid_count,
+                and_(AuctionBidder.bid_count == mine.bid_count, AuctionBidder.first_bid_id < mine.first_bid_id)
+            )
+        )
+    ).scalar()
+    rank = ahead + 1
+
+    bids_to_podium = 0
+    if rank > podium:
+        bids_to_podium = last_place.bid_count - mine.bid_count
+        if mine.first_bid_id > last_place.first_bid_id:
+            bids_to_podium += 1
+
+    return {"rank": rank, "bid_count": mine.bid_count, "bids_to_podium": bids_to_podium}
+
+
+def ranked_bidders(auction_ids, limit=PODIUM_SIZE):
+    """
+    Top bidders of many auctions in one query
+    Returns:
+        Dict of auction_id -> [(rank, user_id, bid_count), ...]
+    """
+    ranked = select(
+        AuctionBidder.auction_id,
+        AuctionBidder.user_id,
+        AuctionBidder.bid_count,
+        func.row_number().over(
+            partition_by=AuctionBidder.auction_id,
+            order_by=RANK_ORDER
+        ).label('rank')
+    ).where(
+        AuctionBidder.auction_id.in_(auction_ids)
+    ).subquery()
+
+    rows = db.session.execute(
+        select(ranked.c.auction_id, ranked.c.rank, ranked.c.user_id, ranked.c.bid_count)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.auction_id, ranked.c.rank)
+    )
+    result = {}
+    for auction_id, rank, user_id, bid_count in rows:
+        result.setdefault(auction_id, []).append((rank, user_id, bid_count))
+    return result
+
+
+def rebuild(auction_ids=None):
+    """
+    Recompute leaderboard rows from the bid table, for all auctions or the given ones
+    Returns:
+        Number of leaderboard rows written
+    """
+    counts = select(
+        Bid.auction_id,
+        Bid.user_id,
+        func.count(Bid.id),
+        func.min(Bid.id)
+    ).group_by(Bid.auction_id, Bid.user_id)
+    # ARCHIVED AUCTIONS KEEP THEIR ROWS, THEIR BIDS ARE NO LONGER IN THE TABLE
+    clear = delete(AuctionBidder).where(~exists().where(AuctionArchive.auction_id == AuctionBidder.auction_id))
+    if auction_ids is not None:
+        counts = counts.where(Bid.auction_id.in_(auction_ids))
+        clear = clear.where(AuctionBidder.auction_id.in_(auction_ids))
+
+    db.session.execute(clear)
+    written = db.session.execute(
+        insert(AuctionBidder).from_select(
+            ['auction_id', 'user_id', 'bid_count', 'first_bid_id'], counts
+        )
+    ).rowcount
+    db.session.commit()
+    return written
@@ -0,0 +1,308 @@
+"""
+Wallet Ledger - Insert-only record of money movements, with snapshots
+
+Every movement of money is one wallet_ledger row: opening balances, top-ups,
+bid debits, creator credits, pool contributions and prize payouts. Rows are
+only ever inserted, so concurrent bids never wait on each other's row locks
+to record them, and the table is an audit trail to reconcile wallets with.
+
+Wallet.balance stays the spendable balance that bids are checked against.
+Bidders, top-ups and payouts update it in the same transaction as their
+ledger entry, but creator credits are only inserted: on a popular auction
+every bid used to update the creator's wallet row. fold_creator_credits()
+adds the credits to creator wallets in the background and sets their
+folded_at, so a creator's spendable balance lags by about
+LEDGER_FOLD_SECONDS.
+
+take_snapshots() periodically records each wallet's ledger balance and
+stamps the entries it included with the run's snapshot_id, so a ledger
+balance is the user's latest snapshot plus their entries without one, and
+verify() can compare it with the wallet without summing the whole history.
+
+Both jobs claim entries by marking them with a conditional UPDATE rather
+than by an id cursor. Ids are taken at insert but become visible at commit,
+so an entry that commits after a higher id was processed is simply claimed
+by the next run.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Auction, LedgerCursor, Wallet, WalletLedger, WalletSnapshot
+
+SNAPSHOT_CURSOR = 'snapshots'
+
+
+def record(kind, amount, user_id=None, auction_id=None):
+    """
+    Add one ledger entry to the current transaction
+    """
+    record_many([{"user_id": user_id, "auction_id": auction_id, "kind": kind, "amount": amount}])
+
+
+def record_many(entries):
+    """
+    Add ledger entries to the current transaction with one executemany INSERT
+    Args:
+        entries: dicts with kind, amount and optionally user_id and auction_id
+    """
+    if not entries:
+        return
+    created_at = datetime.now(timezone.utc)
+    db.session.execute(insert(WalletLedger), [
+        {"user_id": None, "auction_id": None, "created_at": created_at, **entry} for entry in entries
+    ])
+
+
+def credit_wallets(credits):
+    """
+    Add amounts in cents to many wallets with one executemany UPDATE,
+    creating wallets for users who do not have one yet
+    """
+    if not credits:
+        return
+    existing = set(db.session.execute(
+        select(Wallet.user_id).where(Wallet.user_id.in_(credits))
+    ).scalars())
+    # ORM INSERTS SO NEW WALLETS GET THEIR OPENING BALANCE ENTRY (SEE models.py)
+    db.session.add_all(Wallet(user_id=user_id) for user_id in credits if user_id not in existing)
+    db.session.flush()
+
+    wallet = Wallet.__table__
+    db.session.execute(
+        update(wallet)
+        .where(wallet.c.user_id == bindparam('credit_user_id'))
+        .values(balance=wallet.c.balance + bindparam('credit_amount')),
+        [{"credit_user_id": user_id, "credit_amount": amount} for user_id, amount in credits.items()]
+    )
+
+
+def top_up(user_id, amount):
+    """
+    Add funds to a wallet with one atomic UPDATE, so a bid debiting it at
+    the same time is not overwritten, and record the top-up, without
+    committing. A missing wallet is created empty first.
+    Returns:
+        The new balance in cents
+    """
+    statement = (
+        update(Wallet)
+        .where(Wallet.user_id == user_id)
+        .values(balance=Wallet.balance + amount)
+        .returning(Wallet.balance)
+        .execution_options(synchronize_session=False)
+    )
+    new_balance = db.session.execute(statement).scalar()
+    if new_balance is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(Wallet(user_id=user_id, balance=0))
+        except IntegrityError:
+            # CREATED BY A CONCURRENT REQUEST, THE UPDATE BELOW ADDS TO IT
+            pass
+        new_balance = db.session.execute(statement).scalar()
+    record('top_up', amount, user_id)
+    return new_balance
+
+
+def _cursor_position(name):
+    return db.session.execute(
+        select(LedgerCursor.position).where(LedgerCursor.name == name)
+    ).scalar() or 0
+
+
+def _advance_cursor(name, start, end):
+    """
+    Move a cursor from start to end, the first write of the job's transaction
+    Returns:
+        False if another worker moved it first
+    """
+    moved = db.session.execute(
+        update(LedgerCursor)
+        .where(LedgerCursor.name == name, LedgerCursor.position == start)
+        .values(position=end)
+    ).rowcount
+    if moved:
+        return True
+    if start:
+        return False
+    try:
+        with db.session.begin_nested():
+            db.session.add(LedgerCursor(name=name, position=end))
+        return True
+    except IntegrityError:
+        return False
+
+
+def fold_creator_credits(current_time=None):
+    """
+    Add creator credits that are not folded yet to the creators' wallets
+    Returns:
+        Number of wallets credited
+    """
+    current_time = current_time or datetime.now(timezone.utc)
+    try:
+        # CLAIM: A CONCURRENT FOLD WAITS FOR THESE ROWS AND THEN NO LONGER MATCHES THEM
+        claimed = db.session.execute(
+            update(WalletLedger)
+            .where(WalletLedger.kind == 'creator_credit', WalletLedger.folded_at.is_(None))
+            .values(folded_at=current_time)
+            .returning(WalletLedger.user_id, WalletLedger.amount)
+            .execution_options(synchronize_session=False)
+        ).all()
+        credits = {}
+        for user_id, amount in claimed:
+            credits[user_id] = credits.get(user_id, 0) + amount
+        credit_wallets(credits)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(credits)
+
+
+def take_snapshots(current_time=None):
+    """
+    Record the ledger balance of every wallet with entries not in a snapshot yet
+    Returns:
+        Number of snapshots written
+    """
+    current_time = current_time or datetime.now(timezone.utc)
+    previous_run = _cursor_position(SNAPSHOT_CURSOR)
+    newest = db.session.execute(
+        select(func.max(WalletLedger.id)).where(WalletLedger.snapshot_id.is_(None), WalletLedger.user_id.isnot(None))
+    ).scalar()
+    if newest is None:
+        db.session.rollback()
+        return 0
+    # IN THE ID RANGE SO SNAPSHOTS TAKEN BEFORE THE MARKS EXISTED STAY OLDER, AND ALWAYS GROWING
+    run = max(newest, previous_run + 1)
+
+    try:
+        if not _advance_cursor(SNAPSHOT_CURSOR, previous_run, run):
+            db.session.rollback()
+            return 0
+        claimed = db.session.execute(
+            update(WalletLedger)
+            .where(WalletLedger.snapshot_id.is_(None), WalletLedger.user_id.isnot(None))
+            .values(snapshot_id=run)
+            .returning(WalletLedger.user_id, WalletLedger.amount)
+            .execution_options(synchronize_session=False)
+        ).all()
+        changes = {}
+        for user_id, amount in claimed:
+            changes[user_id] = changes.get(user_id, 0) + amount
+        previous = _latest_snapshots(list(changes))
+        if changes:
+            db.session.execute(insert(WalletSnapshot), [{
+                "user_id": user_id,
+                "ledger_id": run,
+                "balance": previous.get(user_id, 0) + amount,
+                "created_at": current_time
+            } for user_id, amount in changes.items()])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(changes)
+
+
+def _latest_snapshots(user_ids=None):
+    """
+    Returns:
+        Dict of user_id -> balance of the user's latest snapshot
+    """
+    latest = select(
+        WalletSnapshot.user_id, func.max(WalletSnapshot.ledger_id).label('ledger_id')
+    ).group_by(WalletSnapshot.user_id)
+    if user_ids is not None:
+        latest = latest.where(WalletSnapshot.user_id.in_(user_ids))
+    latest = latest.subquery()
+    return dict(db.session.execute(
+        select(WalletSnapshot.user_id, WalletSnapshot.balance).join(
+            latest,
+            (latest.c.user_id == WalletSnapshot.user_id) & (latest.c.ledger_id == WalletSnapshot.ledger_id)
+        )
+    ).all())
+
+
+def ledger_balances(user_ids=None):
+    """
+    Balances according to the ledger: latest snapshot plus newer entries
+    Returns:
+        Dict of user_id -> balance in cents
+    """
+    balances = _latest_snapshots(user_ids)
+    newer = select(WalletLedger.user_id, func.sum(WalletLedger.amount)).where(
+        WalletLedger.user_id.isnot(None),
+        WalletLedger.snapshot_id.is_(None)
+    ).group_by(WalletLedger.user_id)
+    if user_ids is not None:
+        newer = newer.where(WalletLedger.user_id.in_(user_ids))
+    for user_id, amount in db.session.execute(newer):
+        balances[user_id] = balances.get(user_id, 0) + amount
+    return balances
+
+
+def pending_credits(user_ids=None):
+    """
+    Creator credits recorded but not yet folded into wallet balances
+    Returns:
+        Dict of user_id -> amount in cents
+    """
+    query = select(WalletLedger.user_id, func.sum(WalletLedger.amount)).where(
+        WalletLedger.kind == 'creator_credit',
+        WalletLedger.folded_at.is_(None)
+    ).group_by(WalletLedger.user_id)
+    if user_ids is not None:
+        query = query.where(WalletLedger.user_id.in_(user_ids))
+    return dict(db.session.execute(query).all())
+
+
+def repair_wallets():
+    """
+    Bring wallets that disagree with the ledger to their ledger balance,
+    e.g. to add creator credits that an id cursor skipped before entries
+    were marked folded
+    Returns:
+        The wallet mismatches that were repaired, as verify() reports them
+    """
+    wallet_mismatches, _ = verify()
+    credit_wallets({user_id: ledger_balance - balance for user_id, balance, ledger_balance in wallet_mismatches})
+    db.session.commit()
+    return wallet_mismatches
+
+
+def verify():
+    """
+    Compare wallets and auction pools with the ledger
+    Returns:
+        (wallet mismatches [(user_id, wallet balance, ledger balance)],
+         pool mismatches [(auction_id, pool_prize, ledger pool)]),
+        where a wallet's balance includes its pending creator credits
+    """
+    balances = ledger_balances()
+    pending = pending_credits()
+    wallets = dict(db.session.execute(select(Wallet.user_id, Wallet.balance)).all())
+    wallet_mismatches = [
+        (user_id, wallets.get(user_id, 0) + pending.get(user_id, 0), balances.get(user_id, 0))
+        for user_id in sorted(set(wallets) | set(balances))
+        if wallets.get(user_id, 0) + pending.get(user_id, 0) != balances.get(user_id, 0)
+    ]
+
+    pools = dict(db.session.execute(
+        select(WalletLedger.auction_id, func.sum(WalletLedger.amount))
+        .where(WalletLedger.user_id.is_(None))
+        .group_by(WalletLedger.auction_id)
+    ).all())
+    pool_prizes = dict(db.session.execute(
+        select(Auction.id, Auction.pool_prize).where(Auction.pool_prize > 0)
+    ).all())
+    pool_mismatches = [
+        (auction_id, pool_prizes.get(auction_id, 0), pools.get(auction_id, 0))
+        for auction_id in sorted(set(pools) | set(pool_prizes))
+        if pool_prizes.get(auction_id, 0) != pools.get(auction_id, 0)
+    ]
+    return wallet_mismatches, pool_mismatches
@@ -0,0 +1,67 @@
+"""
+Ledger Worker - Background folding of creator credits and balance snapshots
+
+Runs services/ledger.py's fold_creator_credits() every LEDGER_FOLD_SECONDS
+and take_snapshots() every LEDGER_SNAPSHOT_SECONDS on a daemon thread. Both
+claim the entries they process with a conditional UPDATE, so running a
+worker in every process is safe.
+"""
+import logging
+import threading
+import time
+
+
+class LedgerWorker:
+    """
+    Periodic ledger jobs on a daemon thread
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LEDGER_FOLD_SECONDS', 1.0)
+        app.config.setdefault('LEDGER_SNAPSHOT_SECONDS', 300)
+        app.extensions['ledger_worker'] = self
+        self.app = app
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ledger-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self, snapshot=False):
+        """
+        Fold pending creator credits, and take snapshots if asked to
+        Returns:
+            (wallets credited, snapshots written)
+        """
+        from services.ledger import fold_creator_credits, take_snapshots
+
+        credited = fold_creator_credits()
+        snapshots = take_snapshots() if snapshot else 0
+        return credited, snapshots
+
+    def _run(self):
+        last_snapshot = time.monotonic()
+        while not self._stop.wait(self.app.config['LEDGER_FOLD_SECONDS']):
+            snapshot = time.monotonic() - last_snapshot >= self.app.config['LEDGER_SNAPSHOT_SECONDS']
+            with self.app.app_context():
+                try:
+                    self.run_once(snapshot)
+                except Exception as e:
+                    logging.error(f"Error running ledger jobs: {str(e)}")
+            if snapshot:
+                last_snapshot = time.monotonic()
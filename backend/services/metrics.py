@@ -0,0 +1,329 @@
+"""
+Request Metrics - Per-endpoint latency, SQL and bid outcome instrumentation
+
+Every request is timed and the SQL statements it runs are counted and timed
+through SQLAlchemy cursor events, so an endpoint that suddenly issues one
+query per row shows up as a jump in its statements-per-request histogram.
+Commits, bid placement outcomes and rate limiter decisions are counted as
+well.
+
+Everything is kept in process and rendered in the Prometheus text format by
+render(), which the /metrics route serves. With SLOW_REQUEST_SECONDS set,
+requests slower than that are logged together with the queries they ran.
+
+Worker processes of serve.py share one listening socket, so a scrape reaches
+one of them at random. With METRICS_DIR set, each worker writes its counts
+to a file of its own there every METRICS_FLUSH_SECONDS, once start() was
+called, and once more on stop(). render() then returns the sum over all
+files, including those of workers that have exited, so counters never go
+backwards.
+"""
+import logging
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from services.responses import dumps, loads
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+HISTOGRAMS = ('request_latency', 'request_statements', 'request_db_seconds')
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram keyed by a tuple of label values
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts, total, observations = self.series.get(labels, ([0] * len(self.buckets), 0, 0))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.series[labels] = (counts, total + value, observations + 1)
+
+    def add(self, labels, counts, total, observations):
+        current, current_total, current_observations = self.series.get(labels, ([0] * len(self.buckets), 0, 0))
+        self.series[labels] = ([a + b for a, b in zip(current, counts)], current_total + total,
+                               current_observations + observations)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metrics:
+    """
+    In-process request, database and bid metrics
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.slow_request_seconds = None
+        self.slow_query_limit = 50
+        self.shared_dir = None
+        self.flush_seconds = 1.0
+        self._path = None
+        self._path_pid = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._reset()
+        if app is not None:
+            self.init_app(app)
+
+    def _reset(self):
+        self.request_latency = Histogram(LATENCY_BUCKETS)
+        self.request_statements = Histogram(STATEMENT_BUCKETS)
+        self.request_db_seconds = Histogram(LATENCY_BUCKETS)
+        self.requests = {}
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.commits = 0
+        self.bid_outcomes = {}
+        self.rate_limit_decisions = {}
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_REQUEST_SECONDS', None)
+        app.config.setdefault('SLOW_REQUEST_QUERY_LIMIT', 50)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_SECONDS', 1.0)
+        app.extensions['metrics'] = self
+        self.slow_request_seconds = app.config['SLOW_REQUEST_SECONDS']
+        self.slow_query_limit = app.config['SLOW_REQUEST_QUERY_LIMIT']
+        self.shared_dir = app.config['METRICS_DIR']
+        self.flush_seconds = app.config['METRICS_FLUSH_SECONDS']
+        with self._lock:
+            self._reset()
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+        # REQUIRES db.init_app(app) TO HAVE RUN
+        with app.app_context():
+            engine = app.extensions['sqlalchemy'].engine
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'commit', self._on_commit)
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_statements = 0
+        g.metrics_db_seconds = 0.0
+        g.metrics_queries = [] if self.slow_request_seconds is not None else None
+
+    def _finish_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = (request.method, endpoint)
+        statements = g.pop('metrics_statements', 0)
+        db_seconds = g.pop('metrics_db_seconds', 0.0)
+        queries = g.pop('metrics_queries', None)
+
+        with self._lock:
+            self.request_latency.observe(labels, duration)
+            self.request_statements.observe(labels, statements)
+            self.request_db_seconds.observe(labels, db_seconds)
+            key = labels + (str(response.status_code),)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+        if self.slow_request_seconds is not None and duration >= self.slow_request_seconds:
+            lines = [f"Slow request: {request.method} {request.full_path.rstrip('?')} took {duration:.3f}s, "
+                     f"{statements} SQL statements in {db_seconds:.3f}s"]
+            for query_seconds, statement in queries or []:
+                lines.append(f"  {query_seconds * 1000:8.2f}ms  {statement}")
+            if statements > len(queries or []):
+                lines.append(f"  ... {statements - len(queries or [])} more")
+            logging.warning("\n".join(lines))
+        return response
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        with self._lock:
+            self.statements += 1
+            self.db_seconds += elapsed
+        if has_request_context() and 'metrics_started' in g:
+            g.metrics_statements += 1
+            g.metrics_db_seconds += elapsed
+            queries = g.metrics_queries
+            if queries is not None and len(queries) < self.slow_query_limit:
+                queries.append((elapsed, ' '.join(statement.split())))
+
+    def _on_commit(self, conn):
+        with self._lock:
+            self.commits += 1
+
+    def record_bid(self, outcome, count=1):
+        """
+        Count bid placement outcomes, e.g. accepted, insufficient_funds, auction_expired
+        """
+        with self._lock:
+            self.bid_outcomes[outcome] = self.bid_outcomes.get(outcome, 0) + count
+
+    def record_rate_limit(self, budget, decision):
+        """
+        Count rate limiter decisions: allowed, limited_user, limited_ip or error
+        """
+        with self._lock:
+            key = (budget, decision)
+            self.rate_limit_decisions[key] = self.rate_limit_decisions.get(key, 0) + 1
+
+    def _state(self):
+        with self._lock:
+            return {
+                "requests": [[list(key), count] for key, count in self.requests.items()],
+                "histograms": {name: [[list(labels), counts, total, observations]
+                                      for labels, (counts, total, observations) in getattr(self, name).series.items()]
+                               for name in HISTOGRAMS},
+                "statements": self.statements,
+                "db_seconds": self.db_seconds,
+                "commits": self.commits,
+                "bid_outcomes": self.bid_outcomes,
+                "rate_limit_decisions": [[list(key), count] for key, count in self.rate_limit_decisions.items()],
+            }
+
+    def _add_state(self, state):
+        with self._lock:
+            for key, count in state["requests"]:
+                key = tuple(key)
+                self.requests[key] = self.requests.get(key, 0) + count
+            for name, series in state["histograms"].items():
+                for labels, counts, total, observations in series:
+                    getattr(self, name).add(tuple(labels), counts, total, observations)
+            self.statements += state["statements"]
+            self.db_seconds += state["db_seconds"]
+            self.commits += state["commits"]
+            for outcome, count in state["bid_outcomes"].items():
+                self.bid_outcomes[outcome] = self.bid_outcomes.get(outcome, 0) + count
+            for key, count in state["rate_limit_decisions"]:
+                key = tuple(key)
+                self.rate_limit_decisions[key] = self.rate_limit_decisions.get(key, 0) + count
+
+    def flush(self):
+        """
+        Write this process's counts to its file in METRICS_DIR
+        """
+        if self.shared_dir is None:
+            return
+        if self._path_pid != os.getpid():
+            # A FORKED WORKER GETS ITS OWN FILE, A REUSED PID MUST NOT OVERWRITE AN EXITED WORKER'S
+            self._path_pid = os.getpid()
+            self._path = os.path.join(self.shared_dir, f'{self._path_pid}-{time.time_ns()}.json')
+        try:
+            with open(self._path + '.tmp', 'wb') as f:
+                f.write(dumps(self._state()))
+            os.replace(self._path + '.tmp', self._path)
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {self.shared_dir}: {str(e)}")
+
+    def start(self):
+        """
+        Start counting this worker process from zero and flushing its counts
+        """
+        if self.shared_dir is None or self._thread is not None:
+            return
+        # A FORKED WORKER WOULD OTHERWISE REPORT WHAT THE MASTER COUNTED WHILE WARMING UP
+        with self._lock:
+            self._reset()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_seconds):
+            self.flush()
+
+    def render(self):
+        """
+        Returns:
+            All metrics in the Prometheus text exposition format, summed
+            over every worker process when METRICS_DIR is set
+        """
+        if self.shared_dir is None:
+            return self._render()
+        self.flush()
+        total = Metrics()
+        for name in sorted(os.listdir(self.shared_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.shared_dir, name), 'rb') as f:
+                    total._add_state(loads(f.read()))
+            except (OSError, ValueError) as e:
+                logging.warning(f"Skipping metrics file {name}: {str(e)}")
+        return total._render()
+
+    def _render(self):
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP hiddendeal_http_requests_total HTTP requests by endpoint and status.",
+                "# TYPE hiddendeal_http_requests_total counter",
+            ]
+            for values, count in sorted(self.requests.items()):
+                lines.append(f"hiddendeal_http_requests_total{_labels(('method', 'endpoint', 'status'), values)} {count}")
+
+            histograms = (
+                ('hiddendeal_http_request_duration_seconds', "Request latency in seconds.", self.request_latency),
+                ('hiddendeal_http_request_db_statements', "SQL statements executed per request.", self.request_statements),
+                ('hiddendeal_http_request_db_seconds', "Time spent in SQL per request in seconds.", self.request_db_seconds),
+            )
+            for name, description, histogram in histograms:
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+                for values, (counts, total, observations) in sorted(histogram.series.items()):
+                    for bound, count in zip(histogram.buckets, counts):
+                        lines.append(f"{name}_bucket{_labels(('method', 'endpoint'), values, ('le', bound))} {count}")
+                    lines.append(f"{name}_bucket{_labels(('method', 'endpoint'), values, ('le', '+Inf'))} {observations}")
+                    lines.append(f"{name}_sum{_labels(('method', 'endpoint'), values)} {total}")
+                    lines.append(f"{name}_count{_labels(('method', 'endpoint'), values)} {observations}")
+
+            lines += [
+                "# HELP hiddendeal_db_statements_total SQL statements executed.",
+                "# TYPE hiddendeal_db_statements_total counter",
+                f"hiddendeal_db_statements_total {self.statements}",
+                "# HELP hiddendeal_db_seconds_total Time spent executing SQL in seconds.",
+                "# TYPE hiddendeal_db_seconds_total counter",
+                f"hiddendeal_db_seconds_total {self.db_seconds}",
+                "# HELP hiddendeal_db_commits_total Database transaction commits.",
+                "# TYPE hiddendeal_db_commits_total counter",
+                f"hiddendeal_db_commits_total {self.commits}",
+                "# HELP hiddendeal_bids_total Bid placement outcomes, counted per bid.",
+                "# TYPE hiddendeal_bids_total counter",
+            ]
+            for outcome, count in sorted(self.bid_outcomes.items()):
+                lines.append(f"hiddendeal_bids_total{_labels(('outcome',), (outcome,))} {count}")
+
+            lines += [
+                "# HELP hiddendeal_rate_limit_decisions_total Rate limiter decisions by budget.",
+                "# TYPE hiddendeal_rate_limit_decisions_total counter",
+            ]
+            for values, count in sorted(self.rate_limit_decisions.items()):
+                lines.append(f"hiddendeal_rate_limit_decisions_total{_labels(('budget', 'decision'), values)} {count}")
+        return "\n".join(lines) + "\n"
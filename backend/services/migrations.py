@@ -0,0 +1,84 @@
+"""
+Migration Runner - Applies numbered schema migrations to an existing database
+
+Migrations live in backend/migrations as `NNNN_description.py` modules that
+expose `upgrade(connection)`. Applied versions are recorded in the
+`schema_migrations` table, and each migration runs in its own transaction.
+A database created from scratch by setup.py is stamped as fully migrated.
+"""
+import importlib
+import logging
+import os
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_\w+\.py$')
+
+schema_migrations = Table(
+    'schema_migrations',
+    MetaData(),
+    Column('version', String(64), primary_key=True),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def available_migrations():
+    """
+    Returns:
+        Migration module names, in the order they must be applied
+    """
+    return sorted(
+        name[:-3] for name in os.listdir(MIGRATIONS_DIR) if MIGRATION_FILE.match(name)
+    )
+
+
+def applied_migrations(engine):
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return {row[0] for row in connection.execute(select(schema_migrations.c.version))}
+
+
+def pending_migrations(engine):
+    applied = applied_migrations(engine)
+    return [name for name in available_migrations() if name not in applied]
+
+
+def _record(connection, name):
+    connection.execute(schema_migrations.insert().values(version=name, applied_at=datetime.now(timezone.utc)))
+
+
+def upgrade(engine):
+    """
+    Apply every pending migration
+    Returns:
+        Names of the migrations that were applied
+    """
+    applied = []
+    for name in pending_migrations(engine):
+        module = importlib.import_module(f'migrations.{name}')
+        with engine.connect() as connection:
+            prepare = getattr(module, 'prepare', None)
+            if prepare:
+                # CONNECTION SETTINGS THAT CANNOT CHANGE INSIDE A TRANSACTION
+                prepare(connection)
+                connection.commit()
+            with connection.begin():
+                module.upgrade(connection)
+                _record(connection, name)
+        logging.info(f"Applied migration {name}")
+        applied.append(name)
+    return applied
+
+
+def stamp(engine):
+    """
+    Mark every migration as applied, for a schema created by create_all()
+    """
+    pending = pending_migrations(engine)
+    with engine.begin() as connection:
+        for name in pending:
+            _record(connection, name)
+    return pending
@@ -0,0 +1,88 @@
+"""
+Password Hasher - bcrypt on a bounded worker pool
+
+Hashing and checking a password costs ~100 ms of CPU at the default cost.
+Running it on the request thread lets a burst of logins occupy every request
+thread, so bids queue up behind them. Here bcrypt runs on a small thread
+pool instead (bcrypt releases the GIL, so the pool hashes in parallel), and
+at most PASSWORD_HASH_MAX_PENDING operations may be running or waiting at
+once: beyond that auth requests fail fast with PasswordHasherBusy rather than
+tying up more request threads.
+
+The cost factor is Flask-Bcrypt's BCRYPT_LOG_ROUNDS. Hashes made with a
+different cost are upgraded on the next successful login (needs_rehash).
+PASSWORD_HASH_WORKERS = 0 hashes on the request thread with no limit, as
+before, which benchmarks/auth_load.py uses as its baseline.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """
+    Bounded-concurrency wrapper around Flask-Bcrypt
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self._executor = None
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        default_workers = max(1, (os.cpu_count() or 2) // 2)
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', default_workers)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 4 * (app.config['PASSWORD_HASH_WORKERS'] or default_workers))
+        app.extensions['password_hasher'] = self
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = None
+        self._slots = None
+        if app.config['PASSWORD_HASH_WORKERS'] > 0:
+            self._executor = ThreadPoolExecutor(
+                max_workers=app.config['PASSWORD_HASH_WORKERS'], thread_name_prefix='password-hash'
+            )
+            self._slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+
+    def _run(self, function, *args):
+        if self._executor is None:
+            return function(*args)
+        # FAIL FAST INSTEAD OF WAITING, A WAITING REQUEST WOULD HOLD A REQUEST THREAD
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Too many password operations in progress")
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """
+        Returns:
+            bcrypt hash of the password at the configured cost, as text
+        """
+        from extensions import bcrypt
+
+        return self._run(bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def check(self, pw_hash, password):
+        from extensions import bcrypt
+
+        return self._run(bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """
+        True when the hash was made with a different cost than the configured one
+        """
+        try:
+            return int(pw_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
@@ -0,0 +1,211 @@
+"""
+Rate Limiter - Per-user and per-IP admission control for expensive endpoints
+
+Each bid costs several queries and a commit, and each login or registration
+a bcrypt hash, so one scripted client can take the capacity everyone else
+needs. Views decorated with @rate_limiter.limit(budget) are admitted only
+while the caller has budget left, checked after the JWT is verified and
+before any database work. Otherwise they answer 429 with Retry-After.
+
+A budget maps each scope it is counted under to a (requests per second,
+burst) pair. RATE_LIMITS replaces budgets of DEFAULT_LIMITS by name. Scopes:
+- user: the JWT identity, for endpoints that require one
+- ip: the client address. With RATE_LIMIT_TRUSTED_PROXIES = n it is taken
+  from X-Forwarded-For as the n-th proxy saw it.
+A request has to fit every scope of its budget.
+
+Backends:
+- memory: a token bucket per key in this process. Each worker process
+  grants the budget on its own. RATE_LIMIT_MAX_KEYS bounds the number of
+  buckets, and the least recently used ones are dropped first.
+- shared: counters in the cache backend (services/cache.py), so every
+  worker process draws on the same budget. It approximates the bucket with
+  a sliding window of burst / rate seconds that holds at most burst
+  requests. It needs CACHE_BACKEND redis, or memory with a single worker.
+
+Decisions are counted in services/metrics.py. When the shared backend
+cannot be reached, requests are admitted and the error is logged.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request
+
+from services.cache import KEY_PREFIX, CacheError, NullBackend
+
+DEFAULT_LIMITS = {
+    'bid': {'user': (5, 20), 'ip': (50, 100)},
+    'bid_batch': {'user': (1, 5), 'ip': (10, 20)},
+    'login': {'ip': (1, 10)},
+    'register': {'ip': (0.2, 5)},
+}
+
+
+class MemoryBuckets:
+    """
+    Token buckets keyed by (budget, scope, key), least recently used first
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, budget, keys, now=None):
+        """
+        Take one token from every bucket, or from none of them
+        Args:
+            keys: [(scope, key, rate, burst), ...]
+        Returns:
+            [(scope, seconds until a token is back), ...] of the empty buckets
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            levels, empty = [], []
+            for scope, key, rate, burst in keys:
+                bucket_key = (budget, scope, key)
+                tokens, updated = self._buckets.get(bucket_key, (burst, now))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                levels.append((bucket_key, tokens))
+                if tokens < 1:
+                    empty.append((scope, (1 - tokens) / rate))
+            # A REJECTED REQUEST TAKES NOTHING, THE CALLER'S OTHER BUCKETS KEEP THEIR TOKENS
+            for bucket_key, tokens in levels:
+                self._buckets[bucket_key] = (tokens if empty else tokens - 1, now)
+                self._buckets.move_to_end(bucket_key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return empty
+
+
+class SharedWindows:
+    """
+    Sliding window counters in a cache backend shared by all workers
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def acquire(self, budget, keys, now=None):
+        """
+        Count one request in every window
+        Returns:
+            [(scope, estimated seconds until it would fit), ...] of the full windows
+        """
+        now = time.time() if now is None else now
+        hits, windows = [], []
+        for scope, key, rate, burst in keys:
+            window = burst / rate
+            number, elapsed = divmod(now, window)
+            prefix = f'{KEY_PREFIX}:ratelimit:{budget}:{scope}:{key}'
+            hits.append((f'{prefix}:{int(number)}', f'{prefix}:{int(number) - 1}', math.ceil(2 * window)))
+            windows.append((scope, rate, burst, elapsed / window))
+
+        full = []
+        for (scope, rate, burst, progress), (current, previous) in zip(windows, self.backend.hit(hits)):
+            # THE PREVIOUS WINDOW COUNTS FOR THE PART OF IT STILL INSIDE THE SLIDING WINDOW
+            estimate = previous * (1 - progress) + current
+            if estimate > burst:
+                full.append((scope, (estimate - burst) / rate))
+        return full
+
+
+class RateLimiter:
+    """
+    Admission control for views, configured per budget
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.limits = {}
+        self.trusted_proxies = 0
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMIT_BACKEND', 'memory')
+        app.config.setdefault('RATE_LIMIT_MAX_KEYS', 100000)
+        app.config.setdefault('RATE_LIMIT_TRUSTED_PROXIES', 0)
+        app.config.setdefault('RATE_LIMITS', {})
+        app.extensions['rate_limiter'] = self
+        self.enabled = app.config['RATE_LIMIT_ENABLED']
+        self.limits = {**DEFAULT_LIMITS, **app.config['RATE_LIMITS']}
+        self.trusted_proxies = app.config['RATE_LIMIT_TRUSTED_PROXIES']
+
+        backend = app.config['RATE_LIMIT_BACKEND']
+        if backend == 'memory':
+            self.store = MemoryBuckets(app.config['RATE_LIMIT_MAX_KEYS'])
+        elif backend == 'shared':
+            # REQUIRES cache.init_app(app) TO HAVE RUN
+            cache_backend = app.extensions['cache'].backend
+            if isinstance(cache_backend, NullBackend):
+                raise ValueError("RATE_LIMIT_BACKEND=shared needs a CACHE_BACKEND other than none")
+            self.store = SharedWindows(cache_backend)
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend!r}")
+
+    def client_ip(self):
+        """
+        Returns:
+            The client address, as the outermost trusted proxy saw it
+        """
+        route = request.access_route
+        if self.trusted_proxies and len(route) >= self.trusted_proxies:
+            return route[-self.trusted_proxies]
+        return request.remote_addr
+
+    def check(self, budget):
+        """
+        Returns:
+            None to admit the request, or the seconds the caller should wait
+        """
+        from extensions import metrics
+
+        scopes = self.limits.get(budget)
+        if not self.enabled or not scopes:
+            return None
+        keys = []
+        for scope, (rate, burst) in scopes.items():
+            if scope == 'user':
+                from flask_jwt_extended import get_jwt_identity
+                key = get_jwt_identity()
+            else:
+                key = self.client_ip()
+            if key is not None:
+                keys.append((scope, key, rate, burst))
+
+        try:
+            limited = self.store.acquire(budget, keys)
+        except (OSError, CacheError) as e:
+            logging.warning(f"Rate limit check failed, admitting the request: {str(e)}")
+            metrics.record_rate_limit(budget, 'error')
+            return None
+        if not limited:
+            metrics.record_rate_limit(budget, 'allowed')
+            return None
+        scope, wait = max(limited, key=lambda item: item[1])
+        metrics.record_rate_limit(budget, f'limited_{scope}')
+        return wait
+
+    def limit(self, budget):
+        """
+        Decorator admitting a view's requests within the named budget
+        Put it below @jwt_required() so the user scope knows the identity.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                wait = self.check(budget)
+                if wait is not None:
+                    response = jsonify({"message": "Too many requests, please retry shortly"})
+                    response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+                    return response, 429
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
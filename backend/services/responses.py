@@ -0,0 +1,193 @@
+"""
+Response Layer - Fast JSON, compression and conditional GET for the blueprints
+
+JSON: jsonify(), request.get_json() and the cache all encode with orjson
+when it is installed, which also writes datetimes itself, in the same ISO
+format as isoformat(). Without orjson the standard json module is used.
+
+Compression: JSON bodies of at least COMPRESS_MIN_SIZE bytes are sent with
+brotli (if the brotli package is installed) or gzip, whichever the client
+prefers in Accept-Encoding. Streams (the SSE endpoint) are left alone.
+
+Conditional GET: a read endpoint derives its validators from the versions
+of the cache namespaces its payload comes from (services/cache.py), before
+running any query:
+
+    found = validators(f'auction:{auction_id}', parts=(viewer_id, limit))
+    response = not_modified(found)
+    if response:
+        return response
+    ...
+    return conditional(make_response(jsonify(payload)), found)
+
+The ETag changes whenever one of the namespaces is invalidated, so a poll
+with a current If-None-Match gets 304. Last-Modified is the namespace's last
+change, truncated to the second, and only sent once that second is over so
+that two changes within one second cannot share it. With caching disabled
+no validators are sent and every request gets the full body.
+"""
+import gzip
+import hashlib
+import json
+import time
+from collections import namedtuple
+from datetime import date, datetime, timezone
+
+from flask import make_response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+Validators = namedtuple('Validators', ['etag', 'last_modified'])
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """
+    Returns:
+        Compact JSON as bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(',', ':'), default=_default).encode()
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by dumps() and loads() above
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b'\n', mimetype=self.mimetype)
+
+
+class ResponseEncoder:
+    """
+    Installs the JSON provider and compresses large JSON responses
+    """
+
+    def __init__(self, app=None):
+        self.min_size = 1024
+        self.level = 6
+        self.brotli_quality = 4
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+        app.extensions['response_encoder'] = self
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.level = app.config['COMPRESS_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+
+        app.json = FastJSONProvider(app)
+        app.after_request(self.compress)
+
+    def compress(self, response):
+        if (
+            response.status_code != 200
+            or response.mimetype != 'application/json'
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+        ):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+        if encoding == 'br':
+            response.set_data(brotli.compress(body, quality=self.brotli_quality))
+        elif encoding == 'gzip':
+            response.set_data(gzip.compress(body, compresslevel=self.level, mtime=0))
+        else:
+            return response
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def validators(*namespaces, parts=()):
+    """
+    Validators for a payload built from the given cache namespaces
+    Args:
+        parts: everything else the payload depends on, e.g. the viewer and
+            query parameters
+    Returns:
+        Validators(etag, last_modified), or None if they cannot be derived
+    """
+    from extensions import cache
+
+    changes = cache.changes(*namespaces)
+    if changes is None:
+        return None
+    etag = hashlib.sha1(repr((namespaces, changes, parts)).encode()).hexdigest()[:20]
+    changed_at = max(changed_at for _, changed_at in changes)
+    last_modified = None
+    if changed_at <= time.time() - 1:
+        last_modified = datetime.fromtimestamp(int(changed_at), timezone.utc)
+    return Validators(etag, last_modified)
+
+
+def not_modified(found):
+    """
+    Returns:
+        A 304 response if the request's validators still match, else None
+    """
+    if found is None:
+        return None
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(found.etag)
+    elif request.if_modified_since and found.last_modified:
+        matched = found.last_modified <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return conditional(make_response('', 304), found)
+
+
+def conditional(response, found):
+    """
+    Attach the validators to a response, clients must revalidate before reuse
+    """
+    if found is None:
+        return response
+    # WEAK: THE SAME ETAG IS SENT FOR THE GZIP, BROTLI AND PLAIN BODIES
+    response.set_etag(found.etag, weak=True)
+    if found.last_modified:
+        response.last_modified = found.last_modified
+    response.cache_control.no_cache = True
+    if 'Authorization' in request.headers:
+        response.cache_control.private = True
+        response.vary.add('Authorization')
+    return response
@@ -0,0 +1,164 @@
+"""
+Expiry Scheduler - Flips auctions to 'expired' when their deadline passes
+
+A background thread keeps a min-heap of upcoming `expires_at` values and
+sleeps until the earliest one. When it wakes, every due auction is expired
+with a single batched UPDATE, so request handlers never write status, and
+the expired auctions are then settled in bulk (see services/settlement.py).
+"""
+import heapq
+import logging
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import update
+
+
+class ExpiryScheduler:
+    """
+    Time-ordered expiry queue backed by a daemon thread
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EXPIRY_SCHEDULER_MAX_SLEEP', 30)
+        app.config.setdefault('SETTLE_EXPIRED_AUCTIONS', True)
+        app.config.setdefault('SETTLEMENT_BATCH_SIZE', 500)
+        app.extensions['expiry_scheduler'] = self
+        self.app = app
+
+    def schedule(self, auction_id, expires_at):
+        """
+        Add an auction deadline, waking the thread if it is the new earliest one
+        """
+        if self._thread is None:
+            # NOT RUNNING, start() LOADS PENDING DEADLINES FROM THE DATABASE
+            return
+        self._push(auction_id, expires_at)
+
+    def _push(self, auction_id, expires_at):
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        with self._cond:
+            heapq.heappush(self._heap, (expires_at, auction_id))
+            if self._heap[0][1] == auction_id:
+                self._cond.notify()
+
+    def load(self):
+        """
+        Queue the deadline of every active auction
+        """
+        from models import Auction
+
+        rows = Auction.query.with_entities(Auction.id, Auction.expires_at).filter(
+            Auction.status == 'active'
+        ).all()
+        # CALLED BY start() BEFORE THE THREAD EXISTS, SO schedule() WOULD DROP THEM
+        for auction_id, expires_at in rows:
+            self._push(auction_id, expires_at)
+        return len(rows)
+
+    def expire_due(self, current_time=None):
+        """
+        Expire every active auction past its deadline in one UPDATE
+        Returns:
+            Number of auctions expired
+        """
+        from extensions import db, cache
+        from models import Auction
+
+        current_time = current_time or datetime.now(timezone.utc)
+        try:
+            expired_ids = db.session.execute(
+                update(Auction)
+                .where(Auction.status == 'active', Auction.expires_at <= current_time)
+                .values(status='expired')
+                .returning(Auction.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error expiring auctions: {str(e)}")
+            return 0
+
+        if expired_ids:
+            # THE STATUS IS PART OF THE LISTING AND OF EACH AUCTION'S ETAG
+            cache.invalidate('auctions', *[f'auction:{auction_id}' for auction_id in expired_ids])
+            logging.info(f"Expired {len(expired_ids)} auction(s)")
+        return len(expired_ids)
+
+    def settle_due(self, current_time=None):
+        """
+        Settle every expired auction that is not settled yet
+        Returns:
+            Number of auctions settled
+        """
+        if not self.app.config['SETTLE_EXPIRED_AUCTIONS']:
+            return 0
+        from services.settlement import settle_expired_auctions
+
+        try:
+            return settle_expired_auctions(self.app.config['SETTLEMENT_BATCH_SIZE'], current_time)
+        except Exception as e:
+            logging.error(f"Error settling auctions: {str(e)}")
+            return 0
+
+    def start(self):
+        """
+        Load pending deadlines and start the background thread
+        """
+        if self._thread is not None:
+            return
+        with self.app.app_context():
+            self.expire_due()
+            self.settle_due()
+            self.load()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='expiry-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _next_due(self):
+        """
+        Block until the earliest deadline passes
+        Returns:
+            False once the scheduler is stopping
+        """
+        max_sleep = self.app.config['EXPIRY_SCHEDULER_MAX_SLEEP']
+        with self._cond:
+            while not self._stopping:
+                current_time = datetime.now(timezone.utc)
+                if self._heap and self._heap[0][0] <= current_time:
+                    # DROP EVERY DEADLINE COVERED BY THIS WAKE-UP
+                    while self._heap and self._heap[0][0] <= current_time:
+                        heapq.heappop(self._heap)
+                    return True
+                timeout = max_sleep
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0][0] - current_time).total_seconds())
+                # PERIODIC SWEEP ALSO CATCHES AUCTIONS CREATED BY OTHER WORKERS
+                if not self._cond.wait(timeout) and timeout == max_sleep:
+                    return True
+            return False
+
+    def _run(self):
+        while self._next_due():
+            with self.app.app_context():
+                self.expire_due()
+                self.settle_due()
@@ -0,0 +1,316 @@
+"""
+Production Server - Preforked, threaded WSGI serving with a warm start
+
+serve.py runs create_app() with PreforkServer:
+
+- the master process creates the app, warms it with warm_up() and binds the
+  listening socket once, then forks SERVER_WORKERS workers. They inherit the
+  warmed state copy-on-write, so a worker is ready as soon as it is forked.
+- each worker serves requests on a pool of SERVER_THREADS threads and runs
+  its own expiry scheduler, bid queue and ledger worker. All of them are
+  safe to run in every process.
+- an event stream would hold its pool thread for as long as the client
+  listens. The stream view claims a slot with the callable the server puts
+  in the WSGI environ under STREAM_ENVIRON_KEY. Its thread then leaves the
+  pool and a new pool thread replaces it. Up to SERVER_MAX_STREAMS streams
+  per worker are served this way, and the view answers 503 beyond that.
+- SIGTERM or SIGINT stops accepting connections. In-flight requests get up
+  to SERVER_GRACEFUL_TIMEOUT seconds to finish, so accepted bids commit and
+  get their response. Event streams are ended, since their clients
+  reconnect. The background jobs are then stopped. A worker that dies is
+  replaced.
+- without os.fork (Windows) the same server runs in a single process
+
+Request parsing is Werkzeug's. Put a reverse proxy in front for TLS, slow
+clients and the static frontend.
+"""
+import logging
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+
+from sqlalchemy import select
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from services.events import STREAM_ENVIRON_KEY
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(app):
+    """
+    Load what the first requests would otherwise load: mapper
+    configuration, the uniqueness indexes of unsettled auctions and the
+    first pages of the auction list, which also compiles their queries
+    Returns:
+        Dict with the number of auctions and bids loaded
+    """
+    from sqlalchemy.orm import configure_mappers
+
+    from extensions import db, uniqueness
+    from models import Auction
+
+    configure_mappers()
+    with app.app_context():
+        # UNSETTLED AUCTIONS STILL TAKE BIDS, OR QUEUED ONES, AND ARE POLLED THE MOST
+        auction_ids = db.session.execute(select(Auction.id).where(Auction.settled_at.is_(None))).scalars().all()
+        uniqueness.rebuild(auction_ids)
+        bids = sum(uniqueness.get(auction_id).bid_count for auction_id in auction_ids)
+
+        for query_string in ('', 'status=active'):
+            with app.test_request_context('/api/auctions/', query_string=query_string):
+                app.view_functions['auctions.get_auctions']()
+        db.session.remove()
+        # WORKERS MUST NOT SHARE THE MASTER'S CONNECTIONS
+        db.engine.dispose()
+    return {"auctions": len(auction_ids), "bids": bids}
+
+
+class RequestHandler(WSGIRequestHandler):
+    # AN IDLE KEEP-ALIVE CONNECTION GIVES ITS THREAD BACK AFTER THIS MANY SECONDS
+    timeout = 5
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ[STREAM_ENVIRON_KEY] = self.server.begin_stream
+        return environ
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    Werkzeug server that handles connections on a fixed pool of threads and
+    counts the open ones, so a worker can wait for them before exiting.
+    Event streams move off the pool onto threads of their own.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, started_at, fd=None, max_streams=256):
+        super().__init__(host, port, app, handler=RequestHandler, fd=fd)
+        self.threads = threads
+        self.max_streams = max_streams
+        self.started_at = started_at
+        self.connections = 0
+        self.streams = 0
+        self._served_first = False
+        self._cond = threading.Condition()
+        self._pending = queue.SimpleQueue()
+        self._local = threading.local()
+        for _ in range(threads):
+            self._start_thread()
+
+    def _start_thread(self):
+        threading.Thread(target=self._work, name='request', daemon=True).start()
+
+    def process_request(self, request, client_address):
+        # QUEUED CONNECTIONS COUNT TOO, THEY ARE SERVED BEFORE THE WORKER EXITS
+        with self._cond:
+            self.connections += 1
+        self._pending.put((request, client_address))
+
+    def _work(self):
+        self._local.streaming = False
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            self._handle(*item)
+            if self._local.streaming:
+                # A REPLACEMENT JOINED THE POOL WHEN THE STREAM BEGAN
+                with self._cond:
+                    self.streams -= 1
+                return
+
+    def begin_stream(self):
+        """
+        Take the current thread out of the pool for a long-lived response
+        Returns:
+            False if this worker already serves max_streams streams
+        """
+        if self._local.streaming:
+            return True
+        with self._cond:
+            if self.streams >= self.max_streams:
+                return False
+            self.streams += 1
+        self._local.streaming = True
+        self._start_thread()
+        return True
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._cond:
+                self.connections -= 1
+                first = not self._served_first
+                self._served_first = True
+                if not self.connections:
+                    self._cond.notify_all()
+            if first:
+                logger.info("Worker %d served its first connection %.3fs after start",
+                            os.getpid(), time.monotonic() - self.started_at)
+
+    def wait_idle(self, timeout):
+        """
+        Returns:
+            True once no connection is open, False if timeout passed first
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.connections, timeout)
+
+    def close_pool(self):
+        """
+        Let the pool threads exit once the connections queued before are served
+        """
+        for _ in range(self.threads):
+            self._pending.put(None)
+
+
+class PreforkServer:
+    """
+    Master process that forks and supervises the workers
+    """
+
+    def __init__(self, app, host, port, workers, threads, graceful_timeout, started_at, max_streams=256):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.max_streams = max_streams
+        self.graceful_timeout = graceful_timeout
+        self.started_at = started_at
+        self.listener = None
+        self._children = {}
+        self._stop = threading.Event()
+
+    def bind(self):
+        self.listener = socket.create_server((self.host, self.port), backlog=1024)
+        self.listener.set_inheritable(True)
+        # EVERY WORKER WAKES FOR A NEW CONNECTION, THE ONES THAT LOSE THE accept() RACE
+        # MUST NOT BLOCK IN IT, OR THEY WOULD NOT NOTICE A SHUTDOWN UNTIL THE NEXT ONE
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+        return self.port
+
+    def run(self):
+        """
+        Serve until SIGTERM or SIGINT, then shut down gracefully
+        """
+        if self.listener is None:
+            self.bind()
+        if self.workers <= 1 or not hasattr(os, 'fork'):
+            self._log_ready(1)
+            self._serve()
+            return
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        for slot in range(self.workers):
+            self._spawn(slot)
+        self._log_ready(self.workers)
+
+        while not self._stop.wait(0.5):
+            self._reap(respawn=True)
+
+        logger.info("Stopping %d workers, waiting up to %ss for in-flight requests",
+                    len(self._children), self.graceful_timeout)
+        for pid in list(self._children):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._children and time.monotonic() < deadline:
+            self._reap(respawn=False)
+            time.sleep(0.1)
+        for pid in list(self._children):
+            logger.warning("Worker %d did not stop in time, killing it", pid)
+            self._signal(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.listener.close()
+
+    def _log_ready(self, workers):
+        logger.info("Listening on http://%s:%d with %d worker(s) x %d thread(s), ready %.3fs after start",
+                    self.host, self.port, workers, self.threads, time.monotonic() - self.started_at)
+
+    def _request_stop(self, signum, frame):
+        self._stop.set()
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                self._serve()
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+                code = 1
+            finally:
+                # NEVER RETURN INTO THE MASTER'S CODE, NOR RUN ITS EXIT HANDLERS
+                os._exit(code)
+        self._children[pid] = (slot, time.monotonic())
+
+    def _reap(self, respawn):
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot, spawned_at = self._children.pop(pid)
+            if not respawn:
+                continue
+            logger.warning("Worker %d exited with status %d, starting a new one", pid, status)
+            # A WORKER THAT CRASHES ON START SHOULD NOT BE RESTARTED IN A TIGHT LOOP
+            if time.monotonic() - spawned_at < 1:
+                time.sleep(1)
+            self._spawn(slot)
+
+    def _serve(self):
+        """
+        Worker loop: serve on the shared socket until told to stop, then
+        drain in-flight requests and stop the background jobs
+        """
+        from extensions import db, event_hub, expiry_scheduler, bid_queue, ledger_worker, metrics
+
+        server = PooledWSGIServer(self.host, self.port, self.app, self.threads, self.started_at,
+                                  fd=self.listener.fileno(), max_streams=self.max_streams)
+        server.socket.setblocking(False)
+
+        def shutdown(signum, frame):
+            # shutdown() WAITS FOR serve_forever, WHICH RUNS ON THIS VERY THREAD
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        metrics.start()
+        expiry_scheduler.start()
+        bid_queue.start()
+        ledger_worker.start()
+        server.serve_forever()
+
+        event_hub.close()
+        if not server.wait_idle(self.graceful_timeout):
+            logger.warning("Worker %d exiting with %d connection(s) still open", os.getpid(), server.connections)
+        server.close_pool()
+        bid_queue.stop()
+        expiry_scheduler.stop()
+        ledger_worker.stop()
+        metrics.stop()
+        with self.app.app_context():
+            db.engine.dispose()
@@ -0,0 +1,181 @@
+"""
+Auction Settlement - Bulk winner selection and pool prize payout
+
+Settles every expired auction that has not been settled yet, in batches.
+For a whole batch at once, the lowest unique bid is computed with set-based
+SQL (GROUP BY plus a ROW_NUMBER window), the top bidders by bid count are
+read from the leaderboard kept by place_bid (services/leaderboard.py),
+pool winner rows are inserted in one statement and wallets are credited with
+one executemany UPDATE, with one prize_payout ledger entry per winner.
+
+An auction is claimed by stamping `settled_at` with a conditional UPDATE in
+the same transaction as the payout, so running the job twice, from several
+workers, or alongside GET /api/winners/<id> never pays a prize twice. An
+auction with queued bids still pending is left for a later run.
+"""
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import exists, func, insert, select, update
+
+from extensions import db, cache
+from models import Auction, Bid, BidTicket, PoolPrizeWinner
+from services import leaderboard, ledger
+from services.ledger import credit_wallets
+
+# POOL PRIZE SHARE BY RANK, RANKED BY NUMBER OF BIDS
+POOL_PRIZE_PERCENTAGES = {1: 60, 2: 30, 3: 10}
+
+# BIDS ACCEPTED BEFORE THE DEADLINE BUT STILL QUEUED, SEE services/bid_queue.py
+has_pending_tickets = exists().where(BidTicket.auction_id == Auction.id, BidTicket.status == 'pending')
+
+
+def lowest_unique_bids(auction_ids):
+    """
+    Returns:
+        Dict of auction_id -> (bid_id, user_id) of the lowest unique bid
+    """
+    unique_amounts = select(
+        Bid.auction_id,
+        Bid.amount,
+        func.min(Bid.id).label('bid_id'),
+        func.min(Bid.user_id).label('user_id')
+    ).where(
+        Bid.auction_id.in_(auction_ids)
+    ).group_by(
+        Bid.auction_id, Bid.amount
+    ).having(
+        func.count(Bid.id) == 1
+    ).subquery()
+
+    ranked = select(
+        unique_amounts,
+        func.row_number().over(
+            partition_by=unique_amounts.c.auction_id,
+            order_by=unique_amounts.c.amount
+        ).label('position')
+    ).subquery()
+
+    rows = db.session.execute(
+        select(ranked.c.auction_id, ranked.c.bid_id, ranked.c.user_id).where(ranked.c.position == 1)
+    )
+    return {auction_id: (bid_id, user_id) for auction_id, bid_id, user_id in rows}
+
+
+def split_pool_prize(pool_prize, ranked_user_ids):
+    """
+    Split a pool prize in cents between ranked bidders
+    Cents lost to rounding go to the first place.
+    Returns:
+        List of (rank, user_id, percentage, amount)
+    """
+    shares = [
+        (rank, user_id, POOL_PRIZE_PERCENTAGES[rank], pool_prize * POOL_PRIZE_PERCENTAGES[rank] // 100)
+        for rank, user_id in enumerate(ranked_user_ids, 1)
+        if rank in POOL_PRIZE_PERCENTAGES
+    ]
+    if not shares:
+        return shares
+    paid_percentage = sum(percentage for _, _, percentage, _ in shares)
+    rounding_remainder = pool_prize * paid_percentage // 100 - sum(amount for _, _, _, amount in shares)
+    rank, user_id, percentage, amount = shares[0]
+    shares[0] = (rank, user_id, percentage, amount + rounding_remainder)
+    return shares
+
+
+def settle_auctions(auction_ids, current_time=None):
+    """
+    Settle the given auctions if they have expired and are not settled yet,
+    in one transaction
+    Returns:
+        Number of auctions settled by this call
+    """
+    current_time = current_time or datetime.now(timezone.utc)
+    try:
+        # CLAIM: ONLY ONE CALLER CAN STAMP settled_at, OTHERS SEE NO ROWS
+        claimed = db.session.execute(
+            update(Auction)
+            .where(
+                Auction.id.in_(auction_ids),
+                Auction.settled_at.is_(None),
+                Auction.expires_at <= current_time,
+                ~has_pending_tickets
+            )
+            .values(settled_at=current_time, status='expired')
+            .returning(Auction.id, Auction.pool_prize, Auction.pool_distributed)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not claimed:
+            db.session.rollback()
+            return 0
+
+        claimed_ids = [auction_id for auction_id, _, _ in claimed]
+        winners = lowest_unique_bids(claimed_ids)
+
+        # PRIZES ALREADY PAID BY AN EARLIER VERSION OF GET /api/winners ARE NOT PAID AGAIN
+        payable = {
+            auction_id: pool_prize for auction_id, pool_prize, pool_distributed in claimed
+            if pool_prize and pool_prize > 0 and not pool_distributed
+        }
+        ranked = leaderboard.ranked_bidders(list(payable), len(POOL_PRIZE_PERCENTAGES)) if payable else {}
+
+        pool_winner_rows = []
+        credits = {}
+        for auction_id, pool_prize in payable.items():
+            user_ids = [user_id for _, user_id, _ in ranked.get(auction_id, [])]
+            for rank, user_id, percentage, amount in split_pool_prize(pool_prize, user_ids):
+                pool_winner_rows.append({
+                    "auction_id": auction_id,
+                    "user_id": user_id,
+                    "rank": rank,
+                    "percentage": percentage,
+                    "amount": amount,
+                    "created_at": current_time
+                })
+                credits[user_id] = credits.get(user_id, 0) + amount
+
+        if pool_winner_rows:
+            db.session.execute(insert(PoolPrizeWinner), pool_winner_rows)
+        credit_wallets(credits)
+        ledger.record_many([{
+            "kind": 'prize_payout', "amount": row["amount"], "user_id": row["user_id"], "auction_id": row["auction_id"]
+        } for row in pool_winner_rows])
+
+        db.session.execute(update(Auction), [{
+            "id": auction_id,
+            "winner_id": winners[auction_id][1] if auction_id in winners else None,
+            "pool_distributed": pool_distributed or auction_id in ranked,
+        } for auction_id, _, pool_distributed in claimed])
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    cache.invalidate('auctions', *[f'auction:{auction_id}' for auction_id in claimed_ids])
+    logging.info(f"Settled {len(claimed)} auction(s), {len(pool_winner_rows)} pool prize payout(s)")
+    return len(claimed)
+
+
+def settle_expired_auctions(batch_size=500, current_time=None):
+    """
+    Settle every expired, unsettled auction, oldest deadline first
+    Returns:
+        Number of auctions settled
+    """
+    current_time = current_time or datetime.now(timezone.utc)
+    settled = 0
+    while True:
+        auction_ids = db.session.execute(
+            select(Auction.id)
+            .where(Auction.settled_at.is_(None), Auction.expires_at <= current_time, ~has_pending_tickets)
+            .order_by(Auction.expires_at, Auction.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not auction_ids:
+            return settled
+        batch_settled = settle_auctions(auction_ids, current_time)
+        if not batch_settled:
+            # ANOTHER WORKER CLAIMED THIS BATCH FIRST, ITS COMMIT REMOVES IT FROM THE NEXT SELECT
+            db.session.rollback()
+        settled += batch_settled
@@ -0,0 +1,212 @@
+"""
+Auction Simulation - Monte Carlo runs of the game rules, for tuning auctions
+
+Generates random auctions in batches as NumPy arrays (one row per auction,
+one column per bid in arrival order) and plays them with the same rules as
+the live code:
+
+- the pool threshold: a bid that brings the running total to item_value
+  reaches it and goes fully to the creator, every later bid puts half of
+  its amount into the pool (services/bidding.py apply_bids)
+- the winner is the lowest amount bid exactly once, counted with one
+  bincount over (auction, amount step) (services/uniqueness.py)
+- the pool goes to the top bidders by bid count, ties broken by the
+  earliest first bid (services/leaderboard.py RANK_ORDER), split by
+  percentage with rounding cents to first place (split_pool_prize)
+
+tests/simulation_rules.py replays simulated auctions through the API and
+checks that both give the same results.
+
+Batches run on a process pool, each with its own random stream spawned
+from one seed, so a run is reproducible for a given seed and batch size
+whatever the number of workers. NumPy is only needed here:
+
+    pip3 install numpy
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from money import BID_STEP_CENTS
+from services.settlement import POOL_PRIZE_PERCENTAGES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ALL AMOUNTS IN CENTS, BIDS ARE WHOLE STEPS OF BID_STEP_CENTS
+Scenario = namedtuple('Scenario', [
+    'item_value',       # POOL THRESHOLD
+    'min_bid',
+    'max_bid',
+    'mean_bid',         # BIDS ABOVE min_bid ARE GEOMETRIC WITH THIS MEAN
+    'mean_bids',        # BIDS PER AUCTION ARE POISSON WITH THIS MEAN
+    'bidders',          # BIDDERS PER AUCTION, EACH BID COMES FROM ONE AT RANDOM
+    'percentages',      # POOL SPLIT BY RANK, e.g. (60, 30, 10)
+])
+
+DEFAULT_SCENARIO = Scenario(
+    item_value=50000,
+    min_bid=BID_STEP_CENTS,
+    max_bid=10000,
+    mean_bid=500,
+    mean_bids=200,
+    bidders=50,
+    percentages=tuple(POOL_PRIZE_PERCENTAGES[rank] for rank in sorted(POOL_PRIZE_PERCENTAGES)),
+)
+
+# PER AUCTION RESULT COLUMNS RETURNED BY play()
+OUTCOME_FIELDS = ['bid_count', 'total', 'creator_revenue', 'pool', 'threshold_reached', 'winning_bid', 'winner', 'payouts']
+
+# THE PART OF THE OUTCOME SENT BACK FROM WORKERS AND SUMMARIZED
+SUMMARY_FIELDS = ['creator_revenue', 'pool', 'threshold_reached', 'winning_bid', 'payouts']
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("The simulator needs NumPy: pip3 install numpy")
+
+
+def generate(rng, scenario, auctions):
+    """
+    Random bids for a batch of auctions
+    Returns:
+        (steps, bidders, valid): int arrays of shape (auctions, longest
+        auction) with the amount in bid steps and the bidder of each bid,
+        and a bool mask of the columns that are real bids
+    """
+    _require_numpy()
+    min_step = scenario.min_bid // BID_STEP_CENTS
+    max_step = scenario.max_bid // BID_STEP_CENTS
+    counts = rng.poisson(scenario.mean_bids, auctions)
+    width = max(int(counts.max()), 1)
+    valid = np.arange(width) < counts[:, None]
+
+    # GEOMETRIC ABOVE THE MINIMUM, SO LOW AMOUNTS ARE CROWDED AS IN PRACTICE
+    extra_mean = max((scenario.mean_bid - scenario.min_bid) / BID_STEP_CENTS, 0)
+    extra = rng.geometric(1 / (extra_mean + 1), (auctions, width)) - 1
+    steps = np.minimum(min_step + extra, max_step)
+    bidders = rng.integers(0, scenario.bidders, (auctions, width))
+    return steps, bidders, valid
+
+
+def play(scenario, steps, bidders, valid):
+    """
+    Apply the game rules to a batch of generated auctions
+    Returns:
+        Dict of OUTCOME_FIELDS arrays, one entry per auction, in cents.
+        winning_bid and winner are -1 without a unique bid, payouts has one
+        column per rank and winner indexes the batch's bidders.
+    """
+    _require_numpy()
+    auctions, width = steps.shape
+    amounts = np.where(valid, steps * BID_STEP_CENTS, 0)
+
+    # THRESHOLD: THE FIRST BID WHOSE RUNNING TOTAL REACHES item_value, LATER BIDS SPLIT
+    running = np.cumsum(amounts, axis=1)
+    reached = running >= scenario.item_value
+    threshold_at = np.where(reached.any(axis=1), reached.argmax(axis=1), width)
+    after_threshold = np.arange(width) > threshold_at[:, None]
+    pool = np.where(after_threshold, amounts // 2, 0).sum(axis=1)
+    total = running[:, -1]
+    threshold_reached = threshold_at < width
+
+    # UNIQUENESS: COUNT EVERY (AUCTION, STEP) PAIR, PADDING GOES TO AN EXTRA COLUMN
+    columns = int(steps.max()) + 2
+    padded_steps = np.where(valid, steps, columns - 1)
+    rows = np.arange(auctions)[:, None]
+    counts = np.bincount((rows * columns + padded_steps).ravel(), minlength=auctions * columns)
+    counts = counts.reshape(auctions, columns)[:, :-1]
+    unique = counts == 1
+    has_winner = unique.any(axis=1)
+    lowest_step = unique.argmax(axis=1)
+    winning_column = (padded_steps == lowest_step[:, None]).argmax(axis=1)
+    winning_bid = np.where(has_winner, lowest_step * BID_STEP_CENTS, -1)
+    winner = np.where(has_winner, bidders[np.arange(auctions), winning_column], -1)
+
+    # LEADERBOARD: BID COUNT DESCENDING, THEN EARLIEST FIRST BID
+    bidder_count = max(int(bidders.max()) + 1, len(scenario.percentages))
+    flat = (rows * bidder_count + bidders)[valid]
+    bid_counts = np.bincount(flat, minlength=auctions * bidder_count).reshape(auctions, bidder_count)
+    first_bid = np.full(auctions * bidder_count, width)
+    np.minimum.at(first_bid, flat, np.broadcast_to(np.arange(width), (auctions, width))[valid])
+    first_bid = first_bid.reshape(auctions, bidder_count)
+    rank_key = bid_counts * (width + 1) + (width - first_bid)
+    podium = np.argsort(-rank_key, axis=1, kind='stable')[:, :len(scenario.percentages)]
+    placed = np.take_along_axis(bid_counts, podium, axis=1) > 0
+
+    # SPLIT: PERCENTAGE SHARES ROUNDED DOWN, THE ROUNDING CENTS TO FIRST PLACE
+    percentages = np.array(scenario.percentages)
+    shares = np.where(placed, pool[:, None] * percentages // 100, 0)
+    paid_percentage = np.where(placed, percentages, 0).sum(axis=1)
+    shares[:, 0] += np.where(placed[:, 0], pool * paid_percentage // 100 - shares.sum(axis=1), 0)
+
+    return {
+        "bid_count": valid.sum(axis=1),
+        "total": total,
+        "creator_revenue": total - pool,
+        "pool": pool,
+        "threshold_reached": threshold_reached,
+        "winning_bid": winning_bid,
+        "winner": winner,
+        "payouts": shares,
+    }
+
+
+def _run_batch(args):
+    scenario, seed_sequence, auctions = args
+    rng = np.random.default_rng(seed_sequence)
+    outcome = play(scenario, *generate(rng, scenario, auctions))
+    return {field: outcome[field] for field in SUMMARY_FIELDS}
+
+
+def simulate(scenario, auctions, seed=42, batch_size=2000, workers=None):
+    """
+    Play `auctions` random auctions on a process pool
+    Returns:
+        Dict of per auction arrays, the SUMMARY_FIELDS of play()'s outcome
+    """
+    _require_numpy()
+    sizes = [batch_size] * (auctions // batch_size)
+    if auctions % batch_size:
+        sizes.append(auctions % batch_size)
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(scenario, stream, size) for stream, size in zip(streams, sizes)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_run_batch(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_batch, jobs))
+    return {field: np.concatenate([result[field] for result in results]) for field in results[0]}
+
+
+def summarize(scenario, results):
+    """
+    Returns:
+        Dict of distribution summaries in currency units, JSON serializable
+    """
+    def distribution(values):
+        if values.size == 0:
+            return None
+        p5, p50, p95 = np.percentile(values, [5, 50, 95]) / 100
+        return {"mean": round(float(values.mean()) / 100, 2), "p5": round(float(p5), 2),
+                "p50": round(float(p50), 2), "p95": round(float(p95), 2)}
+
+    won = results['winning_bid'] >= 0
+    paid = results['payouts'].sum(axis=1)
+    return {
+        "auctions": int(results['pool'].size),
+        "creator_revenue": distribution(results['creator_revenue']),
+        "creator_margin": distribution(results['creator_revenue'] - scenario.item_value),
+        "pool": distribution(results['pool']),
+        "winning_bid": distribution(results['winning_bid'][won]),
+        "threshold_reached": round(float(results['threshold_reached'].mean()), 4),
+        "no_unique_bid": round(float(1 - won.mean()), 4),
+        "pool_unpaid": round(float((results['pool'] - paid).sum() / max(int(results['pool'].sum()), 1)), 4),
+        "payout_by_rank": {
+            rank: distribution(results['payouts'][:, rank - 1]) for rank in range(1, results['payouts'].shape[1] + 1)
+        },
+    }
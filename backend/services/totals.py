@@ -0,0 +1,64 @@
+"""
+Auction Totals - Reconciliation of the denormalized bid counters on Auction
+
+place_bid maintains `total_bid_amount`, `bid_count` and `threshold_reached_at`
+in the same transaction as the bid insert. This module recomputes them from
+the bid table, for repairing drift or backfilling an existing database.
+"""
+from sqlalchemy import exists, func
+
+from extensions import db
+from models import Auction, AuctionArchive, Bid
+
+
+def reconcile_auction_totals(auction_ids=None):
+    """
+    Recompute bid counters for the given auctions, or all auctions
+    Returns:
+        Number of auctions whose counters were corrected
+    """
+    totals_query = db.session.query(
+        Bid.auction_id,
+        func.count(Bid.id),
+        func.sum(Bid.amount)
+    ).group_by(Bid.auction_id)
+
+    # THE THRESHOLD IS REACHED BY THE FIRST BID WHOSE RUNNING TOTAL MEETS item_value
+    running = db.session.query(
+        Bid.auction_id,
+        Bid.created_at,
+        func.sum(Bid.amount).over(partition_by=Bid.auction_id, order_by=Bid.id).label('running_total')
+    ).subquery()
+    crossings_query = db.session.query(
+        running.c.auction_id,
+        func.min(running.c.created_at)
+    ).join(
+        Auction, Auction.id == running.c.auction_id
+    ).filter(
+        Auction.item_value > 0,
+        running.c.running_total >= Auction.item_value
+    ).group_by(running.c.auction_id)
+
+    # ARCHIVED AUCTIONS HAVE NO BID ROWS LEFT TO COUNT
+    auctions_query = Auction.query.filter(~exists().where(AuctionArchive.auction_id == Auction.id))
+    if auction_ids is not None:
+        totals_query = totals_query.filter(Bid.auction_id.in_(auction_ids))
+        crossings_query = crossings_query.filter(running.c.auction_id.in_(auction_ids))
+        auctions_query = auctions_query.filter(Auction.id.in_(auction_ids))
+
+    totals = {auction_id: (count, total) for auction_id, count, total in totals_query}
+    crossings = dict(crossings_query.all())
+
+    corrected = 0
+    for auction in auctions_query:
+        bid_count, total_bid_amount = totals.get(auction.id, (0, 0))
+        threshold_reached_at = crossings.get(auction.id)
+        if (auction.bid_count, auction.total_bid_amount, auction.threshold_reached_at is None) != \
+                (bid_count, total_bid_amount, threshold_reached_at is None):
+            auction.bid_count = bid_count
+            auction.total_bid_amount = total_bid_amount
+            auction.threshold_reached_at = threshold_reached_at
+            corrected += 1
+
+    db.session.commit()
+    return corrected
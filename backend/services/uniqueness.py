@@ -0,0 +1,260 @@
+"""
+Uniqueness Index - Incremental lowest-unique-bid bookkeeping
+
+Keeps, per auction, a count of bids at every amount plus a min-heap of the
+amounts that currently have exactly one bid. Placing a bid is O(log n) and
+"lowest unique bid" / "is this amount unique" never touch the bid table.
+
+The index is rebuilt from the `bid` table with a single GROUP BY query, either
+lazily the first time an auction is used or eagerly via rebuild(). Auctions
+whose bids were archived get theirs from the archive summary instead.
+
+With several worker processes each one has its own indexes. sync() brings an
+index up to the bid count read from the auction row, by applying the bids
+that other processes committed since, so writers and readers call it with
+the count they just read rather than trusting get().
+"""
+import heapq
+import threading
+from collections import namedtuple
+from itertools import groupby
+from operator import itemgetter
+
+from sqlalchemy import func, select
+
+UniqueBid = namedtuple('UniqueBid', ['amount', 'bid_id', 'user_id'])
+
+
+class AuctionUniqueness:
+    """
+    Uniqueness state for a single auction
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.holders = {}
+        self.bid_count = 0
+        self.last_bid_id = 0
+        self._heap = []
+
+    def count(self, amount):
+        return self.counts.get(amount, 0)
+
+    def is_unique(self, amount):
+        return self.counts.get(amount, 0) == 1
+
+    def holder(self, amount):
+        """
+        Returns the only bid at this amount, or None if it is not unique
+        """
+        return self.holders.get(amount)
+
+    def add(self, amount, bid_id, user_id, count=1):
+        """
+        Record bids at an amount
+        Returns:
+            The bid that stopped being unique because of this one, if any
+        """
+        previous = self.counts.get(amount, 0)
+        self.counts[amount] = previous + count
+        self.bid_count += count
+        self.last_bid_id = max(self.last_bid_id, bid_id)
+
+        if previous == 0 and count == 1:
+            self.holders[amount] = UniqueBid(amount, bid_id, user_id)
+            heapq.heappush(self._heap, amount)
+            return None
+
+        return self.holders.pop(amount, None)
+
+    def load(self, groups):
+        """
+        Fill an empty index from the auction's (auction_id, amount, count,
+        first bid id, user id, last bid id) groups, one per amount,
+        heapifying once instead of once per amount
+        """
+        for _, amount, count, bid_id, user_id, last_bid_id in groups:
+            self.counts[amount] = count
+            self.bid_count += count
+            if count == 1:
+                self.holders[amount] = UniqueBid(amount, bid_id, user_id)
+            if last_bid_id > self.last_bid_id:
+                self.last_bid_id = last_bid_id
+        self._heap = list(self.holders)
+        heapq.heapify(self._heap)
+
+    def lowest(self):
+        """
+        Returns the lowest unique bid, or None if there is no unique bid
+        """
+        # AMOUNTS NEVER BECOME UNIQUE AGAIN, SO STALE HEAP ENTRIES CAN BE DROPPED
+        while self._heap and self.counts[self._heap[0]] != 1:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return self.holders[self._heap[0]]
+
+
+class UniquenessRegistry:
+    """
+    Per-auction uniqueness indexes shared by all request threads
+    """
+
+    def __init__(self, app=None):
+        self._indexes = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['uniqueness'] = self
+        with self._guard:
+            self._indexes = {}
+            self._locks = {}
+
+    def lock(self, auction_id):
+        """
+        Lock that serializes bid placement on one auction, so the index and
+        the `is_unique` flags are updated in the same order bids commit
+        """
+        with self._guard:
+            lock = self._locks.get(auction_id)
+            if lock is None:
+                lock = self._locks[auction_id] = threading.RLock()
+            return lock
+
+    def get(self, auction_id):
+        """
+        Returns the index for an auction, loading it from the database if needed
+        """
+        index = self._indexes.get(auction_id)
+        if index is None:
+            with self.lock(auction_id):
+                index = self._indexes.get(auction_id)
+                if index is None:
+                    index = self._indexes[auction_id] = load_index(auction_id)
+        return index
+
+    def lowest(self, auction_id):
+        return self.get(auction_id).lowest()
+
+    def sync(self, auction_id, bid_count):
+        """
+        Returns the index for an auction, first applying bids committed by
+        other processes if it holds fewer than bid_count
+        """
+        index = self.get(auction_id)
+        if index.bid_count >= bid_count:
+            return index
+        with self.lock(auction_id):
+            index = self.get(auction_id)
+            if index.bid_count < bid_count:
+                catch_up(index, auction_id, bid_count)
+        return index
+
+    def record_bid(self, bid):
+        """
+        Apply a committed bid to its auction's index
+        Returns:
+            The bid that stopped being unique because of this one, if any
+        """
+        index = self.get(bid.auction_id)
+        if bid.id <= index.last_bid_id:
+            # ALREADY READ BY sync()
+            return None
+        return index.add(bid.amount, bid.id, bid.user_id)
+
+    def discard(self, auction_id):
+        with self._guard:
+            self._indexes.pop(auction_id, None)
+
+    def rebuild(self, auction_ids=None):
+        """
+        Rebuild indexes from the bid table, for every auction with bids
+        when no ids are given
+        Returns:
+            Number of indexes built
+        """
+        from extensions import db
+        from models import Bid
+
+        if auction_ids is None:
+            auction_ids = [row[0] for row in db.session.query(Bid.auction_id).distinct()]
+            with self._guard:
+                self._indexes = {}
+        indexes = load_indexes(auction_ids)
+        with self._guard:
+            self._indexes.update(indexes)
+        return len(indexes)
+
+
+def load_index(auction_id):
+    """
+    Build an auction's index with one GROUP BY over its bids
+    """
+    from services.archive import archived
+
+    index = load_indexes([auction_id])[auction_id]
+    if not index.bid_count:
+        # ARCHIVED AUCTIONS TAKE NO MORE BIDS, THE WINNING BID AND THE COUNT ARE ENOUGH
+        summary = archived(auction_id)
+        if summary is not None:
+            if summary.winning_bid_id is not None:
+                index.add(summary.winning_amount, summary.winning_bid_id, summary.winning_user_id)
+            index.bid_count = summary.bid_count
+    return index
+
+
+def load_indexes(auction_ids, chunk_size=500):
+    """
+    Build the indexes of many auctions, with one GROUP BY per chunk of ids
+    Returns:
+        Dict of auction_id -> AuctionUniqueness
+    """
+    from extensions import db
+    from models import Bid
+
+    indexes = {auction_id: AuctionUniqueness() for auction_id in auction_ids}
+    auction_ids = list(indexes)
+    connection = db.session.connection()
+    for start in range(0, len(auction_ids), chunk_size):
+        # CORE ROWS ON THE SESSION'S CONNECTION, ORM ROWS WOULD DOUBLE THE COST OF A WARM START
+        rows = connection.execute(select(
+            Bid.auction_id,
+            Bid.amount,
+            func.count(Bid.id),
+            func.min(Bid.id),
+            func.min(Bid.user_id),
+            func.max(Bid.id)
+        ).where(
+            Bid.auction_id.in_(auction_ids[start:start + chunk_size])
+        ).group_by(
+            Bid.auction_id, Bid.amount
+        ).order_by(
+            Bid.auction_id
+        ))
+        for auction_id, groups in groupby(rows, key=itemgetter(0)):
+            indexes[auction_id].load(groups)
+    return indexes
+
+
+def catch_up(index, auction_id, bid_count):
+    """
+    Apply the auction's bids newer than the index's last one
+    A recently synced index reads the bid id range since its last bid, which
+    on a busy auction is mostly its own bids. When that range holds more bids
+    than the whole auction, the auction's bids are read through its index.
+    """
+    from extensions import db
+    from models import Bid
+
+    newest_bid_id = db.session.query(func.max(Bid.id)).scalar() or 0
+    query = db.session.query(Bid.id, Bid.amount, Bid.user_id).filter(Bid.id > index.last_bid_id)
+    if newest_bid_id - index.last_bid_id <= bid_count:
+        # + KEEPS SQLITE ON THE PRIMARY KEY RANGE INSTEAD OF ALL THE AUCTION'S BIDS
+        query = query.filter(Bid.auction_id + 0 == auction_id)
+    else:
+        query = query.filter(Bid.auction_id == auction_id)
+    for bid_id, amount, user_id in query.order_by(Bid.id):
+        index.add(amount, bid_id, user_id)
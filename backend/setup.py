@@ -1,11 +1,14 @@
 from app import create_app
 from extensions import db
 from models import User
+from services import migrations
 
 
 if __name__ == '__main__':
     app = create_app()
     with app.app_context():
         db.create_all()
+        # A FRESH SCHEMA ALREADY MATCHES THE LATEST MIGRATION
+        migrations.stamp(db.engine)
         print("Database created successfully.")
         db.session.commit()
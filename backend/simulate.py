@@ -0,0 +1,82 @@
+"""
+Monte Carlo simulation of auctions for tuning item_value, minimum bid and
+the pool split (see services/simulation.py)
+
+Every combination of the given values is simulated and summarized in one
+table; --output also writes the full summaries as JSON.
+
+Usage:
+    python simulate.py [--auctions 1000000] [--item-value 500 ...] [--min-bid 0.1 ...]
+                       [--split 60,30,10 ...] [--mean-bid 5] [--max-bid 100] [--mean-bids 200]
+                       [--bidders 50] [--workers N] [--batch-size 2000] [--seed 42] [--output results.json]
+"""
+import argparse
+import itertools
+import json
+import time
+
+from money import BID_STEP_CENTS, from_cents, to_cents
+from services.simulation import DEFAULT_SCENARIO, simulate, summarize
+
+
+def parse_args():
+    defaults = DEFAULT_SCENARIO
+    parser = argparse.ArgumentParser(description="Simulate lowest unique bid auctions")
+    parser.add_argument('--auctions', type=int, default=1000000, help="auctions per scenario")
+    parser.add_argument('--item-value', type=float, nargs='+', default=[from_cents(defaults.item_value)])
+    parser.add_argument('--min-bid', type=float, nargs='+', default=[from_cents(defaults.min_bid)])
+    parser.add_argument('--split', nargs='+', default=[','.join(map(str, defaults.percentages))],
+                        help="pool percentages by rank, e.g. 60,30,10")
+    parser.add_argument('--mean-bid', type=float, default=from_cents(defaults.mean_bid))
+    parser.add_argument('--max-bid', type=float, default=from_cents(defaults.max_bid))
+    parser.add_argument('--mean-bids', type=float, default=defaults.mean_bids, help="bids per auction")
+    parser.add_argument('--bidders', type=int, default=defaults.bidders, help="bidders per auction")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument('--batch-size', type=int, default=2000, help="auctions per vectorized batch")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="JSON results path")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    scenarios = []
+    for item_value, min_bid, split in itertools.product(args.item_value, args.min_bid, args.split):
+        percentages = tuple(int(part) for part in split.split(','))
+        if sum(percentages) > 100:
+            raise SystemExit(f"Split {split} pays out more than the pool")
+        scenarios.append(DEFAULT_SCENARIO._replace(
+            item_value=to_cents(item_value),
+            min_bid=to_cents(min_bid, step=BID_STEP_CENTS),
+            max_bid=to_cents(args.max_bid, step=BID_STEP_CENTS),
+            mean_bid=to_cents(args.mean_bid),
+            mean_bids=args.mean_bids,
+            bidders=args.bidders,
+            percentages=percentages,
+        ))
+
+    print(f"{'item value':>10} {'min bid':>8} {'split':>10} {'revenue':>9} {'margin':>9} {'pool':>8} "
+          f"{'prizes':>20} {'win bid':>8} {'threshold':>9} {'no winner':>9} {'seconds':>8}")
+    summaries = []
+    for scenario in scenarios:
+        started = time.perf_counter()
+        results = simulate(scenario, args.auctions, args.seed, args.batch_size, args.workers)
+        summary = dict(summarize(scenario, results), scenario=scenario._asdict())
+        summaries.append(summary)
+        winning_bid = summary['winning_bid']['p50'] if summary['winning_bid'] else float('nan')
+        prizes = '/'.join(f"{payout['mean']:.2f}" for payout in summary['payout_by_rank'].values())
+        print(f"{from_cents(scenario.item_value):10.2f} {from_cents(scenario.min_bid):8.2f} "
+              f"{','.join(map(str, scenario.percentages)):>10} {summary['creator_revenue']['mean']:9.2f} "
+              f"{summary['creator_margin']['mean']:9.2f} {summary['pool']['mean']:8.2f} {prizes:>20} {winning_bid:8.2f} "
+              f"{summary['threshold_reached']:9.1%} {summary['no_unique_bid']:9.1%} {time.perf_counter() - started:8.1f}")
+    print("revenue, margin (revenue minus item value), pool and prizes by rank are means per auction, "
+          "win bid is the median")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"auctions": args.auctions, "seed": args.seed, "scenarios": summaries}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Bid archive checks
+
+Places random bids on a few auctions through the API against a throwaway
+SQLite file, settles them and records what the read endpoints return, then
+archives the auctions with services/archive.py and checks that:
+
+- the bid rows are gone and one segment file holds the bids
+- GET /api/auctions/<id> (every page of every bidder's history), /bids,
+  /distribution (histogram and non-histogram buckets), /pool and
+  GET /api/winners/<id> return exactly what they returned before
+- reconcile and the leaderboard rebuild leave archived auctions alone
+
+Usage:
+    python tests/archive_bids.py [--auctions 6] [--bids 300] [--seed 7]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BIDDERS = 8
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"  ok  {message}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check archived auctions read the same as live ones")
+    parser.add_argument('--auctions', type=int, default=6)
+    parser.add_argument('--bids', type=int, default=300, help="bids per auction")
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+def snapshot(client, auction_ids, tokens):
+    """
+    Returns:
+        Dict of (path, user) -> (status, JSON body) of every read endpoint
+    """
+    responses = {}
+
+    def get(path, user_id):
+        response = client.get(path, headers={'Authorization': f'Bearer {tokens[user_id]}'})
+        responses[(path, user_id)] = (response.status_code, response.get_json())
+        return response.get_json()
+
+    viewer = next(iter(tokens))
+    for auction_id in auction_ids:
+        for user_id in tokens:
+            cursor = ''
+            while True:
+                page = get(f'/api/auctions/{auction_id}?bids_limit=7&bids_cursor={cursor}', user_id)
+                if page['bids_next_cursor'] is None:
+                    break
+                cursor = page['bids_next_cursor']
+        get(f'/api/auctions/{auction_id}/bids', viewer)
+        for bucket in (10, 20, 0.5, 3):
+            get(f'/api/auctions/{auction_id}/distribution?bucket={bucket}&top=5', viewer)
+        get(f'/api/auctions/{auction_id}/pool', viewer)
+        get(f'/api/winners/{auction_id}', viewer)
+    return responses
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    import config
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    archive_dir = tempfile.mkdtemp(prefix='archive-')
+    config.Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    config.Config.SETTLE_EXPIRED_AUCTIONS = False
+    config.Config.CACHE_BACKEND = 'none'
+    config.Config.ARCHIVE_DIR = archive_dir
+    config.Config.RATE_LIMIT_ENABLED = False
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import func, update
+    from app import create_app
+    from extensions import db
+    from models import Auction, AuctionArchive, Bid, User, Wallet
+    from services import leaderboard
+    from services.archive import archive_settled_auctions
+    from services.settlement import settle_auctions
+    from services.totals import reconcile_auction_totals
+
+    app = create_app()
+    try:
+        with app.app_context():
+            db.create_all()
+            users = [User(username=f'arc{i}', email=f'arc{i}@example.com', password_hash='-')
+                     for i in range(BIDDERS + 1)]
+            db.session.add_all(users)
+            db.session.flush()
+            db.session.add_all(Wallet(user_id=user.id, balance=10 ** 9) for user in users)
+            db.session.commit()
+            tokens = {user.id: create_access_token(identity=str(user.id)) for user in users}
+            creator_id, bidder_ids = users[0].id, [user.id for user in users[1:]]
+
+        client = app.test_client()
+        auction_ids = []
+        for row in range(args.auctions + 1):
+            response = client.post('/api/auctions/', json={
+                'title': f'Archived {row}', 'starting_price': 1, 'item_value': 100,
+                'expires_at': (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            }, headers={'Authorization': f'Bearer {tokens[creator_id]}'})
+            auction_ids.append(response.get_json()['id'])
+        # THE LAST AUCTION GETS NO BIDS
+        for auction_id in auction_ids[:-1]:
+            for _ in range(args.bids):
+                response = client.post('/api/bids/', json={
+                    'auctionId': auction_id, 'amount': rng.randint(1, 400) / 10
+                }, headers={'Authorization': f'Bearer {tokens[rng.choice(bidder_ids)]}'})
+                assert response.status_code == 201, response.get_json()
+
+        with app.app_context():
+            past = datetime.now(timezone.utc) - timedelta(seconds=1)
+            db.session.execute(update(Auction).where(Auction.id.in_(auction_ids)).values(expires_at=past))
+            db.session.commit()
+            settle_auctions(auction_ids)
+        print(f"placed {args.auctions * args.bids} bids on {args.auctions} auctions and settled them")
+
+        before = snapshot(client, auction_ids, tokens)
+        check(any(status == 200 for (path, _), (status, _) in before.items() if path.startswith('/api/winners/')),
+              "some auctions have a winner")
+
+        with app.app_context():
+            archived = archive_settled_auctions(batch_size=100, after_seconds=0)
+            check(archived == len(auction_ids), "every settled auction was archived")
+            check(archive_settled_auctions(batch_size=100, after_seconds=0) == 0, "a second run finds nothing")
+            check(db.session.query(func.count(Bid.id)).scalar() == 0, "the bid table is empty")
+            summaries = AuctionArchive.query.all()
+            check(len({summary.segment for summary in summaries if summary.segment}) == 1,
+                  "one segment file holds the batch")
+            check(sum(summary.bid_count for summary in summaries) == args.auctions * args.bids,
+                  "summaries count every bid")
+            size = sum(os.path.getsize(os.path.join(archive_dir, name)) for name in os.listdir(archive_dir))
+            print(f"  segment size {size} bytes, {size / (args.auctions * args.bids):.1f} bytes per bid")
+
+        after = snapshot(client, auction_ids, tokens)
+        changed = [key for key in before if before[key] != after[key]]
+        for key in changed[:3]:
+            print(key, before[key], after[key], sep='\n    ')
+        check(not changed, f"{len(before)} responses are unchanged after archiving")
+
+        with app.app_context():
+            check(reconcile_auction_totals() == 0, "reconcile leaves archived totals alone")
+            leaderboard.rebuild()
+        check(snapshot(client, auction_ids, tokens) == before, "the leaderboard rebuild keeps archived rows")
+    finally:
+        app.extensions['expiry_scheduler'].stop()
+        app.extensions['archive_store'].close()
+        os.unlink(path)
+        shutil.rmtree(archive_dir)
+    print("archived auctions read the same as live ones")
+
+
+if __name__ == '__main__':
+    main()
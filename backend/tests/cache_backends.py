@@ -0,0 +1,230 @@
+"""
+Cache backend checks
+
+Runs the same checks against the in-process LRU and the shared backend, the
+latter talking to a small Redis protocol stand-in started on a local port
+(pass --redis-url to use a real server instead):
+
+- entries expire after their TTL and the LRU keeps at most max_entries
+- invalidating a namespace hides its entries from every Cache instance
+  sharing the backend, the way several worker processes share one server
+- with the app configured for the shared backend, repeated reads of a hot
+  auction run no SQL, and placing a bid makes the next read fresh
+
+Usage:
+    python tests/cache_backends.py [--redis-url redis://localhost:6379/15]
+"""
+import argparse
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache import Cache, MemoryBackend, RedisBackend
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough of the Redis protocol for services/cache.py:
+    PING, AUTH, SELECT, GET, SET key value [EX seconds], INCR and EXPIRE
+    """
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            name, args = command[0].upper(), command[1:]
+            with self.server.lock:
+                if name in ('PING', 'AUTH', 'SELECT'):
+                    reply = b'+OK\r\n'
+                elif name == 'GET':
+                    value, expires_at = store.get(args[0], (None, None))
+                    if value is None or (expires_at and expires_at <= time.monotonic()):
+                        reply = b'$-1\r\n'
+                    else:
+                        reply = f'${len(value.encode())}\r\n'.encode() + value.encode() + b'\r\n'
+                elif name == 'SET':
+                    ttl = int(args[3]) if len(args) > 3 and args[2].upper() == 'EX' else None
+                    store[args[0]] = (args[1], time.monotonic() + ttl if ttl else None)
+                    reply = b'+OK\r\n'
+                elif name == 'INCR':
+                    value, expires_at = store.get(args[0], ('0', None))
+                    if expires_at and expires_at <= time.monotonic():
+                        value, expires_at = '0', None
+                    value = int(value) + 1
+                    store[args[0]] = (str(value), expires_at)
+                    reply = f':{value}\r\n'.encode()
+                elif name == 'EXPIRE':
+                    exists = args[0] in store
+                    if exists:
+                        store[args[0]] = (store[args[0]][0], time.monotonic() + int(args[1]))
+                    reply = f':{int(exists)}\r\n'.encode()
+                else:
+                    reply = f'-ERR unknown command {name}\r\n'.encode()
+            self.wfile.write(reply)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RespHandler)
+        self.store = {}
+        self.lock = threading.Lock()
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+    print(f"  ok  {message}")
+
+
+def check_backend(name, make_backend):
+    print(f"{name} backend")
+    backend = make_backend()
+
+    backend.set('hiddendeal:test:short', '"value"', 1)
+    check(backend.get('hiddendeal:test:short') == '"value"', "entry is readable before its TTL")
+    time.sleep(1.1)
+    check(backend.get('hiddendeal:test:short') is None, "entry is gone after its TTL")
+
+    worker_a, worker_b = Cache(), Cache()
+    worker_a.backend, worker_b.backend = backend, make_backend()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {"bid_count": len(loads)}
+
+    first = worker_a.get_or_set('check:1', 'detail', loader)
+    again = worker_b.get_or_set('check:1', 'detail', loader)
+    check(first == again == {"bid_count": 1} and len(loads) == 1, "second worker reads the first worker's entry")
+
+    worker_a.invalidate('check:1')
+    after = worker_b.get_or_set('check:1', 'detail', loader)
+    check(after == {"bid_count": 2}, "invalidation by one worker is seen by the other")
+
+    check(worker_a.get_or_set('check:2', 'detail', lambda: None) is None, "a missing value is not cached")
+    check(worker_a.get_or_set('check:2', 'detail', lambda: 5) == 5, "loader runs again after a miss")
+
+
+def check_lru():
+    print("memory backend size bound")
+    backend = MemoryBackend(max_entries=3)
+    for key in 'abc':
+        backend.set(key, key, 60)
+    backend.get('a')
+    backend.set('d', 'd', 60)
+    check(backend.get('b') is None, "least recently used entry is evicted")
+    check(all(backend.get(key) == key for key in 'acd'), "recently used entries are kept")
+    backend.incr(['version'])
+    for key in 'efgh':
+        backend.set(key, key, 60)
+    check(backend.get('version') == '1', "namespace versions are never evicted")
+
+
+def check_app(redis_url):
+    print("app with the shared backend")
+    import config
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    config.Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    config.Config.CACHE_BACKEND = 'redis'
+    config.Config.CACHE_URL = redis_url
+    config.Config.SETTLE_EXPIRED_AUCTIONS = False
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from extensions import db, metrics
+    from models import Auction, User, Wallet
+
+    app = create_app()
+    try:
+        with app.app_context():
+            db.create_all()
+            creator = User(username='creator', email='creator@example.com', password_hash='-')
+            bidder = User(username='bidder', email='bidder@example.com', password_hash='-')
+            db.session.add_all([creator, bidder])
+            db.session.flush()
+            db.session.add_all([Wallet(user_id=creator.id, balance=0), Wallet(user_id=bidder.id, balance=100000)])
+            auction = Auction(
+                title='Cache check', starting_price=1, creator_id=creator.id,
+                expires_at=datetime.now(timezone.utc) + timedelta(hours=1), item_value=100000
+            )
+            db.session.add(auction)
+            db.session.commit()
+            auction_id = auction.id
+            headers = {'Authorization': f'Bearer {create_access_token(identity=str(bidder.id))}'}
+
+        client = app.test_client()
+        urls = [
+            '/api/auctions/',
+            f'/api/auctions/{auction_id}',
+            f'/api/auctions/{auction_id}/distribution',
+            f'/api/auctions/{auction_id}/pool',
+        ]
+        for url in urls:
+            client.get(url, headers=headers)
+        statements = metrics.statements
+        responses = [client.get(url, headers=headers) for url in urls]
+        check(all(response.status_code == 200 for response in responses), "read endpoints answer from the cache")
+        check(metrics.statements == statements, "cached reads run no SQL")
+
+        response = client.post('/api/bids/', json={'auctionId': auction_id, 'amount': 1.5}, headers=headers)
+        check(response.status_code == 201, "bid is accepted")
+        detail = client.get(f'/api/auctions/{auction_id}', headers=headers).get_json()
+        pool = client.get(f'/api/auctions/{auction_id}/pool', headers=headers).get_json()
+        check(len(detail['bids']) == 1 and pool['bid_count'] == 1, "a bid invalidates the auction's entries")
+
+        client.post('/api/auctions/', json={
+            'title': 'Second', 'starting_price': 1, 'item_value': 50,
+            'expires_at': (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        }, headers=headers)
+        listing = client.get('/api/auctions/').get_json()
+        check(len(listing['auctions']) == 2, "creating an auction invalidates the listing")
+    finally:
+        app.extensions['expiry_scheduler'].stop()
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the response cache backends")
+    parser.add_argument('--redis-url', help="use this server instead of the local stand-in")
+    args = parser.parse_args()
+
+    redis_url = args.redis_url
+    if redis_url is None:
+        server = RespServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        redis_url = f'redis://127.0.0.1:{server.server_address[1]}/0'
+
+    # ONE MEMORY BACKEND STANDS IN FOR WHAT WORKERS WOULD SHARE
+    memory = MemoryBackend()
+    check_backend("memory", lambda: memory)
+    check_lru()
+    check_backend("redis", lambda: RedisBackend(redis_url))
+    check_app(redis_url)
+    print("all cache checks passed")
+
+
+if __name__ == '__main__':
+    main()
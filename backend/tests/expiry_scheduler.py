@@ -0,0 +1,92 @@
+"""
+Expiry scheduler checks
+
+Starts the scheduler against a throwaway SQLite file that already holds
+auctions, as after a restart, and checks that:
+
+- start() expires auctions already past their deadline and queues the
+  deadline of every other active auction
+- a loaded deadline expires its auction when it passes, well before the
+  periodic sweep would
+- deadlines scheduled while the thread runs are queued, and none are
+  queued while it is stopped
+
+Usage:
+    python tests/expiry_scheduler.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"  ok  {message}")
+
+
+def main():
+    import config
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    config.Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    config.Config.SETTLE_EXPIRED_AUCTIONS = False
+    # LONG ENOUGH THAT ONLY A QUEUED DEADLINE CAN WAKE THE THREAD DURING THE CHECKS
+    config.Config.EXPIRY_SCHEDULER_MAX_SLEEP = 600
+
+    from app import create_app
+    from extensions import db, expiry_scheduler
+    from models import Auction, User
+
+    app = create_app()
+    try:
+        expiry_scheduler.stop()
+        with app.app_context():
+            db.create_all()
+            creator = User(username='creator', email='creator@example.com', password_hash='-')
+            db.session.add(creator)
+            db.session.flush()
+            now = datetime.now(timezone.utc)
+            deadlines = [now - timedelta(minutes=1), now + timedelta(seconds=2), now + timedelta(hours=1)]
+            auctions = [Auction(title=f'Auction {i}', starting_price=1, creator_id=creator.id, expires_at=expires_at)
+                        for i, expires_at in enumerate(deadlines)]
+            db.session.add_all(auctions)
+            db.session.commit()
+            past, soon, later = [auction.id for auction in auctions]
+
+        def status(auction_id):
+            with app.app_context():
+                value = db.session.get(Auction, auction_id).status
+                db.session.remove()
+            return value
+
+        expiry_scheduler._heap = []
+        expiry_scheduler.start()
+        queued = sorted(auction_id for _, auction_id in expiry_scheduler._heap)
+        check(queued == [soon, later], f"start() queued the deadlines of auctions {queued}")
+        check(status(past) == 'expired', "an auction past its deadline was expired on start")
+
+        started = time.monotonic()
+        while status(soon) == 'active' and time.monotonic() - started < 10:
+            time.sleep(0.1)
+        check(status(soon) == 'expired' and status(later) == 'active',
+              f"the loaded deadline expired its auction after {time.monotonic() - started:.1f}s")
+
+        expiry_scheduler.schedule(later + 1, datetime.now(timezone.utc) + timedelta(hours=2))
+        check(len(expiry_scheduler._heap) == 2, "a deadline scheduled while running is queued")
+        expiry_scheduler.stop()
+        expiry_scheduler.schedule(later + 2, datetime.now(timezone.utc) + timedelta(hours=2))
+        check(len(expiry_scheduler._heap) == 2, "no deadline is queued while stopped")
+    finally:
+        expiry_scheduler.stop()
+        os.unlink(path)
+    print("the expiry scheduler queues every pending deadline")
+
+
+if __name__ == '__main__':
+    main()
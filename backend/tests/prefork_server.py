@@ -0,0 +1,255 @@
+"""
+Prefork server checks
+
+Runs serve.py with several worker processes against a throwaway SQLite file
+and fires concurrent bids at one auction over HTTP, so consecutive bids land
+in different workers. Then checks that:
+
+- every worker's uniqueness index agrees with the bid table: the lowest
+  unique bid in GET /api/auctions/<id> and the stored is_unique flags match
+  a recomputation from the bids
+- GET /metrics, whichever worker answers it, counts the bids accepted by
+  all of them
+- SIGTERM in the middle of the load loses nothing: every bid in the table
+  got its 201 response and every 201 response has its bid, and the server
+  exits within the graceful timeout
+- event streams do not take the request threads: a worker with 4 threads
+  holding 6 open streams still answers the auction list, refuses streams
+  beyond --max-streams with 503, and still stops promptly
+
+Usage:
+    python tests/prefork_server.py [--workers 4] [--bids 1500] [--clients 32]
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+BIDDERS = 40
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"  ok  {message}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check bids placed through several worker processes")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--bids', type=int, default=1500, help="bids per phase")
+    parser.add_argument('--clients', type=int, default=32, help="concurrent HTTP clients")
+    return parser.parse_args()
+
+
+def start_server(env, workers, *options):
+    """
+    Returns:
+        (process, port, log lines), once the server listens
+    """
+    process = subprocess.Popen(
+        [sys.executable, 'serve.py', '--port', '0', '--workers', str(workers), '--graceful-timeout', '10', *options],
+        cwd=BACKEND, env=env, stderr=subprocess.PIPE, text=True
+    )
+    lines = []
+    port = None
+    for line in process.stderr:
+        lines.append(line)
+        match = re.search(r'Listening on http://[^:]+:(\d+)', line)
+        if match:
+            port = int(match.group(1))
+            break
+    if port is None:
+        print(''.join(lines))
+        sys.exit(1)
+    threading.Thread(target=lambda: lines.extend(process.stderr), daemon=True).start()
+    return process, port, lines
+
+
+def expected_lowest(rows):
+    """
+    Returns:
+        Bid id of the lowest unique amount among (bid id, amount) rows, or None
+    """
+    counts = Counter(amount for _, amount in rows)
+    unique = [(amount, bid_id) for bid_id, amount in rows if counts[amount] == 1]
+    return min(unique)[1] if unique else None
+
+
+def check_streams(env, auction_id, token):
+    """
+    Hold more event streams than one worker has request threads
+    """
+    print("event streams on a worker with 4 threads")
+    process, port, _ = start_server(env, 1, '--threads', '4', '--max-streams', '6')
+    streams = []
+
+    def open_stream():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        connection.request('GET', f'/api/auctions/{auction_id}/events?jwt={token}')
+        response = connection.getresponse()
+        if response.status == 200:
+            # THE SNAPSHOT EVENT PROVES THE STREAM IS BEING SERVED
+            response.fp.readline()
+        # THE RESPONSE OWNS THE SOCKET OF A STREAM, IT MUST STAY REFERENCED
+        streams.append(response)
+        return response.status
+
+    try:
+        statuses = [open_stream() for _ in range(6)]
+        check(statuses == [200] * 6, "6 streams are open on 4 request threads")
+        started = time.monotonic()
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/auctions/', timeout=10) as response:
+            listed = response.status
+        check(listed == 200 and time.monotonic() - started < 2, "the auction list is still answered")
+        check(open_stream() == 503, "a 7th stream is refused with 503")
+        process.send_signal(signal.SIGTERM)
+        stopped_at = time.monotonic()
+        check(process.wait(timeout=20) == 0 and time.monotonic() - stopped_at < 5,
+              "the server ends the streams and stops")
+    finally:
+        for response in streams:
+            response.close()
+        if process.poll() is None:
+            process.kill()
+
+
+def main():
+    args = parse_args()
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', CACHE_BACKEND='none',
+               RATE_LIMIT_ENABLED='0')
+    os.environ.update(env)
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from extensions import db
+    from models import Auction, Bid, User, Wallet
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        users = [User(username=f'fork{i}', email=f'fork{i}@example.com', password_hash='-')
+                 for i in range(BIDDERS + 1)]
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add_all(Wallet(user_id=user.id, balance=10 ** 9) for user in users)
+        auction = Auction(title='Prefork', starting_price=1, item_value=10 ** 9, creator_id=users[0].id,
+                          expires_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        db.session.add(auction)
+        db.session.commit()
+        auction_id = auction.id
+        tokens = [create_access_token(identity=str(user.id)) for user in users[1:]]
+        db.session.remove()
+        db.engine.dispose()
+    app.extensions['expiry_scheduler'].stop()
+
+    process, port, log = start_server(env, args.workers)
+    base = f'http://127.0.0.1:{port}'
+
+    def call(method, path, body, token):
+        request = urllib.request.Request(base + path, method=method, data=json.dumps(body).encode() if body else None,
+                                         headers={"Content-Type": "application/json",
+                                                  "Authorization": f"Bearer {token}"})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, None
+        except OSError:
+            # REFUSED OR RESET ONCE THE SERVER STOPPED ACCEPTING
+            return None, None
+
+    def place(number):
+        return call('POST', '/api/bids/', {"auctionId": auction_id, "amount": (number * 7919 % 2003 + 1) / 10},
+                    tokens[number % BIDDERS])
+
+    def bid_rows():
+        with app.app_context():
+            rows = db.session.query(Bid.id, Bid.amount, Bid.is_unique).filter_by(auction_id=auction_id).all()
+            db.session.remove()
+        return rows
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            first = list(pool.map(place, range(args.bids)))
+        check(all(status == 201 for status, _ in first), f"{args.bids} bids were accepted")
+
+        rows = bid_rows()
+        lowest = expected_lowest([(bid_id, amount) for bid_id, amount, _ in rows])
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            details = list(pool.map(lambda number: call('GET', f'/api/auctions/{auction_id}', None,
+                                                        tokens[number % BIDDERS]), range(4 * args.workers)))
+        reported = {(body['lowest_unique_bid'] or {}).get('bid_id') for _, body in details}
+        check(reported == {lowest}, f"every worker reports lowest unique bid {lowest}")
+        served = len({line for line in log if 'served its first connection' in line})
+        check(served > 1, f"{served} workers served requests")
+
+        # ONCE EVERY WORKER HAS FLUSHED ITS COUNTS
+        time.sleep(1.5)
+        scrapes = []
+        for _ in range(args.workers):
+            with urllib.request.urlopen(f'{base}/metrics', timeout=10) as response:
+                scrapes.append(response.read().decode())
+        check(all(f'hiddendeal_bids_total{{outcome="accepted"}} {args.bids}\n' in rendered for rendered in scrapes),
+              f"every scrape of /metrics counts the {args.bids} bids of all workers")
+
+        # SIGTERM ONCE A THIRD OF THE SECOND PHASE WAS ANSWERED
+        answered = threading.Semaphore(0)
+
+        def place_counted(number):
+            result = place(number)
+            answered.release()
+            return result
+
+        def stop():
+            for _ in range(args.bids // 3):
+                answered.acquire()
+            process.send_signal(signal.SIGTERM)
+
+        stopper = threading.Thread(target=stop)
+        stopper.start()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            second = list(pool.map(place_counted, range(args.bids, 2 * args.bids)))
+        stopper.join()
+        stopped_at = time.monotonic()
+        code = process.wait(timeout=20)
+        print(f"  accepted {sum(status == 201 for status, _ in second)} bids, "
+              f"{sum(status is None for status, _ in second)} refused after SIGTERM, "
+              f"server exited in {time.monotonic() - stopped_at:.2f}s")
+        check(code == 0, "the server exited cleanly")
+        check(all(status in (201, None) for status, _ in second), "no request failed while stopping")
+
+        rows = bid_rows()
+        acknowledged = {body['bid_id'] for status, body in first + second if status == 201}
+        check({bid_id for bid_id, _, _ in rows} == acknowledged, f"the {len(rows)} stored bids are the acknowledged ones")
+        counts = Counter(amount for _, amount, _ in rows)
+        check(all(is_unique == (counts[amount] == 1) for _, amount, is_unique in rows),
+              "stored is_unique flags match the bid table")
+        check_streams(env, auction_id, tokens[0])
+    finally:
+        if process.poll() is None:
+            process.kill()
+        os.unlink(db_path)
+    print("worker processes agree on uniqueness and stop without losing bids")
+
+
+if __name__ == '__main__':
+    main()
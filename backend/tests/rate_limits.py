@@ -0,0 +1,166 @@
+"""
+Rate limiter checks
+
+- token buckets: a burst is admitted and then refused with the time until
+  the next token, refill restores it, and a refused request takes nothing
+  from the caller's other buckets
+- shared windows: two limiters on one backend, as two worker processes
+  would be, admit one budget between them, on the in-process LRU and on a
+  Redis protocol stand-in (pass --redis-url to use a real server instead)
+- the app: a bidder over their budget gets 429 with Retry-After without any
+  SQL while other bidders carry on, logins are counted per client address
+  behind a trusted proxy, decisions show up in /metrics and an unreachable
+  shared backend admits requests
+
+Usage:
+    python tests/rate_limits.py [--redis-url redis://localhost:6379/15]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_backends import RespServer, check
+from services.cache import MemoryBackend, RedisBackend
+from services.ratelimit import MemoryBuckets, SharedWindows
+
+
+def check_buckets():
+    print("token buckets")
+    buckets = MemoryBuckets()
+    keys = [('user', '1', 2, 4)]
+    admitted = [not buckets.acquire('bid', keys, now=100.0) for _ in range(5)]
+    check(admitted == [True] * 4 + [False], "a burst of 4 is admitted, the 5th is refused")
+    check(buckets.acquire('bid', keys, now=100.0) == [('user', 0.5)], "the refusal tells when a token is back")
+    check(not buckets.acquire('bid', keys, now=100.5), "a token is back after 1 / rate seconds")
+    check(not buckets.acquire('bid', [('user', '2', 2, 4)], now=100.5), "other users have their own bucket")
+
+    both = [('user', '3', 1, 1), ('ip', '10.0.0.1', 1, 2)]
+    check(not buckets.acquire('bid', both, now=200.0), "the first request fits both scopes")
+    check(buckets.acquire('bid', both, now=200.0) == [('user', 1.0)], "the user scope refuses the second")
+    check(not buckets.acquire('bid', [('ip', '10.0.0.1', 1, 2)], now=200.0),
+          "the refused request took nothing from the address bucket")
+
+    small = MemoryBuckets(max_keys=2)
+    for user in 'abc':
+        small.acquire('bid', [('user', user, 1, 1)], now=300.0)
+    check(not small.acquire('bid', [('user', 'a', 1, 1)], now=300.0), "the least recently used bucket is dropped")
+
+
+def check_windows(name, make_backend):
+    print(f"shared windows on the {name} backend")
+    backend = make_backend()
+    workers = [SharedWindows(backend), SharedWindows(make_backend())]
+    prefix = f'{name}-{time.time()}'
+    keys = [('user', prefix, 2, 10)]
+    # A WINDOW OF burst / rate = 5 SECONDS, STARTING AT A MULTIPLE OF IT
+    start = 5 * int(time.time() // 5)
+    admitted = sum(not workers[i % 2].acquire('bid', keys, now=start + 0.1) for i in range(14))
+    check(admitted == 10, "two workers admit one burst between them")
+    refused = workers[0].acquire('bid', keys, now=start + 0.2)
+    check(refused and refused[0][0] == 'user' and refused[0][1] > 0, "a full window gives a wait")
+    # HALF WAY THROUGH THE NEXT WINDOW HALF OF THE 15 COUNTED REQUESTS STILL COUNT
+    admitted = sum(not workers[i % 2].acquire('bid', keys, now=start + 7.5) for i in range(6))
+    check(admitted == 2, "the previous window counts for the part still inside the sliding window")
+
+
+def check_app(redis_url):
+    print("app")
+    import config
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    config.Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    config.Config.SETTLE_EXPIRED_AUCTIONS = False
+    config.Config.CACHE_BACKEND = 'none'
+    config.Config.RATE_LIMIT_TRUSTED_PROXIES = 1
+    config.Config.RATE_LIMITS = {'bid': {'user': (1, 3), 'ip': (100, 100)}, 'login': {'ip': (1, 2)}}
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from extensions import db, metrics, rate_limiter
+    from models import Auction, User, Wallet
+
+    app = create_app()
+    try:
+        with app.app_context():
+            db.create_all()
+            users = [User(username=f'limit{i}', email=f'limit{i}@example.com', password_hash='-') for i in range(3)]
+            db.session.add_all(users)
+            db.session.flush()
+            db.session.add_all(Wallet(user_id=user.id, balance=10 ** 6) for user in users)
+            auction = Auction(title='Limits', starting_price=1, creator_id=users[0].id, item_value=10 ** 6,
+                              expires_at=datetime.now(timezone.utc) + timedelta(hours=1))
+            db.session.add(auction)
+            db.session.commit()
+            auction_id = auction.id
+            headers = [{'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'} for user in users]
+
+        client = app.test_client()
+
+        def bid(user, amount):
+            return client.post('/api/bids/', json={'auctionId': auction_id, 'amount': amount}, headers=headers[user])
+
+        check([bid(1, 1 + i).status_code for i in range(3)] == [201] * 3, "a bidder's burst is accepted")
+        statements = metrics.statements
+        refused = bid(1, 5)
+        check(refused.status_code == 429 and refused.headers.get('Retry-After') == '1',
+              "the next bid gets 429 with Retry-After")
+        check(metrics.statements == statements, "the refused bid ran no SQL")
+        check(bid(2, 6).status_code == 201, "another bidder is still accepted")
+
+        def login(address):
+            return client.post('/api/auth/login', json={'email': 'nobody@example.com', 'password': 'x'},
+                               headers={'X-Forwarded-For': address}).status_code
+
+        check([login('10.0.0.1') for _ in range(3)] == [401, 401, 429], "logins are limited per address")
+        check(login('10.0.0.2') == 401, "another address behind the proxy can still log in")
+
+        rendered = client.get('/metrics').get_data(as_text=True)
+        check('hiddendeal_rate_limit_decisions_total{budget="bid",decision="limited_user"} 1' in rendered
+              and 'hiddendeal_rate_limit_decisions_total{budget="login",decision="limited_ip"} 1' in rendered,
+              "decisions are counted in /metrics")
+
+        time.sleep(1.1)
+        check(bid(1, 7).status_code == 201, "the bidder is accepted again once a token is back")
+
+        store = rate_limiter.store
+        try:
+            rate_limiter.store = SharedWindows(RedisBackend('redis://127.0.0.1:1', timeout=0.2))
+            check(bid(1, 8).status_code == 201, "an unreachable shared backend admits the request")
+            rate_limiter.store = SharedWindows(RedisBackend(redis_url))
+            check([bid(2, 9 + i).status_code for i in range(4)] == [201, 201, 201, 429],
+                  "the shared backend enforces the budget")
+        finally:
+            rate_limiter.store = store
+    finally:
+        app.extensions['expiry_scheduler'].stop()
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the rate limiter")
+    parser.add_argument('--redis-url', help="use this server instead of the local stand-in")
+    args = parser.parse_args()
+
+    redis_url = args.redis_url
+    if redis_url is None:
+        server = RespServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        redis_url = f'redis://127.0.0.1:{server.server_address[1]}/0'
+
+    check_buckets()
+    # ONE MEMORY BACKEND STANDS IN FOR WHAT WORKERS WOULD SHARE
+    memory = MemoryBackend()
+    check_windows("memory", lambda: memory)
+    check_windows("redis", lambda: RedisBackend(redis_url))
+    check_app(redis_url)
+    print("all rate limit checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,11 @@
 #!/bin/bash
 
+# Registration, login and bids are rate limited per client address, and every user here
+# registers from this machine. Requests answered 429 are retried after their Retry-After,
+# so the run slows down past the registration burst. To run at full speed, start the
+# server with RATE_LIMIT_ENABLED=0:
+#   RATE_LIMIT_ENABLED=0 python3 app.py
+
 # Configuration
 AUCTION_ID=${1:-1}  # Use the first argument as auction ID or default to 1
 NUM_USERS=${2:-10}  # Default to 10 users for testing
@@ -31,6 +37,28 @@ random_bid() {
     echo $rand  # Using whole numbers instead of floats for simplicity
 }
 
+# POST JSON, retrying while the server answers 429 Too Many Requests
+HEADERS_FILE=$(mktemp)
+trap 'rm -f "$HEADERS_FILE"' EXIT
+post_json() {
+    local url=$1
+    local data=$2
+    shift 2
+    local response status wait
+    for attempt in 1 2 3 4 5 6; do
+        response=$(curl -s -D "$HEADERS_FILE" -w "\n%{http_code}" -X POST "$url" \
+            -H "Content-Type: application/json" "$@" -d "$data")
+        status=$(echo "$response" | tail -n1)
+        if [[ "$status" != "429" ]]; then
+            break
+        fi
+        wait=$(grep -i '^Retry-After:' "$HEADERS_FILE" | tr -dc '0-9')
+        echo "Rate limited, retrying in ${wait:-1}s" >&2
+        sleep "${wait:-1}"
+    done
+    echo "$response"
+}
+
 # Debugging: Print API URL
 echo "Using API URL: $API_URL"
 
@@ -47,9 +75,7 @@ for i in $(seq $START_INDEX $(($START_INDEX + $NUM_USERS - 1))); do
     REGISTER_DATA="{\"username\":\"$username\",\"email\":\"$email\",\"password\":\"$password\"}"
     echo "Sending registration data: $REGISTER_DATA"
     
-    register_response=$(curl -s -w "\n%{http_code}" -X POST "$API_URL/auth/register" \
-        -H "Content-Type: application/json" \
-        -d "$REGISTER_DATA")
+    register_response=$(post_json "$API_URL/auth/register" "$REGISTER_DATA")
     
     # Extract status code and save full response for debugging
     status_code=$(echo "$register_response" | tail -n1)
@@ -71,9 +97,7 @@ for i in $(seq $START_INDEX $(($START_INDEX + $NUM_USERS - 1))); do
     LOGIN_DATA="{\"email\":\"$email\",\"password\":\"$password\"}"
     echo "Sending login data: $LOGIN_DATA"
     
-    login_response=$(curl -s -w "\n%{http_code}" -X POST "$API_URL/auth/login" \
-        -H "Content-Type: application/json" \
-        -d "$LOGIN_DATA")
+    login_response=$(post_json "$API_URL/auth/login" "$LOGIN_DATA")
     
     # Extract status code and token
     status_code=$(echo "$login_response" | tail -n1)
@@ -123,10 +147,7 @@ except Exception as e:
     BID_DATA="{\"auctionId\":$AUCTION_ID,\"amount\":$bid_amount}"
     echo "Sending bid data: $BID_DATA"
     
-    bid_response=$(curl -s -w "\n%{http_code}" -X POST "$API_URL/bids/" \
-        -H "Content-Type: application/json" \
-        -H "Authorization: Bearer $token" \
-        -d "$BID_DATA")
+    bid_response=$(post_json "$API_URL/bids/" "$BID_DATA" -H "Authorization: Bearer $token")
     
     # Extract status code
     status_code=$(echo "$bid_response" | tail -n1)
@@ -0,0 +1,130 @@
+"""
+Simulator rule checks
+
+Generates a few small auctions with services/simulation.py, then replays
+the very same bids through POST /api/bids/ against a throwaway SQLite file,
+settles them and checks that the simulator's vectorized rules and the live
+code agree on every auction:
+
+- total bid amount, pool and creator revenue (the creator_credit ledger entries)
+- the lowest unique bid and its bidder
+- the pool payout per rank
+
+Usage:
+    python tests/simulation_rules.py [--auctions 12] [--seed 7]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from money import from_cents
+from services.simulation import DEFAULT_SCENARIO, generate, play
+
+import numpy as np
+
+# SMALL ENOUGH TO REPLAY, BUSY ENOUGH FOR THRESHOLDS, TIES AND DUPLICATE AMOUNTS
+SCENARIO = DEFAULT_SCENARIO._replace(item_value=2000, max_bid=500, mean_bid=60, mean_bids=40, bidders=6)
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"  ok  {message}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the simulator against the live bidding code")
+    parser.add_argument('--auctions', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    steps, bidders, valid = generate(np.random.default_rng(args.seed), SCENARIO, args.auctions)
+    outcome = play(SCENARIO, steps, bidders, valid)
+
+    import config
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    config.Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    config.Config.SETTLE_EXPIRED_AUCTIONS = False
+    config.Config.RATE_LIMIT_ENABLED = False
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import func, update
+    from app import create_app
+    from extensions import db
+    from models import Auction, PoolPrizeWinner, User, Wallet, WalletLedger
+    from services.settlement import settle_auctions
+
+    app = create_app()
+    try:
+        with app.app_context():
+            db.create_all()
+            users = [User(username=f'sim{i}', email=f'sim{i}@example.com', password_hash='-')
+                     for i in range(SCENARIO.bidders + 1)]
+            db.session.add_all(users)
+            db.session.flush()
+            db.session.add_all(Wallet(user_id=user.id, balance=10 ** 9) for user in users)
+            db.session.commit()
+            creator_id, bidder_ids = users[0].id, [user.id for user in users[1:]]
+            tokens = {user.id: create_access_token(identity=str(user.id)) for user in users}
+
+        client = app.test_client()
+        auction_ids = []
+        for row in range(args.auctions):
+            response = client.post('/api/auctions/', json={
+                'title': f'Simulated {row}', 'starting_price': 1, 'item_value': from_cents(SCENARIO.item_value),
+                'expires_at': (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            }, headers={'Authorization': f'Bearer {tokens[creator_id]}'})
+            auction_id = response.get_json()['id']
+            auction_ids.append(auction_id)
+            for step, bidder in zip(steps[row][valid[row]], bidders[row][valid[row]]):
+                response = client.post('/api/bids/', json={
+                    'auctionId': auction_id, 'amount': from_cents(int(step) * 10)
+                }, headers={'Authorization': f'Bearer {tokens[bidder_ids[bidder]]}'})
+                assert response.status_code == 201, response.get_json()
+        print(f"replayed {int(valid.sum())} bids over {args.auctions} auctions")
+
+        with app.app_context():
+            past = datetime.now(timezone.utc) - timedelta(seconds=1)
+            db.session.execute(update(Auction).where(Auction.id.in_(auction_ids)).values(expires_at=past))
+            db.session.commit()
+            settle_auctions(auction_ids)
+
+            auctions = {auction.id: auction for auction in Auction.query.filter(Auction.id.in_(auction_ids))}
+            credits = dict(db.session.query(WalletLedger.auction_id, func.sum(WalletLedger.amount)).filter(
+                WalletLedger.kind == 'creator_credit', WalletLedger.auction_id.in_(auction_ids)
+            ).group_by(WalletLedger.auction_id).all())
+            payouts = {}
+            for winner in PoolPrizeWinner.query.filter(PoolPrizeWinner.auction_id.in_(auction_ids)):
+                payouts.setdefault(winner.auction_id, {})[winner.rank] = winner.amount
+
+            def simulated_payouts(row):
+                return {rank: int(amount) for rank, amount in enumerate(outcome['payouts'][row], 1) if amount}
+
+            rows = list(enumerate(auction_ids))
+            check(all(auctions[a].total_bid_amount == outcome['total'][row] for row, a in rows), "total bid amounts match")
+            check(all(auctions[a].pool_prize == outcome['pool'][row] for row, a in rows), "pools match")
+            check(all(credits.get(a, 0) == outcome['creator_revenue'][row] for row, a in rows), "creator revenue matches")
+            check(any(outcome['threshold_reached']) and not all(outcome['threshold_reached']),
+                  "both sides of the threshold were exercised")
+            check(all(
+                auctions[a].winner_id == (bidder_ids[outcome['winner'][row]] if outcome['winner'][row] >= 0 else None)
+                for row, a in rows
+            ), "lowest unique bidders match")
+            check(all(payouts.get(a, {}) == simulated_payouts(row) for row, a in rows), "pool payouts by rank match")
+    finally:
+        app.extensions['expiry_scheduler'].stop()
+        os.unlink(path)
+    print("simulator matches the live rules")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""
+Concurrent bid stress test
+
+Starts the app on a threaded local server against a throwaway SQLite file,
+fires many concurrent bids at one auction and checks that no money was
+created or lost: wallet balances plus the pool must add up to exactly what
+they were before, and the auction's running totals and bid count leaderboard
+must match the bid table, and wallets and the pool must match the wallet
+ledger once creator credits are folded in. Top-ups to the same wallets run
+among the bids and must neither lose a debit nor be lost. With --queued the bids go through the queued
+ingestion mode and are checked once the queue has drained. Finally a bid whose auction
+expires and is settled between its checks and its commit must be rejected without
+touching the pool, and a ledger entry that becomes visible after a higher id was folded
+and snapshotted must still reach the wallet and the snapshots. With --queued a ticket still
+pending on the settled auction must be rejected and refunded.
+
+Usage:
+    python tests/stress_concurrent_bids.py [--bids 2000] [--workers 32] [--users 50] [--queued]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+from flask_jwt_extended import create_access_token
+
+from config import Config
+from money import to_cents, from_cents
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fire concurrent bids and check money conservation")
+    parser.add_argument('--bids', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--item-value', type=float, default=500.0)
+    parser.add_argument('--queued', action='store_true', help="use BID_INGESTION_MODE=queued")
+    return parser.parse_args()
+
+
+def seed(db, users):
+    from models import User, Wallet, Auction
+
+    creator = User(username='creator', email='creator@example.com', password_hash='-')
+    db.session.add(creator)
+    bidders = [User(username=f'bidder{i}', email=f'bidder{i}@example.com', password_hash='-') for i in range(users)]
+    db.session.add_all(bidders)
+    db.session.flush()
+
+    db.session.add(Wallet(user_id=creator.id, balance=0))
+    # SMALL WALLETS SO SOME BIDS HIT THE INSUFFICIENT FUNDS PATH
+    db.session.add_all(Wallet(user_id=bidder.id, balance=20000) for bidder in bidders)
+
+    auction = Auction(
+        title='Stress test',
+        starting_price=1,
+        creator_id=creator.id,
+        expires_at=datetime.now(timezone.utc) + timedelta(hours=1)
+    )
+    db.session.add(auction)
+    db.session.commit()
+    return auction.id, [bidder.id for bidder in bidders]
+
+
+def money_supply(db):
+    from models import Wallet, Auction
+    from sqlalchemy import func
+
+    wallets = db.session.query(func.sum(Wallet.balance)).scalar() or 0
+    pools = db.session.query(func.sum(Auction.pool_prize)).scalar() or 0
+    return wallets + pools
+
+
+def check_late_bid(app, auction_id, user_id, token):
+    """
+    Expire and settle the auction right after the bid passed its pre-checks
+    Returns:
+        A failure message, or None
+    """
+    import routes.bids
+    from extensions import db
+    from models import Auction, Bid, Wallet
+    from services.settlement import settle_auctions
+
+    def expire_and_settle():
+        with app.app_context():
+            now = datetime.now(timezone.utc)
+            Auction.query.filter_by(id=auction_id).update({"expires_at": now, "status": 'expired'})
+            db.session.commit()
+            settle_auctions([auction_id], now)
+
+    with app.app_context():
+        balance = Wallet.query.filter_by(user_id=user_id).one().balance
+        pool_prize = Auction.query.get(auction_id).pool_prize
+        bids = Bid.query.filter_by(auction_id=auction_id).count()
+
+    check_bid_target = routes.bids._check_bid_target
+
+    def check_then_close(*args, **kwargs):
+        result = check_bid_target(*args, **kwargs)
+        # ANOTHER CONNECTION, AS THE SCHEDULER WOULD BE
+        closer = threading.Thread(target=expire_and_settle)
+        closer.start()
+        closer.join()
+        return result
+
+    routes.bids._check_bid_target = check_then_close
+    try:
+        response = app.test_client().post('/api/bids/', json={"auctionId": auction_id, "amount": 0.1},
+                                          headers={"Authorization": f"Bearer {token}"})
+    finally:
+        routes.bids._check_bid_target = check_bid_target
+
+    with app.app_context():
+        auction = Auction.query.get(auction_id)
+        if response.status_code != 400 or response.get_json()['message'] != "Auction has expired":
+            return f"a bid closed under it got {response.status_code} {response.get_json()}"
+        if Bid.query.filter_by(auction_id=auction_id).count() != bids or auction.pool_prize != pool_prize:
+            return "a bid closed under it reached the auction"
+        if Wallet.query.filter_by(user_id=user_id).one().balance < balance:
+            return "a bid closed under it was paid for"
+        if auction.settled_at is None:
+            return "the auction was not settled"
+    return None
+
+
+def check_late_ledger_entry(app, user_id):
+    """
+    Commit a creator credit with a lower id than entries already folded and
+    snapshotted, as a transaction that took its id first but committed last would
+    Returns:
+        A failure message, or None
+    """
+    from extensions import db
+    from models import Wallet, WalletLedger
+    from services import ledger
+    from sqlalchemy import func
+
+    with app.app_context():
+        newest = db.session.query(func.max(WalletLedger.id)).scalar()
+        balance = Wallet.query.filter_by(user_id=user_id).one().balance
+        db.session.add(WalletLedger(id=newest + 10, user_id=user_id, kind='creator_credit', amount=7))
+        db.session.commit()
+        ledger.fold_creator_credits()
+        ledger.take_snapshots()
+        db.session.add(WalletLedger(id=newest + 5, user_id=user_id, kind='creator_credit', amount=11))
+        db.session.commit()
+        ledger.fold_creator_credits()
+        ledger.take_snapshots()
+        wallet_mismatches, _ = ledger.verify()
+        if Wallet.query.filter_by(user_id=user_id).one().balance != balance + 18:
+            return "a late creator credit was not folded into the wallet"
+        if wallet_mismatches or ledger.ledger_balances([user_id]) != {user_id: balance + 18}:
+            return "a late ledger entry is missing from the snapshots"
+    return None
+
+
+def check_closed_ticket(app, auction_id, user_id, token):
+    """
+    Apply a ticket that is still pending on an auction settled meanwhile
+    Returns:
+        A failure message, or None
+    """
+    from extensions import db, bid_queue
+    from models import Bid, BidTicket, Wallet
+    from services import ledger
+    from services.bidding import debit_wallet
+
+    with app.app_context():
+        balance = Wallet.query.filter_by(user_id=user_id).one().balance
+        bids = Bid.query.filter_by(auction_id=auction_id).count()
+        debit_wallet(user_id, 100, auction_id)
+        ticket = BidTicket(auction_id=auction_id, user_id=user_id, amount=100, status='pending',
+                           accepted_at=datetime.now(timezone.utc) - timedelta(hours=1))
+        db.session.add(ticket)
+        db.session.commit()
+        ticket_id = ticket.id
+        bid_queue.drain()
+
+        wallet_mismatches, _ = ledger.verify()
+        if db.session.get(BidTicket, ticket_id).status != 'rejected':
+            return "a ticket on a settled auction was not rejected"
+        if Wallet.query.filter_by(user_id=user_id).one().balance != balance or wallet_mismatches:
+            return "a rejected ticket was not refunded through the ledger"
+        if Bid.query.filter_by(auction_id=auction_id).count() != bids:
+            return "a rejected ticket reached the auction"
+    response = app.test_client().get(f'/api/bids/tickets/{ticket_id}', headers={"Authorization": f"Bearer {token}"})
+    if response.get_json()['status'] != 'rejected':
+        return f"the rejected ticket was reported as {response.get_json()}"
+    return None
+
+
+def main():
+    args = parse_args()
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    Config.BID_INGESTION_MODE = 'queued' if args.queued else 'sync'
+    # FEW BIDDERS ON ONE ADDRESS, THE BUDGETS WOULD TURN MOST BIDS AWAY
+    Config.RATE_LIMIT_ENABLED = False
+
+    from app import create_app
+    from extensions import db, bid_queue
+    from models import Auction, AuctionBidder, Bid, Wallet
+    from sqlalchemy import func
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        auction_id, bidder_ids = seed(db, args.users)
+        Auction.query.get(auction_id).item_value = to_cents(args.item_value)
+        db.session.commit()
+        tokens = {user_id: create_access_token(identity=str(user_id)) for user_id in bidder_ids}
+        supply_before = money_supply(db)
+    bid_queue.start()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/api/bids/'
+
+    base = f'http://127.0.0.1:{server.server_port}/api'
+    top_ups = []
+
+    def place(number):
+        user_id = random.choice(bidder_ids)
+        if number % 10 == 0:
+            # A TOP-UP RACING THE BIDS THAT DEBIT THE SAME WALLET
+            cents = random.randint(1, 500)
+            request = urllib.request.Request(f'{base}/wallet/add/{cents / 100:.2f}', method='POST', headers={
+                "Authorization": f"Bearer {tokens[user_id]}"
+            })
+            with urllib.request.urlopen(request) as response:
+                top_ups.append(cents)
+                return 'top_up', response.status
+        body = json.dumps({"auctionId": auction_id, "amount": random.randint(1, 300) / 10}).encode()
+        request = urllib.request.Request(url, data=body, method='POST', headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {tokens[user_id]}"
+        })
+        try:
+            with urllib.request.urlopen(request) as response:
+                return 'bid', response.status
+        except urllib.error.HTTPError as e:
+            return 'bid', e.code
+
+    started = datetime.now()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(place, range(args.bids)))
+    statuses = [status for kind, status in results if kind == 'bid']
+    elapsed = (datetime.now() - started).total_seconds()
+    server.shutdown()
+    if args.queued:
+        with app.app_context():
+            bid_queue.drain()
+        applied_elapsed = (datetime.now() - started).total_seconds()
+    bid_queue.stop()
+
+    with app.app_context():
+        from services import ledger
+
+        ledger.fold_creator_credits()
+        ledger.take_snapshots()
+        wallet_mismatches, pool_mismatches = ledger.verify()
+        supply_after = money_supply(db)
+        auction = Auction.query.get(auction_id)
+        bid_rows, bid_sum = db.session.query(func.count(Bid.id), func.sum(Bid.amount)).filter_by(auction_id=auction_id).one()
+        negative_wallets = Wallet.query.filter(Wallet.balance < 0).count()
+        counters_match = auction.bid_count == bid_rows and auction.total_bid_amount == (bid_sum or 0)
+        per_user = dict(db.session.query(Bid.user_id, func.count(Bid.id)).filter_by(auction_id=auction_id).group_by(Bid.user_id).all())
+        leaderboard_rows = dict(db.session.query(AuctionBidder.user_id, AuctionBidder.bid_count).filter_by(auction_id=auction_id).all())
+        leaderboard_matches = per_user == leaderboard_rows
+
+    accepted = statuses.count(202 if args.queued else 201)
+    print(f"{len(statuses)} bids and {len(top_ups)} top-ups in {elapsed:.2f}s ({args.bids / elapsed:.0f} requests/s): "
+          f"{accepted} accepted, {statuses.count(400)} rejected, {statuses.count(500)} errors")
+    if args.queued:
+        print(f"Queue drained after {applied_elapsed:.2f}s")
+    print(f"Money supply before {from_cents(supply_before):.2f}, topped up {from_cents(sum(top_ups)):.2f}, after {from_cents(supply_after):.2f}, "
+          f"pool {from_cents(auction.pool_prize):.2f}")
+
+    failures = []
+    if supply_before + sum(top_ups) != supply_after:
+        failures.append("money was created or lost")
+    if accepted != bid_rows:
+        failures.append(f"{accepted} bids accepted but {bid_rows} stored")
+    if negative_wallets:
+        failures.append(f"{negative_wallets} wallet(s) went negative")
+    if not counters_match:
+        failures.append("auction running totals do not match the bid table")
+    if not leaderboard_matches:
+        failures.append("leaderboard bid counts do not match the bid table")
+    if wallet_mismatches or pool_mismatches:
+        failures.append(f"{len(wallet_mismatches)} wallet(s) and {len(pool_mismatches)} pool(s) do not match the ledger")
+    if statuses.count(500):
+        failures.append("server errors")
+    late_bid = check_late_bid(app, auction_id, bidder_ids[0], tokens[bidder_ids[0]])
+    if late_bid:
+        failures.append(late_bid)
+    late_entry = check_late_ledger_entry(app, bidder_ids[1])
+    if late_entry:
+        failures.append(late_entry)
+    if args.queued:
+        closed_ticket = check_closed_ticket(app, auction_id, bidder_ids[2], tokens[bidder_ids[2]])
+        if closed_ticket:
+            failures.append(closed_ticket)
+
+    os.remove(db_path)
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,34 @@
+let nextAuctionsCursor = null;
+
 async function getAuctions() {
     try {
         const response = await fetch(`${API_URL}/auctions/`);
-        const auctions = await response.json();
-        displayAuctions(auctions);
+        const page = await response.json();
+        nextAuctionsCursor = page.next_cursor;
+        displayAuctions(page.auctions);
     } catch (error) {
         console.error('Error fetching auctions:', error);
     }
 }
 
+// LOAD NEXT PAGE
+async function loadMoreAuctions() {
+    if (nextAuctionsCursor === null) return;
+
+    try {
+        const response = await fetch(`${API_URL}/auctions/?cursor=${nextAuctionsCursor}`);
+        const page = await response.json();
+        nextAuctionsCursor = page.next_cursor;
+        displayAuctions(page.auctions, true);
+    } catch (error) {
+        console.error('Error fetching more auctions:', error);
+    }
+}
+
 // DISPLAY AUCTIONS
-function displayAuctions(auctions) {
+function displayAuctions(auctions, append = false) {
     const auctionsContainer = document.getElementById('auctions-list');
-    auctionsContainer.innerHTML = auctions.map(auction => {
+    const cards = auctions.map(auction => {
         const isExpired = new Date(auction.expires_at) < new Date();
         const status = isExpired ? 'expired' : auction.status;
         
@@ -32,6 +49,13 @@ function displayAuctions(auctions) {
             </div>
         `;
     }).join('');
+
+    auctionsContainer.innerHTML = append ? auctionsContainer.innerHTML + cards : cards;
+
+    const loadMoreButton = document.getElementById('load-more-auctions');
+    if (loadMoreButton) {
+        loadMoreButton.style.display = nextAuctionsCursor === null ? 'none' : 'block';
+    }
 }
 
 function startAuctionRefresh() {
@@ -1,5 +1,7 @@
 let bidChart = null;
-let allAuctionBids = [];
+let bidDistribution = null;
+let auctionEvents = null;
+let nextBidsCursor = null;
 
 // AUCTION DETAILS 
 async function loadAuctionDetails() {
@@ -22,20 +24,21 @@ async function loadAuctionDetails() {
         });
         const auction = await auctionResponse.json();
         
-        // FETCH AUCTION BIDS
-        const allBidsResponse = await fetch(`${API_URL}/auctions/${auctionId}/bids`, {
+        // FETCH BID DISTRIBUTION
+        const distributionResponse = await fetch(`${API_URL}/auctions/${auctionId}/distribution`, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
         });
-        const allBids = await allBidsResponse.json();
-        allAuctionBids = allBids;
+        const distribution = await distributionResponse.json();
+        bidDistribution = distribution;
         
         displayAuctionDetails(auction);
         
         // DISPLAY CURRENT WINNER
         if (auction.lowest_unique_bid) {
             const winnerInfo = document.createElement('p');
+            winnerInfo.id = 'current-winner';
             winnerInfo.innerHTML = `Current Winner: <strong>${auction.lowest_unique_bid.username}</strong>`;
             if (auction.lowest_unique_bid.is_users_bid) {
                 winnerInfo.innerHTML += ' <span class="winner-badge">★ You</span>';
@@ -43,11 +46,14 @@ async function loadAuctionDetails() {
             document.querySelector('.auction-meta').appendChild(winnerInfo);
         }
         
+        nextBidsCursor = auction.bids_next_cursor;
         displayBidsHistory(auction.bids);
         
-        updateBidChart(allBids);
+        updateBidChart(distribution);
         
         await fetchAndDisplayPoolPrizeInfo(auctionId);
+        
+        subscribeToAuctionEvents(auctionId, token);
     } catch (error) {
         console.error('Error fetching auction details:', error);
     }
@@ -56,6 +62,55 @@ async function loadAuctionDetails() {
     setInterval(checkExpiration, 1000);
 }
 
+// LIVE UPDATES
+function subscribeToAuctionEvents(auctionId, token) {
+    if (auctionEvents) return;
+    
+    auctionEvents = new EventSource(`${API_URL}/auctions/${auctionId}/events?jwt=${encodeURIComponent(token)}`);
+    
+    auctionEvents.addEventListener('bid', event => {
+        const update = JSON.parse(event.data);
+        
+        // APPLY DISTRIBUTION DELTA
+        if (bidDistribution) {
+            const bucketSize = bidDistribution.bucket_size;
+            const start = Math.round(Math.floor(update.amount / bucketSize) * bucketSize * 10) / 10;
+            const bucket = bidDistribution.buckets.find(b => b.start === start);
+            if (bucket) {
+                bucket.count += 1;
+            } else {
+                bidDistribution.buckets.push({ start: start, count: 1 });
+                bidDistribution.buckets.sort((a, b) => a.start - b.start);
+            }
+            bidDistribution.bid_count = update.bid_count;
+            updateBidChart(bidDistribution);
+        }
+        
+        const poolElement = document.getElementById('current-pool-prize');
+        if (poolElement && update.pool_prize !== null) {
+            poolElement.textContent = `$${update.pool_prize.toFixed(2)}`;
+        }
+        
+        const winnerInfo = document.getElementById('current-winner');
+        if (winnerInfo) {
+            winnerInfo.innerHTML = update.is_lowest_unique_bidder
+                ? 'Current Winner: <span class="winner-badge">★ You</span>'
+                : 'Current Winner: <strong>Someone else</strong>';
+        }
+        
+        // ONE OF OUR QUEUED BIDS WAS APPLIED
+        if (update.ticket_id) {
+            loadAuctionDetails();
+        }
+    });
+    
+    auctionEvents.onerror = () => {
+        if (document.getElementById('auction-status')?.classList.contains('status-expired')) {
+            auctionEvents.close();
+        }
+    };
+}
+
 function displayAuctionDetails(auction) {
     document.getElementById('auction-title').textContent = auction.title;
     document.getElementById('auction-description').textContent = auction.description;
@@ -108,11 +163,36 @@ function checkExpiration() {
     }
 }
 
-function displayBidsHistory(bids) {
+// LOAD NEXT PAGE OF THE USER'S BIDS
+async function loadMoreBids() {
+    if (nextBidsCursor === null) return;
+    const auctionId = new URLSearchParams(window.location.search).get('id');
+
+    try {
+        const response = await fetch(`${API_URL}/auctions/${auctionId}?bids_cursor=${nextBidsCursor}`, {
+            headers: {
+                'Authorization': `Bearer ${localStorage.getItem('token')}`
+            }
+        });
+        const auction = await response.json();
+        nextBidsCursor = auction.bids_next_cursor;
+        displayBidsHistory(auction.bids, true);
+    } catch (error) {
+        console.error('Error fetching more bids:', error);
+    }
+}
+
+function displayBidsHistory(bids, append = false) {
     const bidsList = document.getElementById('bids-list');
-    bidsList.innerHTML = '';
+    const loadMoreButton = document.getElementById('load-more-bids');
+    if (loadMoreButton) {
+        loadMoreButton.style.display = nextBidsCursor === null ? 'none' : 'block';
+    }
+    if (!append) {
+        bidsList.innerHTML = '';
+    }
     
-    if (bids.length === 0) {
+    if (bids.length === 0 && !append) {
         bidsList.innerHTML += '<p>You haven\'t placed any bids on this auction yet.</p>';
         return;
     }
@@ -148,28 +228,22 @@ function displayBidsHistory(bids) {
     });
 }
 
-function updateBidChart(bids) {
+function updateBidChart(distribution) {
     const ctx = document.getElementById('bidChart').getContext('2d');
-    
-    const bidRanges = {};
-    bids.forEach(bid => {
-        const range = Math.floor(bid.amount / 10) * 10;
-        bidRanges[range] = (bidRanges[range] || 0) + 1;
-    });
+    const bucketSize = distribution.bucket_size;
+    const buckets = distribution.buckets;
     
     if (bidChart) {
         bidChart.destroy();
     }
     
-    const sortedRanges = Object.keys(bidRanges).sort((a, b) => Number(a) - Number(b));
-    
     bidChart = new Chart(ctx, {
         type: 'bar',
         data: {
-            labels: sortedRanges.map(range => `$${range}-${Number(range)+10}`),
+            labels: buckets.map(bucket => `$${bucket.start}-${bucket.start + bucketSize}`),
             datasets: [{
                 label: 'All Bids Distribution',
-                data: sortedRanges.map(range => bidRanges[range]),
+                data: buckets.map(bucket => bucket.count),
                 backgroundColor: 'rgba(0, 123, 255, 0.5)',
                 borderColor: 'rgba(0, 123, 255, 1)',
                 borderWidth: 1
@@ -247,7 +321,8 @@ async function placeBid() {
         await updateWalletDisplay();
         await loadAuctionDetails();
         
-        alert('Bid placed successfully!');
+        // 202: QUEUED, THE BID SHOWS UP WHEN ITS 'bid' EVENT ARRIVES
+        alert(response.status === 202 ? 'Bid accepted, it will appear shortly' : 'Bid placed successfully!');
 
     } catch (error) {
         console.error('Error placing bid:', error);
@@ -261,21 +336,21 @@ async function fetchAndDisplayTopBidders(auctionId) {
         const token = localStorage.getItem('token');
         if (!token) return;
         
-        if (allAuctionBids.length > 0) {
-            calculateAndDisplayTopBidders(allAuctionBids);
+        if (bidDistribution) {
+            displayTopBidders(bidDistribution.top_bidders);
             return;
         }
         
-        const response = await fetch(`${API_URL}/auctions/${auctionId}/bids`, {
+        const response = await fetch(`${API_URL}/auctions/${auctionId}/distribution`, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
         });
         
         if (!response.ok) throw new Error('Failed to fetch bid data');
-        const bids = await response.json();
+        const distribution = await response.json();
         
-        calculateAndDisplayTopBidders(bids);
+        displayTopBidders(distribution.top_bidders);
     } catch (error) {
         console.error('Error fetching top bidders:', error);
         document.getElementById('top-bidders-list').innerHTML = 
@@ -283,39 +358,15 @@ async function fetchAndDisplayTopBidders(auctionId) {
     }
 }
 
-function calculateAndDisplayTopBidders(bids) {
-    const bidCounts = {};
-    const usernames = {};
-    
-    bids.forEach(bid => {
-        const userId = bid.user_id;
-        if (userId) {
-            bidCounts[userId] = (bidCounts[userId] || 0) + 1;
-            
-            if (bid.username) {
-                usernames[userId] = bid.username;
-            }
-        }
-    });
-    
-    const sortedBidders = Object.entries(bidCounts)
-        .map(([userId, count]) => ({ 
-            userId, 
-            count, 
-            username: usernames[userId] || `User #${userId}` 
-        }))
-        .sort((a, b) => b.count - a.count);
-    
+function displayTopBidders(topBidders) {
     const topBiddersList = document.getElementById('top-bidders-list');
     topBiddersList.innerHTML = '';
     
-    if (sortedBidders.length === 0) {
+    if (topBidders.length === 0) {
         topBiddersList.innerHTML = '<p>No bids yet</p>';
         return;
     }
     
-    const topBidders = sortedBidders.slice(0, 10);
-    
     topBidders.forEach((bidder, index) => {
         const bidderElement = document.createElement('div');
         bidderElement.className = 'top-bidder-item';
@@ -323,7 +374,7 @@ function calculateAndDisplayTopBidders(bids) {
         bidderElement.innerHTML = `
             <span class="top-bidder-rank">TOP ${index + 1}:</span>
             <span class="top-bidder-username">${bidder.username}</span>
-            <span class="top-bidder-count">participated ${bidder.count} time${bidder.count !== 1 ? 's' : ''}</span>
+            <span class="top-bidder-count">participated ${bidder.bid_count} time${bidder.bid_count !== 1 ? 's' : ''}</span>
         `;
         
         topBiddersList.appendChild(bidderElement);
@@ -365,7 +416,7 @@ async function fetchAndDisplayPoolPrizeInfo(auctionId) {
         }
         
         poolContent += `
-            <p>Current Pool Prize: <strong>$${poolInfo.pool_prize.toFixed(2)}</strong></p>
+            <p>Current Pool Prize: <strong id="current-pool-prize">$${poolInfo.pool_prize.toFixed(2)}</strong></p>
         `;
         
         if (poolInfo.top_bidders && poolInfo.top_bidders.length > 0) {
@@ -387,7 +438,18 @@ async function fetchAndDisplayPoolPrizeInfo(auctionId) {
         } else {
             poolContent += `<p>No potential winners yet</p>`;
         }
-        
+
+        const standing = poolInfo.your_standing;
+        if (standing && !poolInfo.pool_distributed) {
+            if (standing.rank === null) {
+                poolContent += `<p class="your-standing">You have no bids yet. ${standing.bids_to_podium} bid(s) would put you in the top 3.</p>`;
+            } else if (standing.bids_to_podium > 0) {
+                poolContent += `<p class="your-standing">Your rank: <strong>#${standing.rank}</strong> (${standing.bid_count} bids). ${standing.bids_to_podium} more bid(s) to reach the top 3.</p>`;
+            } else {
+                poolContent += `<p class="your-standing">Your rank: <strong>#${standing.rank}</strong> (${standing.bid_count} bids)</p>`;
+            }
+        }
+
         if (poolInfo.pool_distributed && poolInfo.winners && poolInfo.winners.length > 0) {
             poolContent += `<h4>Pool Prize Winners</h4><ul class="pool-prize-actual-winners">`;
             